@@ -0,0 +1,81 @@
+# benchmarks/bench_batching.py
+"""
+Chi phí của Simulator khi tải cao, có và không có batching theo link.
+
+Mỗi TICK giây, mỗi node gửi `--msgs` tin nhỏ (như vote / TX) tới mỗi peer bằng
+send_message; node nhận chỉ đếm tin (mở phong bì BATCH như Node.receive).
+So sánh số sự kiện qua hàng đợi, số tin trên mạng và thời gian cho mỗi tin được giao.
+
+Chạy: python -m benchmarks.bench_batching [--nodes 32] [--msgs 4] [--windows none,0,0.005,0.02]
+"""
+import argparse
+import time
+
+from src.simulator import Simulator
+
+TICK = 0.01
+
+
+class LoadNode:
+    def __init__(self, node_id, sim, peers, msgs: int):
+        self.node_id = node_id
+        self.sim = sim
+        self.peers = [p for p in peers if p != node_id]
+        self.msgs = msgs
+        self.received = 0
+        self.sent = 0
+        sim.register_node(self)
+
+    def on_timer(self, token):
+        send = self.sim.send_message
+        for i in range(self.msgs):
+            message = {"type": "PREVOTE", "i": self.sent}
+            self.sent += 1
+            for peer in self.peers:
+                send(self.node_id, peer, message)
+        self.sim.schedule_timer(self.node_id, TICK, None)
+
+    def receive(self, sender_id, message):
+        if message.get("msg_type") == "BATCH":
+            self.received += len(message["messages"])
+        else:
+            self.received += 1
+
+
+def run(window, num_nodes: int, msgs: int, max_time: float, seed: int):
+    config = {"min_delay": 0.01, "max_delay": 0.05, "drop_prob": 0.0, "duplicate_prob": 0.0, "seed": seed,
+              "max_messages_per_second": 10**9}
+    if window is not None:
+        config["batching"] = {"window": window}
+    sim = Simulator(config)
+    names = [f"N{i}" for i in range(num_nodes)]
+    nodes = [LoadNode(name, sim, names, msgs) for name in names]
+    for n in nodes:
+        sim.schedule_timer(n.node_id, 0.0, None)
+    start = time.perf_counter()
+    sim.run_until(max_time)
+    elapsed = time.perf_counter() - start
+    delivered = sum(n.received for n in nodes)
+    return sim.processed_events, sim._next_msg_id, delivered, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=32)
+    parser.add_argument("--msgs", type=int, default=4, help="tin mỗi peer mỗi tick")
+    parser.add_argument("--windows", default="none,0,0.005,0.02")
+    parser.add_argument("--time", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.nodes} nodes, {args.msgs} msgs per peer every {TICK}s, {args.time}s simulated")
+    for text in args.windows.split(","):
+        window = None if text == "none" else float(text)
+        events, network_msgs, delivered, elapsed = run(window, args.nodes, args.msgs, args.time, args.seed)
+        label = "off" if window is None else f"{window:g}s"
+        print(f"batching {label:6s}  queue events {events:8d}  network msgs {network_msgs:8d}  "
+              f"delivered {delivered:8d}  {elapsed:6.2f}s  ({elapsed / delivered * 1e6:5.2f} us/msg)")
+
+
+if __name__ == "__main__":
+    main()
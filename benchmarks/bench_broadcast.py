@@ -0,0 +1,55 @@
+# benchmarks/bench_broadcast.py
+"""
+Chi phí một broadcast: vòng lặp send_message (một lần rút NumPy mỗi tin)
+so với Simulator.broadcast (một lần rút NumPy mỗi link cho mọi bản của link đó).
+
+Chạy: python -m benchmarks.bench_broadcast [--peers 8,64,256,1024] [--copies 4]
+"""
+import argparse
+import time
+
+from src.simulator import Simulator
+
+
+def make_sim(peers: int) -> tuple:
+    sim = Simulator({"min_delay": 0.01, "max_delay": 0.1, "drop_prob": 0.1, "duplicate_prob": 0.05,
+                     "max_messages_per_second": 10**9, "seed": 1})
+    return sim, [f"Node{i}" for i in range(1, peers + 1)]
+
+
+def per_call(sim, fn, calls: int) -> float:
+    """Thời gian trung bình mỗi lần gọi; hàng đợi được làm rỗng giữa các lần (ngoài phần đo)"""
+    total = 0.0
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        total += time.perf_counter() - start
+        sim.events.heap.clear()
+    return total / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--peers", default="8,64,256,1024")
+    parser.add_argument("--copies", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    message = {"type": "PREVOTE", "height": 1}
+    print(f"{'peers':>6} {'loop (us)':>12} {'broadcast (us)':>15} {'speedup':>8}")
+    for peers in (int(p) for p in args.peers.split(",")):
+        sim, targets = make_sim(peers)
+
+        def loop():
+            for target in targets:
+                for _ in range(args.copies):
+                    sim.send_message("Node0", target, message)
+
+        loop_cost = per_call(sim, loop, args.calls)
+        sim, targets = make_sim(peers)
+        batch_cost = per_call(sim, lambda: sim.broadcast("Node0", targets, message, args.copies), args.calls)
+        print(f"{peers:>6} {loop_cost * 1e6:>12.1f} {batch_cost * 1e6:>15.1f} {loop_cost / batch_cost:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_crypto.py
+"""
+Chi phí crypto theo provider (src/crypto.py): Ed25519 (PyNaCl) vs BLAKE2b mock.
+
+1. µs mỗi lần ký / kiểm chữ ký một vote (gồm cả deterministic_encode của tin),
+   và riêng phần chữ ký (payload đã encode sẵn).
+2. Thời gian chạy đồng thuận N validator tới --time giây mô phỏng với mỗi provider
+   (cùng seed: chuỗi sự kiện giống hệt, chỉ khác chi phí crypto).
+
+Chạy: python -m benchmarks.bench_crypto [--ops 2000] [--nodes 16,64] [--time 3.0]
+"""
+import argparse
+import copy
+import hashlib
+import time
+import timeit
+
+import nacl.signing
+
+from config.node_config import CONFIG
+from src.crypto import CTX_VOTE, PROVIDERS, get_provider
+from src.runner import build_network
+from src.utils import deterministic_encode, quiet_output
+
+
+def per_op_us(stmt: str, namespace: dict, ops: int) -> float:
+    return min(timeit.repeat(stmt, globals=namespace, number=ops, repeat=3)) / ops * 1e6
+
+
+def bench_ops(ops: int):
+    vote = {"type": "PREVOTE", "height": 12, "round": 0, "block_hash": "ab" * 32, "voter": "cd" * 32}
+    print(f"µs per operation ({ops} ops, vote message):")
+    for name in PROVIDERS:
+        provider = get_provider(name)
+        key_pair = provider.key_pair(b"k" * 32)
+        sig = key_pair.sign(vote, CTX_VOTE)
+        namespace = {"kp": key_pair, "verify": provider.verify, "pub": key_pair.pub_key_str,
+                     "vote": vote, "sig": sig, "ctx": CTX_VOTE}
+        sign = per_op_us("kp.sign(vote, ctx)", namespace, ops)
+        check = per_op_us("verify(pub, vote, sig, ctx)", namespace, ops)
+        print(f"  {name:12s} sign {sign:8.2f}   verify {check:8.2f}")
+
+    # Phần chữ ký thuần, không tính encode tin
+    payload = CTX_VOTE.encode() + deterministic_encode(vote)
+    signing_key = nacl.signing.SigningKey(b"k" * 32)
+    signature = signing_key.sign(payload).signature
+    namespace = {"sk": signing_key, "vk": signing_key.verify_key, "payload": payload, "signature": signature,
+                 "blake2b": hashlib.blake2b, "key": b"p" * 32}
+    print("  primitive only:")
+    for label, stmt in (
+        ("ed25519 sign", "sk.sign(payload)"),
+        ("ed25519 verify", "vk.verify(payload, signature)"),
+        ("blake2b keyed", "blake2b(payload, digest_size=64, key=key).hexdigest()"),
+        ("encode vote", "deterministic_encode(vote)"),
+    ):
+        namespace["deterministic_encode"] = deterministic_encode
+        namespace["vote"] = vote
+        print(f"    {label:16s} {per_op_us(stmt, namespace, ops):8.2f}")
+
+
+def run_consensus(num_nodes: int, max_time: float, provider: str) -> tuple:
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    config["crypto"]["provider"] = provider
+    sim, nodes = build_network(num_nodes, seed=7, config=config, key_prefix="crypto")
+    with quiet_output():
+        start = time.perf_counter()
+        for n in nodes:
+            n.start_consensus()
+        sim.run_until(max_time)
+        elapsed = time.perf_counter() - start
+    return sim.processed_events, elapsed, max(n.finalized_height for n in nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--nodes", default="16,64")
+    parser.add_argument("--time", type=float, default=3.0)
+    args = parser.parse_args()
+
+    bench_ops(args.ops)
+    for num_nodes in (int(n) for n in args.nodes.split(",")):
+        print(f"Simulator, {num_nodes} nodes, {args.time}s simulated:")
+        for name in PROVIDERS:
+            events, elapsed, height = run_consensus(num_nodes, args.time, name)
+            print(f"  {name:12s} {events} events in {elapsed:7.2f}s -> {events / elapsed:9,.0f} events/s "
+                  f"(finalized height {height})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/bench_dispatch.py
+"""
+Chi phí của interface Transport / Clock (src/transport.py) trên đường nóng.
+
+1. Node -> engine (ns mỗi lời gọi, transport không làm gì):
+     attribute   node.sim.send_message(...) (cách Node gọi engine trước đây)
+     bound       node._send_message(...) (bound method lấy sẵn trong bind_transport)
+     adapter     qua một lớp Transport chuyển tiếp từng hàm cho engine (interface không có đường tắt)
+   và đọc giờ: node.clock.current_time khi clock là attribute (Simulator) vs hàm now() / property.
+2. Engine -> node (ns mỗi sự kiện): getattr(node, "receive")(...) theo tên vs handler lấy sẵn
+   (node_handlers) như Simulator.run_until.
+3. Events/giây của Simulator chạy đồng thuận N node: Node gắn thẳng vào Simulator vs qua adapter.
+
+Chạy: python -m benchmarks.bench_dispatch [--calls 1000000] [--nodes 16] [--time 2.0] [--repeat 3]
+"""
+import argparse
+import time
+import timeit
+
+from src.runner import build_network
+from src.transport import Transport, Clock, node_handlers
+from src.utils import quiet_output
+
+
+class NullEngine(Transport, Clock):
+    """Transport / Clock không làm gì: chỉ còn chi phí gọi hàm"""
+    current_time = 0.0
+
+    def send_message(self, sender_id, receiver_id, message):
+        pass
+
+
+class ForwardingTransport(Transport, Clock):
+    """Adapter chuyển tiếp mọi hàm cho engine bên trong (thêm một tầng gọi mỗi lần)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def register_node(self, node):
+        self.engine.register_node(node)
+
+    @property
+    def current_time(self):
+        return self.engine.current_time
+
+    def schedule_timer(self, node_id, delay, callback_token):
+        return self.engine.schedule_timer(node_id, delay, callback_token)
+
+    def cancel(self, timer_id):
+        self.engine.cancel(timer_id)
+
+    def send_message(self, sender_id, receiver_id, message):
+        self.engine.send_message(sender_id, receiver_id, message)
+
+    def broadcast(self, sender_id, targets, message, copies=1):
+        self.engine.broadcast(sender_id, targets, message, copies)
+
+    def send_header(self, sender_id, receiver_id, header):
+        self.engine.send_header(sender_id, receiver_id, header)
+
+    def broadcast_header(self, sender_id, targets, header, copies=1):
+        self.engine.broadcast_header(sender_id, targets, header, copies)
+
+    def send_body(self, sender_id, receiver_id, body, block_hash):
+        self.engine.send_body(sender_id, receiver_id, body, block_hash)
+
+    def accept_header(self, receiver_id, block_hash, height=None):
+        self.engine.accept_header(receiver_id, block_hash, height)
+
+    def forget_blocks(self, receiver_id, height):
+        self.engine.forget_blocks(receiver_id, height)
+
+
+class CallSite:
+    """Đứng thay Node: chỉ giữ các tham chiếu mà Node giữ"""
+
+    def __init__(self, engine):
+        self.node_id = "A"
+        self.sim = engine
+        self.clock = engine
+        self._send_message = engine.send_message
+        self._now = lambda: engine.current_time
+
+    def receive(self, sender_id, message):
+        pass
+
+
+def per_call_ns(stmt: str, namespace: dict, calls: int) -> float:
+    return min(timeit.repeat(stmt, globals=namespace, number=calls, repeat=3)) / calls * 1e9
+
+
+def bench_calls(calls: int):
+    engine = NullEngine()
+    direct = CallSite(engine)
+    adapted = CallSite(ForwardingTransport(engine))
+    msg = {}
+    print(f"Node -> engine, ns per call ({calls} calls):")
+    for label, stmt in (
+        ("send  attribute", "node.sim.send_message(node.node_id, 'B', msg)"),
+        ("send  bound", "node._send_message(node.node_id, 'B', msg)"),
+        ("send  adapter", "adapted._send_message(node.node_id, 'B', msg)"),
+        ("clock attribute", "node.clock.current_time"),
+        ("clock function", "node._now()"),
+        ("clock property", "adapted.clock.current_time"),
+    ):
+        ns = per_call_ns(stmt, {"node": direct, "adapted": adapted, "msg": msg}, calls)
+        print(f"  {label:16s} {ns:7.1f}")
+
+    handlers = {"A": node_handlers(direct)}
+    nodes = {"A": direct}
+    print("Engine -> node, ns per event:")
+    for label, stmt in (
+        ("getattr by name", "getattr(nodes['A'], 'receive')('B', msg)"),
+        ("bound handlers", "handlers['A'][0]('B', msg)"),
+    ):
+        ns = per_call_ns(stmt, {"nodes": nodes, "handlers": handlers, "msg": msg}, calls)
+        print(f"  {label:16s} {ns:7.1f}")
+
+
+def run_consensus(num_nodes: int, max_time: float, adapter: bool) -> tuple:
+    sim, nodes = build_network(num_nodes, seed=7, key_prefix="dispatch")
+    if adapter:
+        wrapper = ForwardingTransport(sim)
+        for n in nodes:
+            n.bind_transport(wrapper)
+    with quiet_output():
+        start = time.perf_counter()
+        for n in nodes:
+            n.auto_advance = True
+            n.start_consensus()
+        sim.run_until(max_time)
+        elapsed = time.perf_counter() - start
+    return sim.processed_events, elapsed, max(n.finalized_height for n in nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--nodes", type=int, default=16)
+    parser.add_argument("--time", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bench_calls(args.calls)
+    print(f"Simulator, {args.nodes} nodes, {args.time}s simulated (best of {args.repeat}):")
+    for label, adapter in (("bound", False), ("adapter", True)):
+        best = None
+        for _ in range(args.repeat):
+            events, elapsed, height = run_consensus(args.nodes, args.time, adapter)
+            best = max(best or 0.0, events / elapsed)
+        print(f"  {label:16s} {events} events -> {best:,.0f} events/s (finalized height {height})")
+
+
+if __name__ == "__main__":
+    main()
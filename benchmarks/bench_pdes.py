@@ -0,0 +1,41 @@
+# benchmarks/bench_pdes.py
+"""
+So sánh engine tuần tự và PDES (nhiều worker process) trên cùng seed:
+thời gian chạy và kiểm tra kết quả giống hệt nhau.
+
+Chạy: python -m benchmarks.bench_pdes [--nodes 64] [--time 1.0] [--workers 2,4]
+"""
+import argparse
+import os
+import time
+
+from src.pdes import run_sequential, run_parallel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=64)
+    parser.add_argument("--time", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=123456)
+    parser.add_argument("--workers", default=",".join(str(w) for w in (2, 4) if w <= (os.cpu_count() or 1)) or "2")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sequential = run_sequential(args.nodes, seed=args.seed, max_time=args.time)
+    base = time.perf_counter() - start
+    height = min(s["finalized_height"] for s in sequential.values())
+    print(f"sequential      {base:7.2f}s  (finalized height {height})")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        stats = {}
+        start = time.perf_counter()
+        parallel = run_parallel(args.nodes, seed=args.seed, max_time=args.time, workers=workers, stats=stats)
+        elapsed = time.perf_counter() - start
+        same = "identical" if parallel == sequential else "DIFFERENT"
+        print(f"pdes {workers:2d} workers {elapsed:7.2f}s  speedup {base / elapsed:4.2f}x  "
+              f"{stats['windows']} windows, {stats['remote_messages']} remote msgs  -> {same}")
+    print(f"({os.cpu_count()} CPU cores available)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_transport.py
+"""
+So sánh transport của tin nhắn giữa các node: Simulator trong process,
+RealtimeRuntime trên TCP / UDP loopback và trên ring buffer shared memory.
+
+N node xếp thành vòng; mỗi node bơm `--window` token, node nhận token chuyển ngay cho
+node kế tiếp (tải vòng kín, không làm ngập transport). Mỗi tin mang thời điểm gửi
+(time.monotonic, chung mọi process); đo số tin/giây wall-clock và phân vị độ trễ
+gửi -> handler của receiver. Với Simulator, độ trễ là thời gian wall tin nằm trong hàng đợi.
+
+Chạy: python -m benchmarks.bench_transport [--nodes 4] [--modes sim,tcp,udp,shm] [--duration 2]
+      [--single-process]   (mọi node realtime chung một event loop thay vì mỗi node một process)
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from src.realtime import RealtimeRuntime
+from src.shm_ring import ShmFabric
+from src.simulator import Simulator
+
+BASE_PORT = 47300
+
+
+class TokenNode:
+    def __init__(self, node_id: str, transport, names: list):
+        self.node_id = node_id
+        self.transport = transport
+        self.next_id = names[(names.index(node_id) + 1) % len(names)]
+        self.latencies = []
+        transport.register_node(self)
+
+    def inject(self, window: int):
+        for token in range(window):
+            self.forward(token)
+
+    def forward(self, token):
+        self.transport.send_message(self.node_id, self.next_id, {"token": token, "sent": time.monotonic()})
+
+    def receive(self, sender_id, message):
+        self.latencies.append(time.monotonic() - message["sent"])
+        self.forward(message["token"])
+
+
+def run_sim(names, window: int, duration: float) -> tuple:
+    sim = Simulator({"min_delay": 0.001, "max_delay": 0.002, "drop_prob": 0.0, "duplicate_prob": 0.0,
+                     "max_messages_per_second": 10**9, "seed": 1})
+    nodes = [TokenNode(name, sim, names) for name in names]
+    for n in nodes:
+        n.inject(window)
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        sim.run_until(sim.current_time + 0.05)
+    elapsed = time.perf_counter() - start
+    return [l for n in nodes for l in n.latencies], elapsed
+
+
+async def run_runtime(transport: str, names, hosted, window: int, duration: float, barrier=None, fabric=None):
+    base_port = BASE_PORT if transport != "shm" and len(hosted) < len(names) else 0
+    runtime = RealtimeRuntime({"transport": transport, "base_port": base_port}, fabric=fabric)
+    nodes = []
+    for name in names:
+        if name in hosted:
+            nodes.append(TokenNode(name, runtime, names))
+        else:
+            runtime.assign_rank(name)
+    await runtime.start()
+    if barrier is not None:
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    start = time.perf_counter()
+    for n in nodes:
+        n.inject(window)
+    await runtime.run(duration)
+    elapsed = time.perf_counter() - start
+    await runtime.close()
+    return [l for n in nodes for l in n.latencies], elapsed
+
+
+def process_main(transport, names, node_id, window, duration, barrier, fabric, results):
+    results.put(asyncio.run(run_runtime(transport, names, {node_id}, window, duration, barrier, fabric)))
+
+
+def run_processes(transport: str, names, window: int, duration: float) -> tuple:
+    fabric = ShmFabric(names) if transport == "shm" else None
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(len(names))
+    results = ctx.Queue()
+    procs = [ctx.Process(target=process_main, args=(transport, names, name, window, duration, barrier, fabric, results))
+             for name in names]
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    if fabric is not None:
+        fabric.close()
+    return [l for latencies, _ in collected for l in latencies], max(e for _, e in collected)
+
+
+def percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--modes", default="sim,tcp,udp,shm")
+    parser.add_argument("--window", type=int, default=4, help="token mỗi node")
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--single-process", action="store_true")
+    args = parser.parse_args()
+
+    names = [f"N{i}" for i in range(args.nodes)]
+    layout = "1 process" if args.single_process else f"{args.nodes} processes"
+    print(f"{args.nodes} nodes in a ring, {args.window} tokens per node, {args.duration}s per mode")
+    for mode in args.modes.split(","):
+        if mode == "sim":
+            latencies, elapsed = run_sim(names, args.window, args.duration)
+            label = "sim (1 process)"
+        elif args.single_process:
+            latencies, elapsed = asyncio.run(run_runtime(mode, names, set(names), args.window, args.duration))
+            label = f"{mode} ({layout})"
+        else:
+            latencies, elapsed = run_processes(mode, names, args.window, args.duration)
+            label = f"{mode} ({layout})"
+        latencies.sort()
+        us = [percentile(latencies, q) * 1e6 for q in (0.5, 0.9, 0.99)]
+        print(f"{label:20s} {len(latencies) / elapsed:10.0f} msg/s   "
+              f"latency p50 {us[0]:8.1f} us  p90 {us[1]:8.1f} us  p99 {us[2]:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,35 @@ CONFIG = {
         "max_delay": 0.1,
         "drop_prob": 0.1,
         "duplicate_prob": 0.05,
+        "scheduler": "heap",  # Hàng đợi sự kiện: "heap" hoặc "calendar" (bucket theo thời gian)
         "rate_limit": {
-            "max_messages_per_second": 100,  # Giới hạn tin nhắn mỗi giây
-            "block_duration": 1.0  # Thời gian block peer khi vượt quá giới hạn
+            "max_messages_per_second": 100,  # Token nạp lại mỗi giây (mỗi link, mỗi lớp tin nhắn)
+            "burst": 100,  # Số token tối đa của bucket
+            "block_duration": 1.0,  # Thời gian block peer khi vượt quá giới hạn
+            "classes": {}  # Ngân sách riêng theo lớp, ví dụ {"tx": {"max_messages_per_second": 20, "burst": 40}}
         }
     },
     "consensus": {
+        "timeout_propose": 1.0,
         "timeout_prevote": 1.0,
         "timeout_precommit": 1.0,
+        "timeout_delta": 0.5,  # Mỗi round sau chờ thêm timeout_delta giây
+        "sync_interval": 1.0,  # Node tụt height: khoảng tối thiểu giữa hai yêu cầu GET_COMMITS
+        "sync_batch": 4,  # Số height (block + 2/3 PRECOMMIT) tối đa mỗi trả lời COMMITS
+        "tx_regossip_interval": 2.0,  # TX còn trong mempool: gửi lại cho peer gossip sau mỗi khoảng này
+        "tx_regossip_count": 2,  # Số lần gửi lại TX tối đa (0 = chỉ relay một lần)
         "retry_count": 4  # Số lần gửi lại tin nhắn
     },
+    "crypto": {
+        "provider": "ed25519"  # Chữ ký: "ed25519" (PyNaCl) hoặc "blake2-mock" (BLAKE2b có khóa, chỉ cho mô phỏng lớn)
+    },
+    "realtime": {
+        "transport": "tcp",  # Runtime thời gian thực (src/realtime.py): "tcp" / "udp" trên loopback, "shm" shared memory
+        "host": "127.0.0.1",
+        "base_port": 0,  # Cổng của node rank r = base_port + r; 0 = tự chọn (chỉ khi chạy một process)
+        "impairments": {"drop_prob": 0.0, "delay": 0.0, "jitter": 0.0},  # Tiêm ở phía gửi
+        "ring_capacity": 262144  # Byte mỗi ring của transport "shm"
+    },
     "nodes": ["Node0", "Node1", "Node2", "Node3", "Node4", "Node5", "Node6", "Node7"],
     "simulation": {
         "max_time": 10.0,
@@ -0,0 +1,132 @@
+"""
+Chạy mô phỏng dài với checkpoint định kỳ, hoặc chạy tiếp từ một checkpoint.
+
+Ví dụ:
+    python run_checkpoint.py --nodes 8 --drop 0.2 --until 600 --every 100 --dir logs/ckpt --trace logs/chaos.trace
+    python run_checkpoint.py --resume logs/ckpt/t000300.ckpt --until 320 --verbose
+    python run_checkpoint.py --verify --until 60
+--resume ghi tiếp file trace đã lưu trong checkpoint (cắt về vị trí lúc checkpoint) trừ khi có --trace.
+--verify chạy liền một mạch và chạy qua checkpoint ở giữa, so sánh hash của hai file trace.
+"""
+import argparse
+import copy
+import hashlib
+import os
+import time
+
+from config.node_config import CONFIG
+from src.checkpoint import save_checkpoint, load_checkpoint, read_checkpoint_meta
+from src.runner import build_network
+from src.trace import BinaryFileTraceSink, NullTraceSink
+from src.utils import quiet_output
+
+
+def start_network(args, trace_sink):
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    network_config = {"drop_prob": args.drop, "duplicate_prob": args.duplicate}
+    sim, nodes = build_network(args.nodes, seed=args.seed, network_config=network_config, config=config,
+                               trace_sink=trace_sink, key_prefix="checkpoint")
+    for n in nodes:
+        n.start_consensus()
+    return sim
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def report(sim, label: str):
+    heights = [n.finalized_height for n in sim.nodes.values()]
+    print(f"{label}: t={sim.current_time:.2f}s events={sim.processed_events} "
+          f"height min {min(heights)} max {max(heights)}")
+
+
+def run_with_checkpoints(args):
+    sink = BinaryFileTraceSink(args.trace) if args.trace else NullTraceSink()
+    os.makedirs(args.dir, exist_ok=True)
+    with quiet_output(not args.verbose):
+        sim = start_network(args, sink)
+    at = args.every
+    while True:
+        with quiet_output(not args.verbose):
+            sim.run_until(min(at, args.until))
+        if at > args.until:
+            break
+        path = os.path.join(args.dir, f"t{int(at):06d}.ckpt")
+        start = time.perf_counter()
+        size = save_checkpoint(sim, path, meta={"seed": args.seed, "at": at})
+        report(sim, f"checkpoint {path} ({size / 1024:.0f} KiB, {(time.perf_counter() - start) * 1000:.1f} ms)")
+        at += args.every
+    sink.close()
+    report(sim, "done")
+
+
+def resume(args):
+    meta = read_checkpoint_meta(args.resume)
+    print(f"resume {args.resume}: t={meta['time']:.2f}s heights {meta['heights']}")
+    start = time.perf_counter()
+    sim = load_checkpoint(args.resume, trace_sink=BinaryFileTraceSink(args.trace) if args.trace else None)
+    print(f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    with quiet_output(not args.verbose):
+        sim.run_until(args.until)
+    sim.trace_sink.close()
+    report(sim, "done")
+
+
+def verify(args):
+    os.makedirs(args.dir, exist_ok=True)
+    full_trace = os.path.join(args.dir, "verify_full.trace")
+    resumed_trace = os.path.join(args.dir, "verify_resumed.trace")
+    path = os.path.join(args.dir, "verify.ckpt")
+    middle = args.until / 2
+
+    with quiet_output(not args.verbose):
+        sink = BinaryFileTraceSink(full_trace)
+        sim = start_network(args, sink)
+        sim.run_until(args.until)
+        sink.close()
+
+        sink = BinaryFileTraceSink(resumed_trace)
+        sim = start_network(args, sink)
+        sim.run_until(middle)
+    save_checkpoint(sim, path)
+    sink.close()
+    with quiet_output(not args.verbose):
+        sim = load_checkpoint(path)
+        sim.run_until(args.until)
+    sim.trace_sink.close()
+
+    same = file_hash(full_trace) == file_hash(resumed_trace)
+    print(f"checkpoint at t={middle}s, {os.path.getsize(path) / 1024:.0f} KiB")
+    print(f"uninterrupted trace: {file_hash(full_trace)}")
+    print(f"resumed trace:       {file_hash(resumed_trace)}")
+    print(">>> SUCCESS: traces identical" if same else ">>> FAILURE: traces differ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drop", type=float, default=0.1)
+    parser.add_argument("--duplicate", type=float, default=0.05)
+    parser.add_argument("--until", type=float, default=60.0, help="Thời điểm mô phỏng dừng (giây)")
+    parser.add_argument("--every", type=float, default=10.0, help="Checkpoint mỗi bấy nhiêu giây mô phỏng")
+    parser.add_argument("--dir", default="logs/checkpoints")
+    parser.add_argument("--trace", default=None, help="File trace nhị phân")
+    parser.add_argument("--resume", default=None, help="Chạy tiếp từ file checkpoint này")
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="In log của node")
+    args = parser.parse_args()
+
+    if args.verify:
+        verify(args)
+    elif args.resume:
+        resume(args)
+    else:
+        run_with_checkpoints(args)
+
+
+if __name__ == "__main__":
+    main()
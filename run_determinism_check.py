@@ -1,41 +1,53 @@
-import sys
-import os
+"""
+Kiểm chứng tính đơn định: chạy cùng một mô phỏng nhiều lần với cùng seed và so trace mạng.
+
+Ví dụ:
+    python run_determinism_check.py
+    python run_determinism_check.py --stream --runs 4 --max-time 60
+    python run_determinism_check.py --stream --diverge-at 2.0
+Mặc định: chạy 2 lần nối tiếp, ghi logs/run1.trace, logs/run2.trace rồi so hash hai file.
+--stream: chạy --runs lần song song (mỗi lần một process), hash trace ngay khi record được
+tạo, so hash cuốn chiếu mỗi --every record; không ghi log ra đĩa. Nếu lệch, in record lệch
+đầu tiên cùng --context record xung quanh của từng lần chạy.
+--diverge-at T: (demo) lần chạy thứ 2 tăng duplicate_prob từ thời điểm T để thấy báo lệch.
+"""
+import argparse
+import copy
+import functools
 import hashlib
-import random
-import logging
+import os
+import time
 from src.node import Node
 from src.simulator import Simulator
+from src.trace import BinaryFileTraceSink
+from src.determinism import check_determinism
+from src.utils import quiet_output
 from config.node_config import CONFIG
 
-def run_simulation(seed, log_file):
-    # Clear existing handlers
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
-        
-    logging.basicConfig(filename=log_file, level=logging.INFO, format='%(message)s', filemode='w')
 
+def run_simulation(seed, trace_sink, max_time=None, diverge_at=None, node_config=CONFIG):
     # Lấy cấu hình từ CONFIG
     network_config = CONFIG["network"]
     simulation_config = CONFIG.get("simulation", {})
     node_names = CONFIG["nodes"]
-    
+
     config = {
         "min_delay": network_config["min_delay"],
         "max_delay": network_config["max_delay"],
         "drop_prob": network_config["drop_prob"],
         "duplicate_prob": network_config["duplicate_prob"],
-        "seed": seed 
+        "seed": seed
     }
-    sim = Simulator(config)
+    sim = Simulator(config, trace_sink=trace_sink)
 
     nodes = []
     validator_keys = []
     num_nodes = len(node_names)
-    
+
     # Khởi tạo nodes với key_seed cố định dựa trên seed chung
     for i in range(num_nodes):
         node_seed = f"node_{i}_{seed}"
-        n = Node(node_names[i], sim, [], key_seed=node_seed, config=CONFIG)
+        n = Node(node_names[i], sim, [], key_seed=node_seed, config=node_config)
         nodes.append(n)
         validator_keys.append(n.key_pair.pub_key_str)
         sim.register_node(n)
@@ -51,40 +63,110 @@ def run_simulation(seed, log_file):
             n.add_peer(peer.node_id)
 
     nodes[0].start_consensus()
-    
-    max_time = simulation_config.get("max_time", 5.0)
+
+    if max_time is None:
+        max_time = simulation_config.get("max_time", 5.0)
+    if diverge_at is not None:
+        sim.run_until(diverge_at)
+        sim.duplicate_prob += 0.1
     sim.run(max_time=max_time)
-    
+    trace_sink.close()
+
     if 1 in nodes[0].blocks:
         return nodes[0].blocks[1].get_hash()
     return "None"
 
+
+def stream_run(run_index, trace_sink, seed, max_time, diverge_at=None):
+    """
+    Một lần chạy của --stream (top-level để chạy được trong process con). Bật auto_advance
+    để mô phỏng chạy tiếp qua nhiều height tới max_time thay vì dừng sau block đầu.
+    """
+    node_config = copy.deepcopy(CONFIG)
+    node_config["consensus"]["auto_advance"] = True
+    return run_simulation(seed, trace_sink, max_time, diverge_at if run_index == 1 else None, node_config)
+
+
 def get_file_hash(filepath):
     with open(filepath, 'rb') as f:
         return hashlib.sha256(f.read()).hexdigest()
 
-if __name__ == "__main__":
-    print("--- DETERMINISM CHECK SCRIPT ---")
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
-        
-    SEED = CONFIG.get("simulation", {}).get("seed", 123456)
-    
-    print(f"1. Running Simulation 1 (Seed={SEED})...")
-    state1 = run_simulation(SEED, "logs/run1.log")
-    hash_log1 = get_file_hash("logs/run1.log")
-    
-    print(f"2. Running Simulation 2 (Seed={SEED})...")
-    state2 = run_simulation(SEED, "logs/run2.log")
-    hash_log2 = get_file_hash("logs/run2.log")
-    
+
+def check_files(seed, verbose):
+    os.makedirs("logs", exist_ok=True)
+
+    print(f"1. Running Simulation 1 (Seed={seed})...")
+    with quiet_output(not verbose):
+        state1 = run_simulation(seed, BinaryFileTraceSink("logs/run1.trace"))
+    hash_log1 = get_file_hash("logs/run1.trace")
+
+    print(f"2. Running Simulation 2 (Seed={seed})...")
+    with quiet_output(not verbose):
+        state2 = run_simulation(seed, BinaryFileTraceSink("logs/run2.trace"))
+    hash_log2 = get_file_hash("logs/run2.trace")
+
     print("\n--- RESULTS ---")
     print(f"Run 1 State Hash: {state1}")
     print(f"Run 2 State Hash: {state2}")
     print(f"Run 1 Log Hash:   {hash_log1}")
     print(f"Run 2 Log Hash:   {hash_log2}")
-    
+
     if state1 == state2 and hash_log1 == hash_log2:
         print("\n>>> SUCCESS: Determinism Verified! (10/10)")
     else:
-        print("\n>>> FAIL: Logs or State do not match.")
\ No newline at end of file
+        print("\n>>> FAIL: Logs or State do not match.")
+
+
+def check_stream(seed, args):
+    max_time = args.max_time or CONFIG.get("simulation", {}).get("max_time", 5.0)
+    print(f"Running {args.runs} simulations in parallel (Seed={seed}, max time {max_time}s, "
+          f"checkpoint every {args.every} records)...")
+    run = functools.partial(stream_run, seed=seed, max_time=max_time, diverge_at=args.diverge_at)
+    start = time.perf_counter()
+    report = check_determinism(run, runs=args.runs, checkpoint_every=args.every, context=args.context,
+                               quiet=not args.verbose)
+    elapsed = time.perf_counter() - start
+
+    print("\n--- RESULTS ---")
+    print(f"Compared {report['records']} records over {report['checkpoints']} checkpoints in {elapsed:.2f}s")
+    divergence = report["divergence"]
+    if divergence is None:
+        for i, (state, digest) in enumerate(zip(report["summaries"], report["digests"]), 1):
+            print(f"Run {i} State Hash: {state}")
+            print(f"Run {i} Log Hash:   {digest}")
+    else:
+        print(f"First divergence at record #{divergence['index']}:")
+        for i, lines in enumerate(divergence["context"], 1):
+            print(f"Run {i}:")
+            for line in lines:
+                print(f"  {line}")
+
+    if report["identical"]:
+        print("\n>>> SUCCESS: Determinism Verified! (10/10)")
+    elif divergence is None:
+        print("\n>>> FAIL: Traces match but State does not.")
+    else:
+        print("\n>>> FAIL: Traces diverge.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stream", action="store_true", help="Hash trace theo luồng, các lần chạy song song")
+    parser.add_argument("--runs", type=int, default=2, help="Số lần chạy (--stream)")
+    parser.add_argument("--max-time", type=float, default=None, help="Thời gian mô phỏng (--stream), mặc định theo CONFIG")
+    parser.add_argument("--every", type=int, default=10000, help="Số record giữa hai checkpoint (--stream)")
+    parser.add_argument("--context", type=int, default=5, help="Số record in quanh chỗ lệch (--stream)")
+    parser.add_argument("--diverge-at", type=float, default=None, help="Demo: lần chạy 2 lệch từ thời điểm này")
+    parser.add_argument("--verbose", action="store_true", help="In log của node")
+    args = parser.parse_args()
+
+    print("--- DETERMINISM CHECK SCRIPT ---")
+    seed = CONFIG.get("simulation", {}).get("seed", 123456)
+    if args.stream:
+        check_stream(seed, args)
+    else:
+        check_files(seed, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
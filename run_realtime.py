@@ -0,0 +1,153 @@
+"""
+Chạy Node trên runtime thời gian thực (asyncio + TCP/UDP loopback hoặc shared memory) và đo độ trễ
+finality, throughput theo wall-clock.
+
+Ví dụ:
+    python run_realtime.py --nodes 4 --duration 5 --tps 50
+    python run_realtime.py --nodes 4 --transport udp --drop 0.05 --delay 0.01 --jitter 0.005
+    python run_realtime.py --nodes 4 --processes --base-port 47100
+    python run_realtime.py --nodes 4 --processes --transport shm
+--processes chạy mỗi node trong một process riêng (TCP/UDP cần --base-port cố định).
+"""
+import argparse
+import asyncio
+import copy
+import multiprocessing
+import time
+
+from config.node_config import CONFIG
+from src.runner import build_realtime_network, node_names
+from src.shm_ring import ShmFabric
+from src.utils import quiet_output
+
+
+def make_config(args) -> dict:
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    config["consensus"]["retry_count"] = args.retry_count
+    config["realtime"].update({
+        "transport": args.transport,
+        "base_port": args.base_port,
+        "impairments": {"drop_prob": args.drop, "delay": args.delay, "jitter": args.jitter},
+    })
+    return config
+
+
+async def run_hosted(args, hosted=None, barrier=None, fabric=None) -> dict:
+    """Chạy các node `hosted` (None = tất cả) trong event loop này, trả về số đo của chúng"""
+    config = make_config(args)
+    runtime, nodes = build_realtime_network(args.nodes, seed=args.seed, config=config,
+                                            key_prefix="realtime", hosted=hosted, fabric=fabric)
+    local = [n for n in nodes if n.node_id in runtime.nodes]
+    await runtime.start()
+    if barrier is not None:
+        # Mọi process đã mở listener và kết nối xong mới bắt đầu consensus
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    async def submit_load():
+        # TX (key thuộc sở hữu của node tạo) gửi vòng tròn tới các node, nhịp đều theo --tps
+        if args.tps <= 0:
+            return
+        interval = 1.0 / args.tps
+        i = 0
+        while True:
+            node = local[i % len(local)]
+            node.create_transaction(f"{node.key_pair.pub_key_str}/{i}", str(i))
+            i += 1
+            await asyncio.sleep(interval)
+
+    start = time.perf_counter()
+    for n in local:
+        n.start_consensus()
+    load = asyncio.create_task(submit_load())
+    await runtime.run(args.duration)
+    load.cancel()
+    elapsed = time.perf_counter() - start
+    await runtime.close()
+
+    result = {"elapsed": elapsed, "stats": dict(runtime.stats), "nodes": {}}
+    for n in local:
+        latencies = [n.finalize_times[h] - n.height_start_times[h]
+                     for h in n.finalize_times if h in n.height_start_times]
+        result["nodes"][n.node_id] = {
+            "height": n.finalized_height,
+            "latencies": latencies,
+            "txs": sum(len(block.txs) for block in n.blocks.values()),
+        }
+    return result
+
+
+def process_main(args, node_id, barrier, results, fabric):
+    with quiet_output(not args.verbose):
+        result = asyncio.run(run_hosted(args, hosted={node_id}, barrier=barrier, fabric=fabric))
+    results.put(result)
+
+
+def merge(results: list) -> dict:
+    merged = {"elapsed": max(r["elapsed"] for r in results), "stats": {}, "nodes": {}}
+    for r in results:
+        for key, value in r["stats"].items():
+            merged["stats"][key] = merged["stats"].get(key, 0) + value
+        merged["nodes"].update(r["nodes"])
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--transport", choices=["tcp", "udp", "shm"], default="tcp")
+    parser.add_argument("--duration", type=float, default=5.0, help="Giây wall-clock")
+    parser.add_argument("--tps", type=float, default=50.0, help="TX gửi vào mỗi giây (0 = block rỗng)")
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--delay", type=float, default=0.0, help="Độ trễ thêm mỗi frame (giây)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--retry-count", type=int, default=1, help="Số bản gửi mỗi broadcast")
+    parser.add_argument("--processes", action="store_true", help="Mỗi node một process")
+    parser.add_argument("--base-port", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="In log của node")
+    args = parser.parse_args()
+
+    if args.processes:
+        if args.transport != "shm" and not args.base_port:
+            parser.error("--processes requires --base-port")
+        # Ring shared memory phải có trước khi fork để mọi process cùng thấy
+        fabric = ShmFabric(node_names(args.nodes)) if args.transport == "shm" else None
+        ctx = multiprocessing.get_context("fork")
+        barrier = ctx.Barrier(args.nodes)
+        results = ctx.Queue()
+        procs = [ctx.Process(target=process_main, args=(args, name, barrier, results, fabric))
+                 for name in node_names(args.nodes)]
+        for p in procs:
+            p.start()
+        collected = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        if fabric is not None:
+            fabric.close()
+        result = merge(collected)
+    else:
+        with quiet_output(not args.verbose):
+            result = asyncio.run(run_hosted(args))
+
+    elapsed = result["elapsed"]
+    stats = result["stats"]
+    nodes = result["nodes"]
+    latencies = [l for n in nodes.values() for l in n["latencies"]]
+    heights = [n["height"] for n in nodes.values()]
+    committed = max(n["txs"] for n in nodes.values())
+    mode = f"{args.nodes} processes" if args.processes else "1 process"
+    print(f"{args.nodes} nodes over {args.transport} ({mode}), {elapsed:.2f}s wall, "
+          f"drop {args.drop} delay {args.delay}s jitter {args.jitter}s")
+    print(f"finalized height min {min(heights)} max {max(heights)}")
+    if latencies:
+        latencies.sort()
+        print(f"finality latency mean {sum(latencies) / len(latencies) * 1000:.1f} ms  "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms  max {latencies[-1] * 1000:.1f} ms")
+    print(f"committed {committed} txs ({committed / elapsed:.1f} tx/s)")
+    print(f"frames {stats['frames_sent']} ({stats['frames_sent'] / elapsed:.0f}/s), "
+          f"{stats['bytes_sent'] / elapsed / 1e6:.2f} MB/s, dropped {stats['dropped']}, delivered {stats['delivered']}")
+
+
+if __name__ == "__main__":
+    main()
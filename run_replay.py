@@ -0,0 +1,112 @@
+"""
+Ghi trace replay của một lần chạy mô phỏng rồi replay nó (không Ed25519, không mô phỏng mạng).
+
+Ví dụ:
+    python run_replay.py --nodes 8 --drop 0.1 --until 30 --trace logs/replay/chaos.rpl
+    python run_replay.py --replay logs/replay/chaos.rpl --verbose
+Mặc định: chạy thường (không ghi) để lấy thời gian gốc, chạy lại có ghi trace, replay trace,
+so trạng thái cuối của mọi node và in thời gian từng lần.
+--replay chỉ replay một trace có sẵn và in height / state hash của các node.
+"""
+import argparse
+import copy
+import os
+import time
+
+from config.node_config import CONFIG
+from src.replay import TraceRecorder, TraceReplayer, read_replay_meta
+from src.runner import build_network
+from src.utils import quiet_output
+
+
+def final_state(nodes: dict) -> dict:
+    return {
+        node_id: (n.finalized_height, n.state_machine.get_state_hash(), n.round,
+                  [n.blocks[h].get_hash() for h in sorted(n.blocks)])
+        for node_id, n in nodes.items()
+    }
+
+
+def simulate(args, trace_path=None):
+    """Chạy mô phỏng tới --until; có trace_path thì ghi trace replay. Trả về (sim, giây, recorder)."""
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    network_config = {"drop_prob": args.drop, "duplicate_prob": args.duplicate}
+    sim, nodes = build_network(args.nodes, seed=args.seed, network_config=network_config, config=config,
+                               key_prefix="replay")
+    start = time.perf_counter()
+    recorder = None
+    if trace_path:
+        recorder = TraceRecorder(trace_path, sim, meta={"seed": args.seed, "until": args.until})
+        call = recorder.call
+    else:
+        call = lambda node_id, method, *a: getattr(sim.nodes[node_id], method)(*a)
+    for i, n in enumerate(nodes):
+        call(n.node_id, "create_transaction", f"{n.key_pair.pub_key_str}/k{i}", f"v{i}")
+    for n in nodes:
+        call(n.node_id, "start_consensus")
+    sim.run_until(args.until)
+    if recorder is not None:
+        recorder.close()
+    return sim, time.perf_counter() - start, recorder
+
+
+def replay(path: str, verbose: bool):
+    start = time.perf_counter()
+    replayer = TraceReplayer(path)
+    loaded = time.perf_counter() - start
+    with quiet_output(not verbose):
+        replayer.run()
+    return replayer, loaded, time.perf_counter() - start
+
+
+def replay_only(args):
+    meta = read_replay_meta(args.replay)
+    replayer, loaded, elapsed = replay(args.replay, args.verbose)
+    print(f"replayed {args.replay}: {replayer.events} events, {replayer.calls} calls, "
+          f"{replayer.verifies} verifies, {replayer.signs} signatures from t={meta['time']:.2f}s "
+          f"in {elapsed:.3f}s (load {loaded:.3f}s)")
+    for node_id, n in replayer.nodes.items():
+        print(f"  {node_id}: height {n.finalized_height} round {n.round} "
+              f"state {n.state_machine.get_state_hash()[:16]} t={replayer.engine.current_time:.2f}s")
+
+
+def record_and_replay(args):
+    os.makedirs(os.path.dirname(args.trace) or ".", exist_ok=True)
+    with quiet_output(not args.verbose):
+        _, plain, _ = simulate(args)
+        sim, recording, recorder = simulate(args, args.trace)
+    replayer, loaded, elapsed = replay(args.trace, args.verbose)
+
+    heights = [n.finalized_height for n in sim.nodes.values()]
+    print(f"{args.nodes} nodes, {args.until}s simulated, {sim.processed_events} events, "
+          f"height min {min(heights)} max {max(heights)}")
+    print(f"trace {args.trace}: {os.path.getsize(args.trace) / 1024:.0f} KiB, {recorder.events} node events, "
+          f"{replayer.verifies} verifies, {replayer.signs} signatures")
+    print(f"simulate:             {plain:8.3f}s")
+    print(f"simulate + record:    {recording:8.3f}s")
+    print(f"replay:               {elapsed:8.3f}s (load {loaded:.3f}s) -> {plain / elapsed:.1f}x faster than simulate")
+    same = final_state(replayer.nodes) == final_state(sim.nodes)
+    print(">>> SUCCESS: replay reached the same final state" if same else ">>> FAILURE: final states differ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drop", type=float, default=0.1)
+    parser.add_argument("--duplicate", type=float, default=0.05)
+    parser.add_argument("--until", type=float, default=30.0, help="Thời điểm mô phỏng dừng (giây)")
+    parser.add_argument("--trace", default="logs/replay/run.rpl", help="File trace replay được ghi")
+    parser.add_argument("--replay", default=None, help="Chỉ replay file trace này")
+    parser.add_argument("--verbose", action="store_true", help="In log của node")
+    args = parser.parse_args()
+
+    if args.replay:
+        replay_only(args)
+    else:
+        record_and_replay(args)
+
+
+if __name__ == "__main__":
+    main()
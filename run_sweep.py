@@ -0,0 +1,70 @@
+"""
+Chạy Monte Carlo sweep theo seed và lưới drop_prob / max_delay trên nhiều process.
+
+Ví dụ:
+    python run_sweep.py --seeds 100 --drop 0.0,0.1,0.2 --max-delay 0.1,0.5 --out logs/sweep.jsonl
+Chạy lại cùng lệnh sau khi bị ngắt sẽ bỏ qua các run đã có trong --out.
+"""
+import argparse
+import os
+import time
+
+from src.result_cache import ResultCache, DEFAULT_CACHE_DIR
+from src.sweep import expand_grid, point_key, run_sweep, load_results, summarize, format_table
+
+
+def parse_floats(text):
+    return [float(x) for x in text.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, default=20, help="Số seed cho mỗi điểm cấu hình")
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--drop", type=parse_floats, default=[0.0, 0.1, 0.2])
+    parser.add_argument("--max-delay", type=parse_floats, default=[0.1])
+    parser.add_argument("--nodes", type=int, default=None, help="Số node (mặc định theo CONFIG)")
+    parser.add_argument("--max-time", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="logs/sweep.jsonl", help="File JSONL kết quả (dùng để resume)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Thư mục cache kết quả theo config + mã nguồn")
+    parser.add_argument("--cache-max-mb", type=float, default=256)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    axes = {"drop_prob": args.drop, "max_delay": args.max_delay, "max_time": [args.max_time]}
+    if args.nodes:
+        axes["num_nodes"] = [args.nodes]
+    points = expand_grid(range(args.seed_start, args.seed_start + args.seeds), **axes)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    already = len(load_results(args.out))
+    print(f"{len(points)} runs ({already} already in {args.out}), {args.workers} workers")
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+
+    start = time.perf_counter()
+    count = 0
+    for result in run_sweep(points, args.out, args.workers, cache=cache):
+        count += 1
+        p = result["point"]
+        finality = "-" if result["mean_finality"] is None else f"{result['mean_finality']:.3f}"
+        print(f"[{count}] seed={p['seed']} drop={p['drop_prob']} max_delay={p['max_delay']} "
+              f"height={result['min_height']} finality={finality} "
+              f"msgs={result['messages']} violations={result['safety_violations']}"
+              f"{' (cached)' if result.get('cached') else ''}")
+    elapsed = time.perf_counter() - start
+    if count:
+        print(f"{count} runs in {elapsed:.1f}s -> {count / elapsed:.2f} runs/s")
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses ({args.cache_dir})")
+
+    # Bảng tổng hợp gồm cả kết quả của lần chạy trước (resume), chỉ lấy các điểm của sweep này
+    wanted = {point_key(p) for p in points}
+    results = [r for key, r in load_results(args.out).items() if key in wanted]
+    print()
+    print(format_table(summarize(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# src/checkpoint.py
+"""
+Checkpoint / resume toàn bộ Simulator: hàng đợi sự kiện, timer, RNG của mọi link,
+rate limiter, body đang giữ và mọi Node (StateMachine, ConsensusEngine, mempool...).
+Chạy tiếp từ checkpoint cho đúng chuỗi sự kiện (và trace) như lần chạy không bị ngắt.
+
+Định dạng file:
+    MAGIC | HEADER (flags, độ dài meta, độ dài sink, độ dài sim) | meta | sink | sim
+  - meta: JSON đơn định (thời điểm, số sự kiện, height của từng node + meta của người gọi),
+    đọc được mà không phải nạp cả simulation (read_checkpoint_meta).
+  - sink: trace sink của Simulator (pickle). BinaryFileTraceSink chỉ lưu đường dẫn,
+    độ dài file và bảng tên; khi nạp, file trace được cắt về độ dài lúc checkpoint rồi ghi tiếp.
+  - sim: Simulator cùng mọi Node (pickle, protocol cao nhất).
+  sink và sim được nén zlib mức 1 (nhanh; trạng thái lặp lại nhiều public key / hash).
+Checkpoint chỉ lấy giữa hai lần run / run_until. Chỉ nạp file tự tạo: pickle chạy được mã tùy ý.
+"""
+import json
+import os
+import pickle
+import struct
+import zlib
+
+from src.utils import deterministic_encode
+
+MAGIC = b"L1CKPT01"
+HEADER = struct.Struct("<BQQQ")  # flags, len(meta), len(sink), len(sim)
+FLAG_ZLIB = 1
+VERSION = 1
+
+
+def save_checkpoint(sim, path: str, meta: dict = None, compress: bool = True) -> int:
+    """Ghi checkpoint của `sim` ra `path` (ghi file tạm rồi đổi tên). Trả về số byte."""
+    info = {
+        "version": VERSION,
+        "time": sim.current_time,
+        "processed_events": sim.processed_events,
+        "pending_events": sim.pending_event_count(),
+        "heights": {node_id: getattr(node, "finalized_height", None) for node_id, node in sim.nodes.items()},
+    }
+    info.update(meta or {})
+    meta_bytes = deterministic_encode(info)
+    sink_bytes = pickle.dumps(sim.trace_sink, protocol=pickle.HIGHEST_PROTOCOL)
+    sim_bytes = pickle.dumps(sim, protocol=pickle.HIGHEST_PROTOCOL)
+    flags = 0
+    if compress:
+        sink_bytes = zlib.compress(sink_bytes, 1)
+        sim_bytes = zlib.compress(sim_bytes, 1)
+        flags |= FLAG_ZLIB
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(flags, len(meta_bytes), len(sink_bytes), len(sim_bytes)))
+        f.write(meta_bytes)
+        f.write(sink_bytes)
+        f.write(sim_bytes)
+    os.replace(tmp_path, path)
+    return len(MAGIC) + HEADER.size + len(meta_bytes) + len(sink_bytes) + len(sim_bytes)
+
+
+def _read_header(f, path: str):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint file")
+    return HEADER.unpack(f.read(HEADER.size))
+
+
+def read_checkpoint_meta(path: str) -> dict:
+    """Chỉ đọc phần meta của checkpoint"""
+    with open(path, "rb") as f:
+        _, meta_len, _, _ = _read_header(f, path)
+        return json.loads(f.read(meta_len))
+
+
+def load_checkpoint(path: str, trace_sink=None):
+    """
+    Nạp Simulator (kèm các Node) từ checkpoint; các node lấy qua sim.nodes.
+    trace_sink: sink cho phần chạy tiếp; mặc định dùng lại sink đã lưu trong checkpoint.
+    """
+    with open(path, "rb") as f:
+        flags, meta_len, sink_len, sim_len = _read_header(f, path)
+        f.seek(meta_len, os.SEEK_CUR)
+        sink_bytes = f.read(sink_len)
+        sim_bytes = f.read(sim_len)
+    if len(sim_bytes) != sim_len:
+        raise ValueError(f"{path} is truncated")
+    if flags & FLAG_ZLIB:
+        sim_bytes = zlib.decompress(sim_bytes)
+    sim = pickle.loads(sim_bytes)
+    if trace_sink is None:
+        if flags & FLAG_ZLIB:
+            sink_bytes = zlib.decompress(sink_bytes)
+        trace_sink = pickle.loads(sink_bytes)
+    sim.set_trace_sink(trace_sink)
+    return sim
@@ -1,5 +1,15 @@
 from collections import defaultdict
 
+# Hàm tạo có tên thay cho lambda để ConsensusEngine pickle được (checkpoint)
+def _voter_sets():
+    return defaultdict(set)            # {block_hash hoặc round: {voter}}
+
+def _phase_votes():
+    return defaultdict(_voter_sets)    # {phase: {block_hash: {voter}}}
+
+def _round_votes():
+    return defaultdict(_phase_votes)   # {round: {phase: ...}}
+
 class ConsensusEngine:
     def __init__(self, node_id, validators):
         self.node_id = node_id
@@ -8,13 +18,19 @@ class ConsensusEngine:
         # Ngưỡng đồng thuận: > 2/3 (Strict Majority)
         self.threshold = (self.n * 2) // 3 + 1
         
-        # Kho lưu trữ phiếu bầu: votes[height][phase][block_hash] = {voter1, voter2}
-        # Dùng set để tự động loại bỏ phiếu trùng lặp từ cùng 1 người
-        self.votes = defaultdict(lambda: defaultdict(lambda: defaultdict(set)))
+        # Kho lưu trữ phiếu bầu: votes[height][round][phase][block_hash] = {voter1, voter2}
+        # Dùng set để tự động loại bỏ phiếu trùng lặp từ cùng 1 người. block_hash None = vote nil
+        self.votes = defaultdict(_round_votes)
+        # Các validator đã gửi vote bất kỳ trong (height, round), dùng để nhảy round
+        self.round_voters = defaultdict(_voter_sets)
         
         # Trạng thái hiện tại
         self.current_height = 1
-        self.locked_block = None # Block mình đã vote (để đảm bảo Safety)
+        self.locked_block = None # Block mình đã precommit (để đảm bảo Safety)
+        self.locked_round = -1
+        # Block gần nhất có 2/3 PREVOTE (polka), proposer sẽ đề xuất lại block này
+        self.valid_block = None
+        self.valid_round = -1
 
     def add_vote(self, vote) -> bool:
         """
@@ -26,13 +42,70 @@ class ConsensusEngine:
             return False
             
         # Lưu phiếu
-        self.votes[vote.height][vote.type][vote.block_hash].add(vote.voter)
+        self.votes[vote.height][vote.round][vote.type][vote.block_hash].add(vote.voter)
+        self.round_voters[vote.height][vote.round].add(vote.voter)
         return True
 
-    def check_threshold(self, height, phase, block_hash) -> bool:
-        """Kiểm tra xem block_hash ở phase này đã đủ phiếu chưa"""
-        count = len(self.votes[height][phase][block_hash])
+    def check_threshold(self, height, phase, block_hash, round=0) -> bool:
+        """Kiểm tra xem block_hash ở phase này (trong round) đã đủ phiếu chưa"""
+        count = len(self.votes[height][round][phase][block_hash])
         return count >= self.threshold
 
+    def count_phase_votes(self, height, round, phase) -> int:
+        """Số validator khác nhau đã vote (cho block bất kỳ hoặc nil) ở phase trong round"""
+        voters = set()
+        for block_voters in self.votes[height][round][phase].values():
+            voters |= block_voters
+        return len(voters)
+
+    def quorum_block(self, height, round, phase):
+        """Block (khác nil) có đủ 2/3 phiếu ở phase trong round, None nếu chưa có"""
+        for block_hash, voters in self.votes[height][round][phase].items():
+            if block_hash is not None and len(voters) >= self.threshold:
+                return block_hash
+        return None
+
+    def committed_block(self, height):
+        """Block có đủ 2/3 PRECOMMIT ở round bất kỳ của height"""
+        for round in self.votes[height]:
+            block_hash = self.quorum_block(height, round, "PRECOMMIT")
+            if block_hash is not None:
+                return block_hash
+        return None
+
+    def round_voter_count(self, height, round) -> int:
+        return len(self.round_voters[height][round])
+
+    def max_faulty(self) -> int:
+        """Số validator lỗi tối đa f mà ngưỡng hiện tại chịu được"""
+        return self.n - self.threshold
+
+    def lock(self, block_hash, round):
+        self.locked_block = block_hash
+        self.locked_round = round
+
+    def can_prevote(self, height, round, block_hash) -> bool:
+        """
+        Quy tắc khóa: chỉ prevote block khác block đã khóa nếu đã thấy 2/3 PREVOTE
+        cho block đó ở một round sau round khóa (trước round hiện tại).
+        """
+        if self.locked_block is None or self.locked_block == block_hash:
+            return True
+        for vr in range(self.locked_round + 1, round):
+            if self.check_threshold(height, "PREVOTE", block_hash, vr):
+                return True
+        return False
+
+    def start_height(self, height):
+        """Sang height mới: bỏ khóa và phiếu của các height cũ"""
+        self.current_height = height
+        self.locked_block = None
+        self.locked_round = -1
+        self.valid_block = None
+        self.valid_round = -1
+        for old_height in [h for h in self.votes if h < height]:
+            del self.votes[old_height]
+            self.round_voters.pop(old_height, None)
+
     def get_voting_power(self):
-        return self.n
\ No newline at end of file
+        return self.n
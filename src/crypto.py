@@ -1,3 +1,5 @@
+import hashlib
+import os
 import nacl.signing
 import nacl.encoding
 import nacl.exceptions
@@ -37,4 +39,82 @@ def verify_signature(pub_key_hex: str, message: dict, signature_hex: str, contex
         verify_key.verify(full_payload, bytes.fromhex(signature_hex))
         return True
     except (nacl.exceptions.BadSignatureError, ValueError):
-        return False
\ No newline at end of file
+        return False
+
+
+class Blake2KeyPair:
+    """
+    Cặp khóa giả của Blake2MockProvider: public key = BLAKE2b(seed), chữ ký = BLAKE2b có khóa
+    là public key trên context + message. Cùng độ dài với Ed25519 (32 / 64 byte) nên kích thước
+    tin nhắn không đổi. KHÔNG an toàn: ai biết public key cũng ký được, chỉ dùng cho mô phỏng.
+    """
+
+    def __init__(self, seed_bytes: bytes = None):
+        seed = seed_bytes or os.urandom(32)
+        self.pub_key = hashlib.blake2b(seed, digest_size=32, person=b"L1MOCKPUB").digest()
+        self.pub_key_str = self.pub_key.hex()
+
+    def sign(self, message: dict, context: str) -> str:
+        return _blake2_signature(self.pub_key, message, context)
+
+
+def _blake2_signature(pub_key: bytes, message: dict, context: str) -> str:
+    full_payload = context.encode('utf-8') + deterministic_encode(message)
+    return hashlib.blake2b(full_payload, digest_size=64, key=pub_key).hexdigest()
+
+
+def verify_blake2_signature(pub_key_hex: str, message: dict, signature_hex: str, context: str) -> bool:
+    """Kiểm chữ ký của Blake2KeyPair (vẫn tách theo context và từ chối chữ ký sai / sửa tin)"""
+    try:
+        pub_key = bytes.fromhex(pub_key_hex)
+    except (TypeError, ValueError):
+        return False
+    if len(pub_key) != 32:
+        return False
+    return _blake2_signature(pub_key, message, context) == signature_hex
+
+
+class CryptoProvider:
+    """
+    Interface: tạo cặp khóa (có pub_key_str và sign(message, context) -> chữ ký hex)
+    và kiểm chữ ký verify(pub_key_hex, message, signature_hex, context) -> bool.
+    Node chọn provider theo config["crypto"]["provider"] (get_provider).
+    """
+    name = None
+
+    def key_pair(self, seed_bytes: bytes = None):
+        raise NotImplementedError
+
+    def verify(self, pub_key_hex: str, message: dict, signature_hex: str, context: str) -> bool:
+        raise NotImplementedError
+
+
+class Ed25519Provider(CryptoProvider):
+    """Ed25519 thật (PyNaCl), mặc định"""
+    name = "ed25519"
+    verify = staticmethod(verify_signature)
+
+    def key_pair(self, seed_bytes: bytes = None):
+        return KeyPair(seed_bytes)
+
+
+class Blake2MockProvider(CryptoProvider):
+    """Chữ ký giả bằng BLAKE2b có khóa cho mô phỏng lớn: rẻ hơn Ed25519 hàng trăm lần"""
+    name = "blake2-mock"
+    verify = staticmethod(verify_blake2_signature)
+
+    def key_pair(self, seed_bytes: bytes = None):
+        return Blake2KeyPair(seed_bytes)
+
+
+PROVIDERS = {
+    Ed25519Provider.name: Ed25519Provider,
+    Blake2MockProvider.name: Blake2MockProvider,
+}
+
+
+def get_provider(name: str = "ed25519") -> CryptoProvider:
+    """Provider theo tên trong PROVIDERS"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown crypto provider: {name!r} (expected one of {sorted(PROVIDERS)})")
+    return PROVIDERS[name]()
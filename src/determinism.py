@@ -0,0 +1,171 @@
+# src/determinism.py
+"""
+Kiểm tra tính đơn định theo luồng: chạy N lần cùng một mô phỏng trong N process song song,
+mỗi lần hash trace ngay khi record được tạo (HashingTraceSink), không ghi log ra đĩa.
+
+Các process chạy lock-step theo checkpoint: cứ mỗi `checkpoint_every` record, mỗi process
+gửi (số record, hash cuốn chiếu) cho coordinator rồi chờ lệnh.
+  - Mọi hash bằng nhau -> chạy tiếp (mỗi checkpoint tốn một vòng Pipe).
+  - Khác nhau, hoặc một lần chạy kết thúc sớm -> record lệch đầu tiên nằm trong cửa sổ
+    vừa xong; mỗi process gửi các record của cửa sổ đó (và cửa sổ trước, để có ngữ cảnh)
+    rồi dừng. Coordinator so từng record, báo chỉ số record lệch đầu tiên kèm các record
+    xung quanh của từng lần chạy.
+Bộ nhớ mỗi process tối đa 2 * checkpoint_every record, không phụ thuộc độ dài mô phỏng.
+
+`run(run_index, trace_sink)` dựng và chạy mô phỏng với trace sink cho trước, trả về
+một tóm tắt (pickle được, vd. state hash) để so giữa các lần chạy; phải là hàm top-level.
+"""
+import contextlib
+import multiprocessing
+
+from src.trace import HashingTraceSink, format_record
+from src.utils import quiet_output
+
+MSG_CHECKPOINT = "CHECKPOINT"
+MSG_END = "END"
+MSG_ERROR = "ERROR"
+CMD_GO = "GO"
+CMD_DETAIL = "DETAIL"
+
+
+class _Stop(BaseException):
+    """
+    Dừng mô phỏng của process này (đã thấy lệch hoặc coordinator đã đóng Pipe).
+    BaseException để không bị `except Exception` trong handler của node nuốt mất.
+    """
+
+
+def check_determinism(run, runs: int = 2, checkpoint_every: int = 10000, context: int = 5,
+                      quiet: bool = True) -> dict:
+    """
+    Chạy `run` `runs` lần song song và so trace theo checkpoint. Trả về dict:
+      identical    trace và tóm tắt của mọi lần chạy giống nhau
+      records      số record đã so (tới checkpoint cuối cùng giống nhau, hoặc toàn bộ)
+      checkpoints  số checkpoint đã so
+      digests      hash trace cuối của từng lần chạy (None nếu dừng giữa chừng)
+      summaries    giá trị `run` trả về (None nếu dừng giữa chừng)
+      divergence   None, hoặc {"index", "records": [record của từng lần chạy tại index],
+                   "context": [[dòng trace quanh index] của từng lần chạy]}
+    """
+    ctx = multiprocessing.get_context()
+    conns, procs = [], []
+    for run_index in range(runs):
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_worker, args=(child, run, run_index, checkpoint_every, quiet), daemon=True)
+        proc.start()
+        child.close()
+        conns.append(parent)
+        procs.append(proc)
+
+    report = {"identical": False, "records": 0, "checkpoints": 0, "digests": [None] * runs,
+              "summaries": [None] * runs, "divergence": None}
+    try:
+        replies = [conn.recv() for conn in conns]
+        while True:
+            errors = [reply[1] for reply in replies if reply[0] == MSG_ERROR]
+            if errors:
+                raise RuntimeError(f"run failed: {errors[0]}")
+            kinds = {reply[0] for reply in replies}
+            positions = {reply[1:3] for reply in replies}  # (số record, hash)
+            if len(kinds) == 1 and len(positions) == 1:
+                count, _ = positions.pop()
+                report["records"] = count
+                if kinds == {MSG_CHECKPOINT}:
+                    report["checkpoints"] += 1
+                    for conn in conns:
+                        conn.send(CMD_GO)
+                    replies = [conn.recv() for conn in conns]
+                    continue
+                report["digests"] = [reply[2] for reply in replies]
+                report["summaries"] = [reply[3] for reply in replies]
+                report["identical"] = len({repr(s) for s in report["summaries"]}) == 1
+                for conn in conns:
+                    conn.send(CMD_GO)
+                break
+
+            # Lệch trong cửa sổ vừa xong: lấy record của cửa sổ từ mọi process
+            for run_index, reply in enumerate(replies):
+                if reply[0] == MSG_END:
+                    report["summaries"][run_index] = reply[3]
+            for conn in conns:
+                conn.send(CMD_DETAIL)
+            windows = [conn.recv() for conn in conns]
+            report["divergence"] = locate_divergence(windows, context)
+            break
+    finally:
+        for conn in conns:
+            conn.close()
+        for proc in procs:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+    return report
+
+
+def locate_divergence(windows, context: int = 5) -> dict:
+    """
+    windows: [(chỉ số record đầu, các record)] của từng lần chạy (HashingTraceSink.window).
+    Tìm chỉ số record đầu tiên khác nhau (hoặc một lần chạy đã hết record).
+    """
+    start = max(first for first, _ in windows)
+    end = max(first + len(records) for first, records in windows)
+
+    def record_at(window, index):
+        first, records = window
+        offset = index - first
+        return records[offset] if 0 <= offset < len(records) else None
+
+    index = start
+    while index < end and len({record_at(w, index) for w in windows}) == 1:
+        index += 1
+    if index >= end:
+        # Cửa sổ khớp hết: lệch nằm trước phần còn giữ (không xảy ra khi chạy lock-step)
+        index = start
+
+    lines = []
+    for window in windows:
+        run_lines = []
+        for i in range(max(window[0], index - context), index + context + 1):
+            record = record_at(window, i)
+            if record is None:
+                if i >= window[0] + len(window[1]):
+                    run_lines.append(f"{'>>' if i == index else '  '} #{i} <end of trace>")
+                    break
+                continue
+            run_lines.append(f"{'>>' if i == index else '  '} #{i} {format_record(record)}")
+        lines.append(run_lines)
+    return {"index": index, "records": [record_at(w, index) for w in windows], "context": lines}
+
+
+def _worker(conn, run, run_index: int, checkpoint_every: int, quiet: bool):
+    """Process con: chạy `run` với HashingTraceSink, báo hash ở mỗi checkpoint và chờ lệnh"""
+
+    def send_window(sink):
+        conn.send(sink.window())
+
+    def on_checkpoint(sink):
+        try:
+            conn.send((MSG_CHECKPOINT, sink.count, sink.digest()))
+            command = conn.recv()
+            if command == CMD_DETAIL:
+                send_window(sink)
+        except (EOFError, OSError):
+            raise _Stop()
+        if command == CMD_DETAIL:
+            raise _Stop()
+
+    sink = HashingTraceSink(checkpoint_every, on_checkpoint)
+    try:
+        with quiet_output(quiet):
+            summary = run(run_index, sink)
+        conn.send((MSG_END, sink.count, sink.digest(), summary))
+        if conn.recv() == CMD_DETAIL:
+            send_window(sink)
+    except _Stop:
+        pass
+    except Exception as e:
+        # Coordinator có thể đã đóng Pipe (lần chạy khác lỗi trước)
+        with contextlib.suppress(OSError):
+            conn.send((MSG_ERROR, repr(e)))
+    finally:
+        conn.close()
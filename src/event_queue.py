@@ -0,0 +1,139 @@
+# src/event_queue.py
+"""
+Hàng đợi sự kiện tin nhắn của Simulator.
+
+Phần tử là tuple (time, seq, ...) với seq duy nhất, nên mọi hàng đợi ở đây
+trả ra cùng một thứ tự: tăng dần theo (time, seq).
+
+- HeapEventQueue: binary heap (heapq), O(log n) mỗi thao tác.
+- CalendarEventQueue: chia thời gian thành bucket rộng `bucket_width`.
+  Push append vào list của bucket (O(1)); tìm bucket kế tiếp bằng cách quét
+  lần lượt các số bucket sau bucket vừa xong (O(1) khi độ trễ chỉ trải trên vài
+  bucket). Bucket được sort một lần khi tới lượt (O(k log k) với k sự kiện trong
+  bucket, không phụ thuộc tổng số sự kiện đang chờ) rồi pop tuần tự.
+  Khi bucket_width <= min_delay, tin nhắn mới luôn rơi vào bucket sau bucket
+  hiện tại; nếu không, nó được chèn vào bucket hiện tại bằng insort (O(k)).
+"""
+import heapq
+from bisect import insort
+from collections import deque
+from functools import partial
+
+
+class HeapEventQueue:
+    def __init__(self, **_):
+        self.heap = []
+        # Gọi thẳng hàm C của heapq, không qua method Python
+        self.push = partial(heapq.heappush, self.heap)
+        self.pop = partial(heapq.heappop, self.heap)
+
+    def push_many(self, entries):
+        heap = self.heap
+        entries = list(entries)
+        if len(entries) > len(heap):
+            # Lô lớn hơn heap hiện tại: heapify lại O(n) rẻ hơn từng heappush
+            heap.extend(entries)
+            heapq.heapify(heap)
+        else:
+            # Duyệt bằng map/deque để vòng lặp chạy ở tầng C
+            deque(map(self.push, entries), maxlen=0)
+
+    def peek_time(self):
+        """Thời điểm sự kiện sớm nhất, None nếu rỗng"""
+        heap = self.heap
+        return heap[0][0] if heap else None
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class CalendarEventQueue:
+    DEFAULT_BUCKET_WIDTH = 0.01
+    # Quét quá chừng này bucket rỗng liên tiếp thì nhảy thẳng tới bucket nhỏ nhất (O(số bucket))
+    MAX_SCAN = 64
+
+    def __init__(self, bucket_width: float = None, **_):
+        self.width = bucket_width or self.DEFAULT_BUCKET_WIDTH
+        self.buckets = {}         # {bucket_number: [entry, ...]} chưa sort
+        self.low = 0              # Mọi bucket_number trong self.buckets đều >= low
+        self.current = []         # Bucket đang xử lý, đã sort tăng dần
+        self.current_number = None
+        self.pos = 0              # Vị trí phần tử kế tiếp trong self.current
+        self.size = 0
+
+    def push(self, entry):
+        number = int(entry[0] // self.width)
+        self.size += 1
+        if number == self.current_number:
+            # Tin nhắn có độ trễ < bucket_width: chèn đúng vị trí trong bucket hiện tại
+            insort(self.current, entry, lo=self.pos)
+            return
+        if self.current_number is not None and number < self.current_number:
+            # peek_time() đã nhảy tới bucket tương lai (ví dụ khi timer chạy trước):
+            # trả phần chưa xử lý về lại bucket của nó để giữ đúng thứ tự
+            self.buckets[self.current_number] = self.current[self.pos:]
+            self.low = self.current_number
+            self.current = []
+            self.current_number = None
+            self.pos = 0
+        bucket = self.buckets.get(number)
+        if bucket is None:
+            self.buckets[number] = [entry]
+            if number < self.low:
+                self.low = number
+        else:
+            bucket.append(entry)
+
+    def push_many(self, entries):
+        deque(map(self.push, entries), maxlen=0)
+
+    def _advance(self) -> bool:
+        """Chuyển sang bucket khác rỗng kế tiếp, trả về False nếu hết sự kiện"""
+        buckets = self.buckets
+        if not buckets:
+            return False
+        number = self.low
+        end = number + self.MAX_SCAN
+        while number not in buckets:
+            number += 1
+            if number == end:
+                # Khoảng trống dài (ví dụ mạng rảnh tới timer kế tiếp)
+                number = min(buckets)
+                break
+        self.low = number + 1
+        current = buckets.pop(number)
+        current.sort()
+        self.current = current
+        self.current_number = number
+        self.pos = 0
+        return True
+
+    def peek_time(self):
+        if self.pos >= len(self.current) and not self._advance():
+            return None
+        return self.current[self.pos][0]
+
+    def pop(self):
+        if self.pos >= len(self.current) and not self._advance():
+            raise IndexError("pop from empty event queue")
+        entry = self.current[self.pos]
+        self.current[self.pos] = None  # Nhả tham chiếu tới message đã xử lý
+        self.pos += 1
+        self.size -= 1
+        return entry
+
+    def __len__(self):
+        return self.size
+
+
+SCHEDULERS = {
+    "heap": HeapEventQueue,
+    "calendar": CalendarEventQueue,
+}
+
+
+def make_event_queue(name: str = "heap", **options):
+    """Tạo hàng đợi theo tên trong SCHEDULERS"""
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler: {name!r} (expected one of {sorted(SCHEDULERS)})")
+    return SCHEDULERS[name](**options)
@@ -0,0 +1,72 @@
+# src/inbox.py
+"""
+Hộp thư phía receiver cho mô hình năng lực xử lý: tin nhắn tới được xếp vào
+hàng đợi theo lớp (consensus / block / tx), node lấy ra từng tin theo
+weighted round robin (kiểu "smooth" của nginx): lớp có trọng số cao được phục vụ
+thường xuyên hơn nhưng lớp thấp không bị bỏ đói hoàn toàn.
+"""
+from collections import deque
+
+from src.message_classes import CLASS_IDS, CLASS_NAMES
+
+
+class PriorityInbox:
+    def __init__(self, weights=None, limit: int = None):
+        """
+        weights: list trọng số theo lớp (chỉ số CLASS_*); None = một hàng FIFO chung.
+        limit: số tin tối đa mỗi hàng, tin tới khi hàng đầy bị bỏ.
+        """
+        self.weights = list(weights) if weights is not None else [1]
+        self.queues = [deque() for _ in self.weights]
+        self.current = [0] * len(self.weights)
+        self.limit = limit
+        self.fifo = weights is None
+        self.size = 0
+
+    def push(self, msg_class: int, item) -> bool:
+        """Xếp item vào hàng của lớp; trả về False nếu hàng đã đầy (item bị bỏ)"""
+        queue = self.queues[0 if self.fifo else msg_class]
+        if self.limit is not None and len(queue) >= self.limit:
+            return False
+        queue.append(item)
+        self.size += 1
+        return True
+
+    def pop(self):
+        """Item kế tiếp theo weighted round robin giữa các hàng khác rỗng"""
+        queues = self.queues
+        if self.fifo:
+            self.size -= 1
+            return queues[0].popleft()
+        current = self.current
+        best = None
+        total = 0
+        for cls, queue in enumerate(queues):
+            if queue:
+                weight = self.weights[cls]
+                current[cls] += weight
+                total += weight
+                if best is None or current[cls] > current[best]:
+                    best = cls
+        if best is None:
+            raise IndexError("pop from empty inbox")
+        current[best] -= total
+        self.size -= 1
+        return queues[best].popleft()
+
+    def __len__(self):
+        return self.size
+
+
+def class_weights(weights: dict):
+    """{"consensus": 8, "tx": 1} -> list theo CLASS_*; lớp không khai báo có trọng số 1"""
+    if weights is None:
+        return None
+    result = [1] * len(CLASS_NAMES)
+    for name, weight in weights.items():
+        if name not in CLASS_IDS:
+            raise ValueError(f"Unknown message class: {name!r} (expected one of {list(CLASS_NAMES)})")
+        if weight <= 0:
+            raise ValueError(f"Weight of {name!r} must be > 0")
+        result[CLASS_IDS[name]] = weight
+    return result
@@ -0,0 +1,25 @@
+# src/message_classes.py
+"""
+Phân loại tin nhắn theo lớp để áp ngân sách rate limit riêng:
+  - consensus: vote (PREVOTE/PRECOMMIT) và tin nhắn điều khiển khác,
+  - block: header, body, block đầy đủ, GET_BODY / GET_TXS / TXS,
+  - tx: giao dịch gossip.
+Chỉ số lớp nhỏ hơn là lớp ưu tiên hơn.
+"""
+CLASS_CONSENSUS = 0
+CLASS_BLOCK = 1
+CLASS_TX = 2
+
+CLASS_NAMES = ("consensus", "block", "tx")
+CLASS_IDS = {name: i for i, name in enumerate(CLASS_NAMES)}
+
+
+def classify(message: dict) -> int:
+    """Lớp của một tin nhắn thường (send_message / broadcast); phong bì BATCH chỉ chứa tin cùng lớp"""
+    if message.get("msg_type") == "BATCH":
+        return classify(message["messages"][0])
+    if "msg_type" in message or "txs" in message:
+        return CLASS_BLOCK
+    if "key" in message and "value" in message:
+        return CLASS_TX
+    return CLASS_CONSENSUS
@@ -3,6 +3,9 @@ from src.utils import get_hash
 from src.crypto import verify_signature, CTX_TX, CTX_BLOCK, CTX_VOTE
 
 class Transaction:
+    # Độ dài short ID (số ký tự hex) dùng trong compact block
+    SHORT_ID_LEN = 16
+
     def __init__(self, sender_pub: str, key: str, value: str, nonce: int, signature: str = ""):
         self.sender = sender_pub
         self.key = key
@@ -21,9 +24,16 @@ class Transaction:
             data["signature"] = self.signature
         return data
 
-    def validate(self) -> bool:
+    def validate(self, verify=verify_signature) -> bool:
         payload = self.to_dict(include_sig=False)
-        return verify_signature(self.sender, payload, self.signature, CTX_TX)
+        return verify(self.sender, payload, self.signature, CTX_TX)
+
+    def get_hash(self) -> str:
+        return get_hash(self.to_dict(include_sig=True))
+
+    def get_short_id(self) -> str:
+        """ID rút gọn của TX (tiền tố của hash), đủ để tra mempool khi dựng lại compact block"""
+        return self.get_hash()[:self.SHORT_ID_LEN]
 
 class Block:
     def __init__(self, height: int, parent_hash: str, txs: list, state_hash: str, proposer: str, signature: str = "", timestamp=None):
@@ -56,17 +66,20 @@ class Block:
     def get_hash(self) -> str:
         return get_hash(self.to_dict(include_sig=True))
 
-    def validate_signature(self) -> bool:
+    def validate_signature(self, verify=verify_signature) -> bool:
         payload = self.to_dict(include_sig=False)
-        return verify_signature(self.proposer, payload, self.signature, CTX_BLOCK)
+        return verify(self.proposer, payload, self.signature, CTX_BLOCK)
 
 class Vote:
     PREVOTE = "PREVOTE"
     PRECOMMIT = "PRECOMMIT"
+    # Vote nil: không ủng hộ block nào trong round này
+    NIL = None
 
-    def __init__(self, vote_type: str, height: int, block_hash: str, voter: str, signature: str = ""):
+    def __init__(self, vote_type: str, height: int, block_hash: str, voter: str, signature: str = "", round: int = 0):
         self.type = vote_type
         self.height = height
+        self.round = round
         self.block_hash = block_hash
         self.voter = voter
         self.signature = signature
@@ -75,6 +88,7 @@ class Vote:
         data = {
             "type": self.type,
             "height": self.height,
+            "round": self.round,
             "block_hash": self.block_hash,
             "voter": self.voter
         }
@@ -82,6 +96,6 @@ class Vote:
             data["signature"] = self.signature
         return data
 
-    def validate(self) -> bool:
+    def validate(self, verify=verify_signature) -> bool:
         payload = self.to_dict(include_sig=False)
-        return verify_signature(self.voter, payload, self.signature, CTX_VOTE)
\ No newline at end of file
+        return verify(self.voter, payload, self.signature, CTX_VOTE)
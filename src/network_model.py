@@ -0,0 +1,95 @@
+# src/network_model.py
+"""
+Mô hình mạng theo topology: độ trễ giữa các vùng địa lý, băng thông uplink
+của từng node (thời gian serialize theo kích thước tin nhắn) và hàng đợi gửi
+FIFO ở sender.
+
+    delivery = max(now, uplink rảnh) + size / bandwidth + latency[vùng gửi, vùng nhận] + jitter * u
+
+Mọi trạng thái theo node là mảng NumPy đánh chỉ số theo rank của node trong
+Simulator; độ trễ lưu theo cặp vùng (R x R) nên 1000 node vẫn chỉ tốn O(N + R²).
+"""
+import numpy as np
+
+from src.utils import deterministic_encode
+
+
+def encoded_size(message) -> int:
+    """Kích thước (byte) của tin nhắn khi mã hóa JSON đơn định"""
+    return len(deterministic_encode(message))
+
+
+class NetworkModel:
+    DEFAULT_BANDWIDTH = 12.5e6  # byte/giây (100 Mbit/s)
+
+    def __init__(self, topology: dict):
+        """
+        topology = {
+            "regions": ["us", "eu", "asia"],
+            "latency": [[...], ...],           # R x R, giây (một chiều)
+            "jitter": 0.005,                   # thêm uniform(0, jitter) mỗi tin
+            "uplink_bandwidth": 12.5e6,        # byte/giây mặc định cho mọi node
+            "node_bandwidth": {"Node0": 1e6},  # tùy chọn, theo node
+            "assignment": {"Node0": "eu"},     # tùy chọn; node khác chia vòng theo rank
+        }
+        """
+        self.regions = list(topology["regions"])
+        self.region_latency = np.asarray(topology["latency"], dtype=np.float64)
+        num_regions = len(self.regions)
+        if self.region_latency.shape != (num_regions, num_regions):
+            raise ValueError(f"latency must be {num_regions}x{num_regions}, got {self.region_latency.shape}")
+        if (self.region_latency <= 0).any():
+            raise ValueError("latency must be > 0 between every pair of regions")
+        self.jitter = float(topology.get("jitter", 0.0))
+        self.default_bandwidth = float(topology.get("uplink_bandwidth", self.DEFAULT_BANDWIDTH))
+        self.node_bandwidth = dict(topology.get("node_bandwidth", {}))
+        self.assignment = {node: self.regions.index(region) for node, region in topology.get("assignment", {}).items()}
+        # Độ trễ nhỏ nhất của mọi tin nhắn: lookahead cho PDES
+        self.min_latency = float(self.region_latency.min())
+
+        # Trạng thái theo rank node
+        self.size = 0
+        self.node_region = np.zeros(16, dtype=np.int32)
+        self.bandwidth = np.zeros(16, dtype=np.float64)
+        self.busy_until = np.zeros(16, dtype=np.float64)  # Thời điểm uplink của node rảnh
+
+    def add_node(self, node_id: str, rank: int):
+        """Gọi khi Simulator cấp rank mới cho node"""
+        if rank >= len(self.node_region):
+            capacity = max(rank + 1, 2 * len(self.node_region))
+            self.node_region = np.resize(self.node_region, capacity)
+            self.bandwidth = np.resize(self.bandwidth, capacity)
+            self.busy_until = np.resize(self.busy_until, capacity)
+        self.node_region[rank] = self.assignment.get(node_id, rank % len(self.regions))
+        self.bandwidth[rank] = self.node_bandwidth.get(node_id, self.default_bandwidth)
+        self.busy_until[rank] = 0.0
+        self.size = max(self.size, rank + 1)
+
+    def region_of(self, rank: int) -> str:
+        return self.regions[self.node_region[rank]]
+
+    def link_latency(self, src: int, dst: int) -> float:
+        return float(self.region_latency[self.node_region[src], self.node_region[dst]])
+
+    def delivery_time(self, now: float, src: int, dst: int, size: int, u: float) -> float:
+        """Một tin nhắn: chiếm uplink của src theo FIFO rồi truyền tới dst"""
+        start = max(now, self.busy_until[src])
+        finish = start + size / self.bandwidth[src]
+        self.busy_until[src] = finish
+        return float(finish) + self.link_latency(src, dst) + self.jitter * u
+
+    def broadcast_delivery_times(self, now: float, src: int, dsts: np.ndarray, size: int, u: np.ndarray) -> np.ndarray:
+        """
+        Lô tin nhắn cùng kích thước từ src, gửi lần lượt theo thứ tự dsts:
+        bản thứ k rời uplink sau k + 1 lần serialize.
+        """
+        start = max(now, self.busy_until[src])
+        finish = start + (size / self.bandwidth[src]) * np.arange(1, len(dsts) + 1)
+        if len(dsts):
+            self.busy_until[src] = finish[-1]
+        latency = self.region_latency[self.node_region[src], self.node_region[dsts]]
+        return finish + latency + self.jitter * u
+
+    def duplicate_delays(self, src: int, dsts, u):
+        """Bản sao tới muộn hơn bản gốc tối đa một lần độ trễ của link"""
+        return self.region_latency[self.node_region[src], self.node_region[dsts]] * u
@@ -1,34 +1,76 @@
 import hashlib
-from src.crypto import KeyPair, CTX_VOTE, CTX_BLOCK, CTX_TX
+from collections import deque
+from src.crypto import CTX_VOTE, CTX_BLOCK, CTX_TX, get_provider
 from src.state import StateMachine
 from src.models import Block, Transaction, Vote
 from src.consensus import ConsensusEngine
+from src.utils import get_hash
 
 class Node:
     # Giá trị mặc định cho retry_count
     DEFAULT_RETRY_COUNT = 4
+    # Thời gian chờ body trước khi hỏi peer khác (giây mô phỏng)
+    DEFAULT_BODY_REQUEST_TIMEOUT = 0.2
+    # Gossip TX: số peer relay tới và thời gian nhớ một TX đã thấy
+    DEFAULT_TX_FANOUT = 3
+    DEFAULT_TX_SEEN_TTL = 30.0
+    DEFAULT_TX_REGOSSIP_INTERVAL = 2.0
+    DEFAULT_TX_REGOSSIP_COUNT = 2
+    # Timeout của từng bước trong round; round r chờ thêm r * timeout_delta
+    DEFAULT_TIMEOUT_PROPOSE = 1.0
+    DEFAULT_TIMEOUT_PREVOTE = 1.0
+    DEFAULT_TIMEOUT_PRECOMMIT = 1.0
+    DEFAULT_TIMEOUT_DELTA = 0.5
+    # Đồng bộ commit khi tụt lại: khoảng chờ tối thiểu giữa hai yêu cầu, số height mỗi lượt trả lời
+    DEFAULT_SYNC_INTERVAL = 1.0
+    DEFAULT_SYNC_BATCH = 4
     
-    def __init__(self, node_id: str, simulator, validators: list, key_seed=None, config=None):
+    # Các bước trong một round
+    STEP_PROPOSE = "PROPOSE"
+    STEP_PREVOTE = "PREVOTE"
+    STEP_PRECOMMIT = "PRECOMMIT"
+    
+    def __init__(self, node_id: str, transport, validators: list, key_seed=None, config=None, clock=None):
+        """
+        transport: Transport (src/transport.py) mà node gửi tin qua, ví dụ Simulator hoặc RealtimeRuntime.
+        clock: Clock của node, mặc định chính transport (cả hai engine đều là Clock).
+        """
         self.node_id = node_id
-        self.sim = simulator
+        self.bind_transport(transport, clock)
         self.config = config or {}
         
         # Lấy cấu hình consensus
         consensus_config = self.config.get("consensus", {})
         self.retry_count = consensus_config.get("retry_count", self.DEFAULT_RETRY_COUNT)
+        self.tx_fanout = consensus_config.get("tx_fanout", self.DEFAULT_TX_FANOUT)
+        self.tx_seen_ttl = consensus_config.get("tx_seen_ttl", self.DEFAULT_TX_SEEN_TTL)
+        # Gửi lại TX còn trong mempool tối đa tx_regossip_count lần (0 = chỉ relay một lần)
+        self.tx_regossip_interval = consensus_config.get("tx_regossip_interval", self.DEFAULT_TX_REGOSSIP_INTERVAL)
+        self.tx_regossip_count = consensus_config.get("tx_regossip_count", self.DEFAULT_TX_REGOSSIP_COUNT)
+        self.timeout_propose = consensus_config.get("timeout_propose", self.DEFAULT_TIMEOUT_PROPOSE)
+        self.timeout_prevote = consensus_config.get("timeout_prevote", self.DEFAULT_TIMEOUT_PREVOTE)
+        self.timeout_precommit = consensus_config.get("timeout_precommit", self.DEFAULT_TIMEOUT_PRECOMMIT)
+        self.timeout_delta = consensus_config.get("timeout_delta", self.DEFAULT_TIMEOUT_DELTA)
+        # Tự động bắt đầu height tiếp theo sau khi finalize (mặc định: chỉ chạy khi gọi start_consensus)
+        self.auto_advance = consensus_config.get("auto_advance", False)
+        self.sync_interval = consensus_config.get("sync_interval", self.DEFAULT_SYNC_INTERVAL)
+        self.sync_batch = consensus_config.get("sync_batch", self.DEFAULT_SYNC_BATCH)
         
+        # Crypto provider theo config (mặc định Ed25519, "blake2-mock" cho mô phỏng lớn)
+        self.crypto = get_provider(self.config.get("crypto", {}).get("provider", "ed25519"))
         # Nếu có key_seed, tạo key pair cố định để đảm bảo tính đơn định (Determinism)
         if key_seed:
             seed_bytes = hashlib.sha256(str(key_seed).encode()).digest()
-            self.key_pair = KeyPair(seed_bytes)
+            self.key_pair = self.crypto.key_pair(seed_bytes)
         else:
-            self.key_pair = KeyPair()
+            self.key_pair = self.crypto.key_pair()
             
         self.peers = []
         
         # Core components
         self.state_machine = StateMachine()
         self.consensus = ConsensusEngine(self.key_pair.pub_key_str, validators)
+        self.use_crypto(self.key_pair.sign, self.crypto.verify)
         
         # Storage
         self.blocks = {} 
@@ -36,34 +78,104 @@ class Node:
         
         # Consensus State
         self.current_height = 1
-        self.has_prevoted = False
-        self.has_precommitted = False
+        self.round = 0
+        self.step = self.STEP_PROPOSE
+        self.height_started = False
+        self.has_prevoted = False      # Đã prevote trong round hiện tại
+        self.has_precommitted = False  # Đã precommit trong round hiện tại
         self.finalized_height = 0
+        self.proposals = {}            # {round: block_hash} của height hiện tại
+        self.proposal_headers = {}     # {block_hash: header} proposal gần nhất đã thấy cho block
+        self.round_timeouts = set()    # {(timeout_kind, round)} đã hẹn giờ trong height hiện tại
+        
+        # Đo độ trễ finality: thời điểm bắt đầu/finalize mỗi height
+        self.height_start_times = {}   # {height: sim_time}
+        self.finalize_times = {}       # {height: sim_time}
         
         # Pending block bodies (waiting for header acceptance)
         self.pending_headers = {}  # {block_hash: header_data}
         self.received_bodies = {}  # {block_hash: body_data}
+        # Pull model: body chỉ được gửi khi có yêu cầu GET_BODY
+        self.known_blocks = {}     # {block_hash: Block} - block hoàn chỉnh, dùng để phục vụ peer khác
+        self.body_requests = {}    # {block_hash: {"tried": [peer_id, ...], "hints": [peer_id, ...], "timer": timer_id}}
+        # Đủ 2/3 PRECOMMIT nhưng chưa có block: (height, block_hash), finalize khi block về
+        self.pending_commit = None
+        # Commit certificate: PRECOMMIT đã ký của các block đã finalize, phục vụ node tụt lại (GET_COMMITS)
+        self.precommits = {}       # {(height, round, block_hash): {voter: vote dict}} của các height chưa finalize
+        self.commits = {}          # {height: [vote dict]} - 2/3 PRECOMMIT cho self.blocks[height]
+        self._next_sync_time = 0.0  # Chưa tới lúc này thì không gửi GET_COMMITS mới
+        self.body_request_timeout = consensus_config.get("body_request_timeout", self.DEFAULT_BODY_REQUEST_TIMEOUT)
+        
+        # Compact block: body chỉ chứa short ID của TX, bên nhận dựng lại từ mempool
+        self.compact_blocks = consensus_config.get("compact_blocks", True)
+        self.mempool_index = {}    # {short_id: Transaction}
+        self.partial_bodies = {}   # {block_hash: {"body": body, "txs": [...], "missing": [index, ...]}}
+        self.compact_failed = set()  # {block_hash} - dựng lại sai (trùng short ID), xin body đầy đủ
+        self.compact_stats = {"blocks": 0, "txs": 0, "hits": 0, "tx_requests": 0}
         
         # Tracking để loại bỏ duplicates
-        self.seen_votes = set()  # {(vote_type, height, block_hash, voter)}
-        self.seen_txs = set()    # {tx_signature}
+        self.seen_votes = set()  # {(vote_type, height, round, block_hash, voter)}
+        self.seen_txs = {}       # {tx_hash: expiry_time}
+        self._seen_tx_expiry = deque()  # [(expiry_time, tx_hash)] theo thứ tự thêm vào
+        self._gossip_targets = None     # Cache danh sách peer relay TX (tính lại khi thêm peer)
+        self._regossip_queue = deque()  # [(due_time, short_id, msg, remaining)] theo thứ tự thêm vào
+        self._regossip_armed = False    # Đã có timer TX_REGOSSIP đang chờ
+
+    def bind_transport(self, transport, clock=None):
+        """Gắn node vào transport / clock, lấy sẵn bound method để mỗi lần gửi không phải tra hàm"""
+        self.transport = transport
+        self.clock = transport if clock is None else clock
+        self._send_message = transport.send_message
+        self._broadcast = transport.broadcast
+        self._broadcast_header = transport.broadcast_header
+        self._send_header = transport.send_header
+        self._send_body = transport.send_body
+        self._accept_header = transport.accept_header
+        self._forget_blocks = transport.forget_blocks
+        self._schedule_timer = self.clock.schedule_timer
+        self._cancel_timer = self.clock.cancel
+
+    def use_crypto(self, sign, verify):
+        """
+        Hàm ký / kiểm chữ ký của node (và StateMachine của node):
+        sign(message, context) -> chữ ký hex, verify(pub_key_hex, message, signature_hex, context) -> bool.
+        Mặc định key_pair.sign / verify của crypto provider; replay (src/replay.py) thay bằng kết quả đã ghi.
+        """
+        self._sign = sign
+        self._verify = verify
+        self.state_machine.verify = verify
 
     def add_peer(self, peer_id: str):
         if peer_id not in self.peers and peer_id != self.node_id:
             self.peers.append(peer_id)
+            self._gossip_targets = None
 
     def send_to_network(self, target_id: str, message: dict):
-        self.sim.send_message(self.node_id, target_id, message)
+        self._send_message(self.node_id, target_id, message)
 
     def broadcast(self, message: dict):
-        for peer_id in self.peers:
-            # Gửi lặp lại theo cấu hình retry_count để đảm bảo độ tin cậy trong mạng giả lập có tỷ lệ drop cao
-            for _ in range(self.retry_count):
-                self.send_to_network(peer_id, message)
+        # Gửi lặp lại theo cấu hình retry_count để đảm bảo độ tin cậy trong mạng giả lập có tỷ lệ drop cao
+        self._broadcast(self.node_id, self.peers, message, self.retry_count)
 
     def broadcast_block_header_body(self, block: Block):
-        """Broadcast block theo cơ chế Header trước, Body sau (theo yêu cầu đề bài)"""
-        header = {
+        """
+        Broadcast block theo cơ chế Header trước, Body sau (theo yêu cầu đề bài).
+        Chỉ header được gửi lặp lại retry_count lần; body được peer kéo về (GET_BODY)
+        sau khi accept header, nên băng thông body tỉ lệ với N thay vì N * retry_count.
+        """
+        header = self._make_proposal_header(block)
+        block_hash = header["block_hash"]
+        self.known_blocks[block_hash] = block
+        self.proposals[self.round] = block_hash
+        self.proposal_headers[block_hash] = header
+        
+        self._broadcast_header(self.node_id, self.peers, header, self.retry_count)
+
+    def _make_proposal_header(self, block: Block) -> dict:
+        """Header của block kèm proposal (height, round) do proposer của round ký"""
+        block_hash = block.get_hash()
+        proposal = {"type": "PROPOSAL", "height": block.height, "round": self.round, "block_hash": block_hash}
+        return {
             "msg_type": "HEADER",
             "height": block.height,
             "parent_hash": block.parent_hash,
@@ -71,64 +183,244 @@ class Node:
             "proposer": block.proposer,
             "signature": block.signature,
             "timestamp": block.timestamp,
-            "block_hash": block.get_hash()
+            "block_hash": block_hash,
+            "round": self.round,
+            "round_proposer": self.key_pair.pub_key_str,
+            "proposal_signature": self._sign(proposal, CTX_BLOCK)
         }
-        
+
+    def _is_valid_proposal(self, header: dict) -> bool:
+        """Header phải do đúng proposer của (height, round) ký"""
+        expected = self.proposer_for(header["height"], header.get("round", 0))
+        if expected is None or header.get("round_proposer") != expected:
+            return False
+        proposal = {"type": "PROPOSAL", "height": header["height"], "round": header.get("round", 0), "block_hash": header["block_hash"]}
+        return self._verify(expected, proposal, header.get("proposal_signature", ""), CTX_BLOCK)
+
+    def _make_body(self, block: Block, compact: bool = False) -> dict:
         body = {
             "msg_type": "BODY",
             "block_hash": block.get_hash(),
-            "txs": [tx.to_dict() for tx in block.txs]
+            "height": block.height
         }
-        
-        block_hash = block.get_hash()
-        
-        for peer_id in self.peers:
-            for _ in range(self.retry_count):
-                # Gửi header trước
-                self.sim.send_header(self.node_id, peer_id, header)
-                # Gửi body sau (simulator sẽ đợi header được accept)
-                self.sim.send_body(self.node_id, peer_id, body, block_hash)
+        if compact:
+            body["tx_ids"] = [tx.get_short_id() for tx in block.txs]
+        else:
+            body["txs"] = [tx.to_dict() for tx in block.txs]
+        return body
 
     def receive_header(self, sender_id: str, header: dict):
-        """Xử lý khi nhận được block header"""
+        """Xử lý khi nhận được block header (proposal của một round)"""
         try:
             block_hash = header.get("block_hash")
             height = header.get("height")
+            round = header.get("round", 0)
             
             if height != self.current_height:
+                if height > self.current_height:
+                    self._request_commits(sender_id)
+                return
+            
+            # Header trùng lặp của proposal đã ghi nhận -> bỏ qua
+            if self.proposals.get(round) == block_hash:
                 return
-                
-            # Verify header signature
-            header_data = {
-                "height": header["height"],
-                "parent_hash": header["parent_hash"],
-                "txs": [],  # Header không có txs
-                "state_hash": header["state_hash"],
-                "proposer": header["proposer"],
-                "timestamp": header["timestamp"]
-            }
             
-            from src.crypto import verify_signature
-            if not verify_signature(header["proposer"], header_data, header["signature"], CTX_BLOCK):
-                print(f"Invalid header signature from {sender_id}")
+            # Chữ ký block phủ cả danh sách txs nên chỉ verify được khi đã có body
+            # (handle_block sẽ verify). Ở đây verify chữ ký proposal của proposer round.
+            if not self._is_valid_proposal(header):
+                print(f"Invalid proposal header from {sender_id}")
+                return
+            
+            self.proposals[round] = block_hash
+            self.proposal_headers[block_hash] = header
+            self.start_consensus()
+            
+            # Đề xuất lại block đã có (round sau) -> không cần tải body
+            if block_hash in self.known_blocks:
+                self._on_block_available(block_hash)
+                return
+            
+            # Header của block đang chờ body: timer GET_BODY sẽ lo việc hỏi lại
+            if block_hash in self.pending_headers:
                 return
             
             # Lưu header và accept nó
             self.pending_headers[block_hash] = header
-            self.sim.accept_header(self.node_id, block_hash)
+            self._accept_header(self.node_id, block_hash, height)
             
             # Nếu đã có body, xử lý ngay
             if block_hash in self.received_bodies:
                 self._process_complete_block(block_hash)
+            elif not self.body_requests.get(block_hash, {}).get("tried"):
+                self._request_body(block_hash, sender_id)
                 
         except Exception as e:
             print(f"Error handling header: {e}")
 
+    def _request_body(self, block_hash: str, peer_id: str):
+        """Gửi GET_BODY tới đúng một peer (kèm yêu cầu header nếu chưa có) và hẹn giờ fallback"""
+        request = self.body_requests.setdefault(block_hash, {"tried": [], "hints": [], "timer": None})
+        request["tried"].append(peer_id)
+        self._restart_body_timer(block_hash, request)
+        self.send_to_network(peer_id, {
+            "msg_type": "GET_BODY",
+            "block_hash": block_hash,
+            "need_header": block_hash not in self.pending_headers,
+            "compact": self.compact_blocks and block_hash not in self.compact_failed
+        })
+
+    def _note_block_holder(self, block_hash: str, peer_id: str):
+        """Peer đã vote cho block mà mình chưa có -> ghi nhận làm nguồn body ưu tiên khi hỏi lại"""
+        request = self.body_requests.get(block_hash)
+        if request is None:
+            # Lần đầu biết tới block qua vote: chờ một khoảng để header của proposer kịp tới
+            request = self.body_requests[block_hash] = {"tried": [], "hints": [peer_id], "timer": None}
+            self._restart_body_timer(block_hash, request)
+        elif peer_id not in request["hints"]:
+            request["hints"].append(peer_id)
+
+    def _restart_body_timer(self, block_hash: str, request: dict):
+        self._cancel_timer(request["timer"])
+        request["timer"] = self._schedule_timer(self.node_id, self.body_request_timeout, ("BODY_TIMEOUT", block_hash))
+
+    def _on_body_timeout(self, block_hash: str):
+        """Body chưa về sau body_request_timeout: hỏi một peer khác chưa hỏi"""
+        request = self.body_requests.get(block_hash)
+        if request is None:
+            return
+        # Timer này đã chạy: không giữ id cũ để hủy về sau
+        request["timer"] = None
+        if block_hash in self.known_blocks:
+            return
+        
+        tried = request["tried"]
+        candidates = [p for p in request["hints"] if p not in tried]
+        candidates += [p for p in self.peers if p not in tried and p not in candidates]
+        if not candidates:
+            # Đã hỏi hết: quay vòng lại từ đầu
+            tried.clear()
+            candidates = request["hints"] or self.peers
+        if candidates:
+            self._request_body(block_hash, candidates[0])
+
+    def on_timer(self, token):
+        """Clock gọi khi một timer của node tới hạn"""
+        kind = token[0]
+        if kind == "BODY_TIMEOUT":
+            self._on_body_timeout(token[1])
+            return
+        if kind == "TX_REGOSSIP":
+            self._on_regossip(token[1])
+            return
+        
+        # Timeout của round: bỏ qua nếu đã sang height/round khác
+        _, height, round = token
+        if height != self.current_height or round != self.round:
+            return
+        if kind == "TIMEOUT_PROPOSE" and self.step == self.STEP_PROPOSE:
+            self._prevote(Vote.NIL)
+        elif kind == "TIMEOUT_PREVOTE" and self.step == self.STEP_PREVOTE:
+            self._precommit(Vote.NIL)
+        elif kind == "TIMEOUT_PRECOMMIT":
+            self.start_round(round + 1)
+
+    def _drop_body_request(self, block_hash: str):
+        request = self.body_requests.pop(block_hash, None)
+        if request is not None:
+            self._cancel_timer(request["timer"])
+
+    def handle_body_request(self, sender_id: str, message: dict):
+        """Phục vụ GET_BODY nếu mình đã có block"""
+        block_hash = message.get("block_hash")
+        block = self.known_blocks.get(block_hash)
+        if block is None:
+            return
+        if message.get("need_header") and block_hash in self.proposal_headers:
+            self._send_header(self.node_id, sender_id, self.proposal_headers[block_hash])
+        body = self._make_body(block, compact=message.get("compact", False))
+        self._send_body(self.node_id, sender_id, body, block_hash)
+
+    def _reconstruct_compact_body(self, sender_id: str, body: dict):
+        """Dựng lại body từ mempool; TX thiếu được xin trong một lượt GET_TXS tới chính sender"""
+        block_hash = body["block_hash"]
+        tx_ids = body["tx_ids"]
+        txs = [None] * len(tx_ids)
+        missing = []
+        for i, short_id in enumerate(tx_ids):
+            tx = self.mempool_index.get(short_id)
+            if tx is None:
+                missing.append(i)
+            else:
+                txs[i] = tx.to_dict()
+        
+        self.compact_stats["blocks"] += 1
+        self.compact_stats["txs"] += len(tx_ids)
+        self.compact_stats["hits"] += len(tx_ids) - len(missing)
+        
+        if not missing:
+            self._complete_body(body, txs)
+            return
+        
+        self.partial_bodies[block_hash] = {"body": body, "txs": txs, "missing": missing}
+        self.compact_stats["tx_requests"] += 1
+        # Peer đã trả lời: tính lại timeout cho lượt GET_TXS
+        request = self.body_requests.get(block_hash)
+        if request is not None:
+            self._restart_body_timer(block_hash, request)
+        self.send_to_network(sender_id, {"msg_type": "GET_TXS", "block_hash": block_hash, "indexes": missing})
+
+    def handle_tx_request(self, sender_id: str, message: dict):
+        """Trả về các TX (theo vị trí trong block) mà peer không có trong mempool"""
+        block = self.known_blocks.get(message.get("block_hash"))
+        if block is None:
+            return
+        indexes = [i for i in message.get("indexes", []) if 0 <= i < len(block.txs)]
+        self.send_to_network(sender_id, {
+            "msg_type": "TXS",
+            "block_hash": message["block_hash"],
+            "indexes": indexes,
+            "txs": [block.txs[i].to_dict() for i in indexes]
+        })
+
+    def receive_missing_txs(self, sender_id: str, message: dict):
+        partial = self.partial_bodies.get(message.get("block_hash"))
+        if partial is None:
+            return
+        for i, tx in zip(message["indexes"], message["txs"]):
+            if partial["txs"][i] is None:
+                partial["txs"][i] = tx
+        if any(tx is None for tx in partial["txs"]):
+            return
+        del self.partial_bodies[message["block_hash"]]
+        self._complete_body(partial["body"], partial["txs"])
+
+    def _complete_body(self, body: dict, txs: list):
+        full_body = {k: v for k, v in body.items() if k != "tx_ids"}
+        full_body["txs"] = txs
+        full_body["compact"] = True
+        self.received_bodies[body["block_hash"]] = full_body
+        if body["block_hash"] in self.pending_headers:
+            self._process_complete_block(body["block_hash"])
+
+    def get_compact_hit_rate(self) -> float:
+        """Tỉ lệ TX của compact block tìm thấy sẵn trong mempool"""
+        if self.compact_stats["txs"] == 0:
+            return 1.0
+        return self.compact_stats["hits"] / self.compact_stats["txs"]
+
     def receive_body(self, sender_id: str, body: dict):
         """Xử lý khi nhận được block body"""
         try:
             block_hash = body.get("block_hash")
             
+            # Body trùng lặp (đã có block hoàn chỉnh) -> bỏ qua
+            if block_hash in self.known_blocks or block_hash in self.received_bodies:
+                return
+            
+            if "tx_ids" in body:
+                self._reconstruct_compact_body(sender_id, body)
+                return
+            
             # Lưu body
             self.received_bodies[block_hash] = body
             
@@ -142,7 +434,7 @@ class Node:
     def _process_complete_block(self, block_hash: str):
         """Xử lý khi đã có cả header và body của block"""
         header = self.pending_headers.get(block_hash)
-        body = self.received_bodies.get(block_hash)
+        body = self.received_bodies.pop(block_hash, None)
         
         if not header or not body:
             return
@@ -158,13 +450,25 @@ class Node:
             "timestamp": header["timestamp"]
         }
         
-        self.handle_block(full_msg)
+        # Body không khớp block_hash đã công bố trong header -> bỏ, chờ hỏi peer khác
+        if get_hash(full_msg) != block_hash:
+            print(f"Body mismatch for block {block_hash[:8]} at {self.node_id}")
+            if body.get("compact"):
+                self.compact_failed.add(block_hash)
+            return
         
         # Cleanup
         del self.pending_headers[block_hash]
-        del self.received_bodies[block_hash]
+        self._drop_body_request(block_hash)
+        
+        self.handle_block(full_msg)
 
     def receive(self, sender_id: str, message: dict):
+        # Phong bì gom nhiều tin của cùng link (Simulator bật batching): xử lý lần lượt
+        if message.get("msg_type") == "BATCH":
+            for inner in message["messages"]:
+                self.receive(sender_id, inner)
+            return
         # Xử lý header/body riêng nếu có msg_type
         if message.get("msg_type") == "HEADER":
             self.receive_header(sender_id, message)
@@ -172,37 +476,184 @@ class Node:
         elif message.get("msg_type") == "BODY":
             self.receive_body(sender_id, message)
             return
+        elif message.get("msg_type") == "GET_BODY":
+            self.handle_body_request(sender_id, message)
+            return
+        elif message.get("msg_type") == "GET_TXS":
+            self.handle_tx_request(sender_id, message)
+            return
+        elif message.get("msg_type") == "TXS":
+            self.receive_missing_txs(sender_id, message)
+            return
+        elif message.get("msg_type") == "GET_COMMITS":
+            self.handle_commit_request(sender_id, message)
+            return
+        elif message.get("msg_type") == "COMMITS":
+            self.receive_commits(sender_id, message)
+            return
             
         if "txs" in message:
             self.handle_block(message)
         elif "type" in message and message["type"] in [Vote.PREVOTE, Vote.PRECOMMIT]:
-            self.handle_vote(message)
+            self.handle_vote(message, sender_id)
         elif "key" in message and "value" in message:
             self.handle_transaction(sender_id, message)
 
     def create_transaction(self, key: str, value: str):
-        my_nonce = self.state_machine.nonces.get(self.key_pair.pub_key_str, -1) + 1
-        tx = Transaction(self.key_pair.pub_key_str, key, value, my_nonce)
-        tx.signature = self.key_pair.sign(tx.to_dict(include_sig=False), CTX_TX)
-        self.broadcast(tx.to_dict())
+        # Nonce tiếp theo phải tính cả các TX của mình còn nằm trong mempool
+        my_pub = self.key_pair.pub_key_str
+        my_nonce = self.state_machine.nonces.get(my_pub, -1) + 1
+        for t in self.mempool:
+            if t.sender == my_pub and t.nonce >= my_nonce:
+                my_nonce = t.nonce + 1
+        tx = Transaction(my_pub, key, value, my_nonce)
+        tx.signature = self._sign(tx.to_dict(include_sig=False), CTX_TX)
+        
+        tx_hash = tx.get_hash()
+        self._mark_tx_seen(tx_hash)
+        self.add_to_mempool(tx)
+        msg = tx.to_dict()
+        self.gossip_transaction(msg)
+        self._queue_regossip(tx.get_short_id(), msg)
         return tx
 
+    def _gossip_peers(self) -> list:
+        """
+        Peer để relay TX: các node cách mình 1, 2, 4, ... bước trên vòng node_id đã sắp xếp.
+        Mỗi node relay một lần nên cả mạng tốn N * tx_fanout tin nhắn cho mỗi TX, và cạnh
+        bước 1 bảo đảm phủ toàn mạng khi không mất gói; khi mất gói thì nhờ re-gossip.
+        """
+        if self._gossip_targets is None:
+            ring = sorted(self.peers + [self.node_id])
+            my_pos = ring.index(self.node_id)
+            targets = []
+            offset = 1
+            while len(targets) < self.tx_fanout and offset < len(ring):
+                targets.append(ring[(my_pos + offset) % len(ring)])
+                offset *= 2
+            self._gossip_targets = targets
+        return self._gossip_targets
+
+    def gossip_transaction(self, msg: dict, exclude: str = None):
+        for peer_id in self._gossip_peers():
+            if peer_id != exclude:
+                self.send_to_network(peer_id, msg)
+
+    def _queue_regossip(self, short_id: str, msg: dict):
+        """Hẹn gửi lại TX sau tx_regossip_interval, phòng khi lượt relay trước bị mất gói"""
+        if self.tx_regossip_count <= 0:
+            return
+        due = self.clock.current_time + self.tx_regossip_interval
+        self._regossip_queue.append((due, short_id, msg, self.tx_regossip_count))
+        self._arm_regossip()
+
+    def _arm_regossip(self):
+        # Một timer cho cả hàng đợi: due tăng dần nên chỉ cần hẹn theo phần tử đầu
+        if self._regossip_armed or not self._regossip_queue:
+            return
+        self._regossip_armed = True
+        due = self._regossip_queue[0][0]
+        self._schedule_timer(self.node_id, max(0.0, due - self.clock.current_time), ("TX_REGOSSIP", due))
+
+    def _on_regossip(self, due_time: float):
+        """
+        Gửi lại các TX tới hạn. Dừng khi TX đã rời mempool (vào block) hoặc hash hết hạn trong
+        seen_txs - sau TTL node khác có thể coi đó là TX mới nên không được phát lại nữa.
+        """
+        self._regossip_armed = False
+        now = self.clock.current_time
+        while self._regossip_queue and self._regossip_queue[0][0] <= due_time:
+            _, short_id, msg, remaining = self._regossip_queue.popleft()
+            tx = self.mempool_index.get(short_id)
+            if tx is None or self.seen_txs.get(tx.get_hash(), -1.0) <= now:
+                continue
+            self.gossip_transaction(msg)
+            if remaining > 1:
+                self._regossip_queue.append((now + self.tx_regossip_interval, short_id, msg, remaining - 1))
+        self._arm_regossip()
+
+    def _mark_tx_seen(self, tx_hash: str):
+        now = self.clock.current_time
+        # Dọn các hash đã hết hạn (deque theo thứ tự thời gian nên chỉ cần xem đầu hàng)
+        while self._seen_tx_expiry and self._seen_tx_expiry[0][0] <= now:
+            expiry, old_hash = self._seen_tx_expiry.popleft()
+            if self.seen_txs.get(old_hash) == expiry:
+                del self.seen_txs[old_hash]
+        expiry = now + self.tx_seen_ttl
+        self.seen_txs[tx_hash] = expiry
+        self._seen_tx_expiry.append((expiry, tx_hash))
+
+    def add_to_mempool(self, tx: Transaction):
+        short_id = tx.get_short_id()
+        if short_id not in self.mempool_index:
+            self.mempool.append(tx)
+            self.mempool_index[short_id] = tx
+
     def handle_transaction(self, sender_id: str, msg: dict):
         try:
             tx = Transaction(msg['sender'], msg['key'], msg['value'], msg['nonce'], msg['signature'])
+            
+            # TX đã thấy thì bỏ qua; quy tắc nonce / quyền sở hữu / chữ ký do state machine kiểm
+            tx_hash = tx.get_hash()
+            if self.seen_txs.get(tx_hash, -1.0) > self.clock.current_time:
+                return
+            self._mark_tx_seen(tx_hash)
+            
             if self.state_machine.validate_transaction(tx):
-                if not any(t.signature == tx.signature for t in self.mempool):
-                    self.mempool.append(tx)
+                self.add_to_mempool(tx)
+                self.gossip_transaction(msg, exclude=sender_id)
+                self._queue_regossip(tx.get_short_id(), msg)
         except Exception:
             pass
 
+    def proposer_for(self, height: int, round: int):
+        """Proposer xoay vòng theo (height, round)"""
+        validators = self.consensus.validators
+        if not validators:
+            return None
+        return validators[(height - 1 + round) % len(validators)]
+
     def start_consensus(self):
+        """Bắt đầu height hiện tại từ round 0 (không làm gì nếu height đã bắt đầu)"""
         if not self.consensus.validators: return
-        proposer_idx = (self.current_height - 1) % len(self.consensus.validators)
-        proposer_pub = self.consensus.validators[proposer_idx]
+        if self.height_started: return
+        self.height_started = True
+        self.height_start_times[self.current_height] = self.clock.current_time
+        self.start_round(0)
+
+    def start_round(self, round: int):
+        self.round = round
+        self.step = self.STEP_PROPOSE
+        self.has_prevoted = False
+        self.has_precommitted = False
+        if round > 0:
+            print(f"[{self.clock.current_time:.2f}] Node {self.node_id} height {self.current_height} -> ROUND {round}")
         
-        if proposer_pub == self.key_pair.pub_key_str:
-            self.create_and_propose_block()
+        self._schedule_round_timeout("TIMEOUT_PROPOSE", self.timeout_propose)
+        
+        if self.proposer_for(self.current_height, round) == self.key_pair.pub_key_str:
+            valid_block = self.known_blocks.get(self.consensus.valid_block)
+            if valid_block is not None:
+                # Đã có block được 2/3 PREVOTE ở round trước: đề xuất lại block đó
+                self.propose_block(valid_block)
+            else:
+                self.create_and_propose_block()
+        else:
+            # Proposal của round này có thể đã tới trước khi mình sang round
+            block_hash = self.proposals.get(round)
+            if block_hash in self.known_blocks:
+                self._on_block_available(block_hash)
+        
+        # Vote của round này có thể đã tới trước
+        self._check_round_progress()
+
+    def _schedule_round_timeout(self, kind: str, base_timeout: float):
+        key = (kind, self.round)
+        if key in self.round_timeouts:
+            return
+        self.round_timeouts.add(key)
+        delay = base_timeout + self.round * self.timeout_delta
+        self._schedule_timer(self.node_id, delay, (kind, self.current_height, self.round))
 
     def create_and_propose_block(self):
         parent_hash = "GENESIS_HASH"
@@ -214,49 +665,115 @@ class Node:
         current_state_hash = self.state_machine.get_state_hash()
         txs_to_include = self.mempool[:] 
         
-        # Block timestamp phải lấy từ Simulator để đảm bảo tính đơn định giữa các lần chạy
+        # Block timestamp phải lấy từ clock của node (thời gian mô phỏng) để đảm bảo tính đơn định giữa các lần chạy
         block = Block(
             height=self.current_height,
             parent_hash=parent_hash,
             txs=txs_to_include,
             state_hash=current_state_hash,
             proposer=self.key_pair.pub_key_str,
-            timestamp=self.sim.current_time 
+            timestamp=self.clock.current_time 
         )
         
-        block.signature = self.key_pair.sign(block.to_dict(include_sig=False), CTX_BLOCK)
-        
-        print(f"[{self.sim.current_time:.2f}] Node {self.node_id} PROPOSING block {block.height}")
-        block_msg = block.to_dict()
-        self.broadcast(block_msg)
-        self.handle_block(block_msg)
+        block.signature = self._sign(block.to_dict(include_sig=False), CTX_BLOCK)
+        self.propose_block(block)
+
+    def propose_block(self, block: Block):
+        print(f"[{self.clock.current_time:.2f}] Node {self.node_id} PROPOSING block {block.height} (round {self.round})")
+        self.broadcast_block_header_body(block)
+        self.handle_block(block.to_dict())
+
+    @staticmethod
+    def _block_from_dict(msg: dict) -> Block:
+        tx_objs = [Transaction(t['sender'], t['key'], t['value'], t['nonce'], t['signature']) for t in msg['txs']]
+        return Block(msg['height'], msg['parent_hash'], tx_objs, msg['state_hash'], msg['proposer'], msg['signature'], timestamp=msg.get('timestamp'))
 
     def handle_block(self, msg: dict):
         try:
-            tx_objs = [Transaction(t['sender'], t['key'], t['value'], t['nonce'], t['signature']) for t in msg['txs']]
-            block = Block(msg['height'], msg['parent_hash'], tx_objs, msg['state_hash'], msg['proposer'], msg['signature'], timestamp=msg.get('timestamp'))
+            block = self._block_from_dict(msg)
             
             if block.height != self.current_height: return
-            if not block.validate_signature(): return
+            if not block.validate_signature(self._verify): return
 
+            block_hash = block.get_hash()
             self.blocks[block.height] = block
+            self.known_blocks[block_hash] = block
+            
+            # Block đầy đủ gửi thẳng (không qua header): coi là proposal của round hiện tại
+            if self.round not in self.proposals and block.proposer == self.proposer_for(block.height, self.round):
+                self.proposals[self.round] = block_hash
             
-            if not self.has_prevoted:
-                self.broadcast_vote(Vote.PREVOTE, block.get_hash())
-                self.has_prevoted = True
+            self.start_consensus()
+            self._on_block_available(block_hash)
         except Exception as e:
             print(f"Error handling block: {e}")
 
-    def handle_vote(self, msg: dict):
+    def _on_block_available(self, block_hash: str):
+        """Block đã có đầy đủ: prevote nếu là proposal của round hiện tại, finalize nếu đã được commit"""
+        if self.step == self.STEP_PROPOSE and self.proposals.get(self.round) == block_hash:
+            if self.consensus.can_prevote(self.current_height, self.round, block_hash):
+                self._prevote(block_hash)
+            else:
+                self._prevote(Vote.NIL)
+        
+        # Đã đủ PRECOMMIT từ trước, chỉ chờ block này để finalize
+        if self.pending_commit == (self.current_height, block_hash):
+            self.finalize_block(self.current_height, block_hash)
+            return
+        
+        self._check_round_progress()
+
+    def _prevote(self, block_hash):
+        if self.has_prevoted:
+            return
+        self.has_prevoted = True
+        self.step = self.STEP_PREVOTE
+        self.broadcast_vote(Vote.PREVOTE, block_hash)
+
+    def _precommit(self, block_hash):
+        if self.has_precommitted:
+            return
+        self.has_precommitted = True
+        self.step = self.STEP_PRECOMMIT
+        if block_hash is not None:
+            print(f"[{self.clock.current_time:.2f}] Node {self.node_id} reached 2/3 PREVOTE -> PRECOMMIT")
+        self.broadcast_vote(Vote.PRECOMMIT, block_hash)
+
+    def _check_round_progress(self):
+        """Áp dụng các quy tắc chuyển bước dựa trên phiếu đã có của round hiện tại"""
+        height, round = self.current_height, self.round
+        engine = self.consensus
+        
+        # 2/3 PREVOTE bất kỳ -> hẹn timeout prevote
+        if self.step == self.STEP_PREVOTE and engine.count_phase_votes(height, round, Vote.PREVOTE) >= engine.threshold:
+            self._schedule_round_timeout("TIMEOUT_PREVOTE", self.timeout_prevote)
+        
+        polka = engine.quorum_block(height, round, Vote.PREVOTE)
+        if polka is not None and polka in self.known_blocks and self.step != self.STEP_PROPOSE:
+            if engine.valid_round < round:
+                engine.valid_block = polka
+                engine.valid_round = round
+            if self.step == self.STEP_PREVOTE:
+                # Khóa block trước khi precommit (Safety)
+                engine.lock(polka, round)
+                self._precommit(polka)
+        elif self.step == self.STEP_PREVOTE and engine.check_threshold(height, Vote.PREVOTE, Vote.NIL, round):
+            self._precommit(Vote.NIL)
+        
+        # 2/3 PRECOMMIT bất kỳ -> hẹn timeout precommit để sang round sau
+        if self.current_height == height and engine.count_phase_votes(height, round, Vote.PRECOMMIT) >= engine.threshold:
+            self._schedule_round_timeout("TIMEOUT_PRECOMMIT", self.timeout_precommit)
+
+    def handle_vote(self, msg: dict, sender_id: str = None):
         try:
-            vote = Vote(msg['type'], msg['height'], msg['block_hash'], msg['voter'], msg['signature'])
+            vote = Vote(msg['type'], msg['height'], msg['block_hash'], msg['voter'], msg['signature'], round=msg.get('round', 0))
             
             # Kiểm tra duplicate vote
-            vote_key = (vote.type, vote.height, vote.block_hash, vote.voter)
+            vote_key = (vote.type, vote.height, vote.round, vote.block_hash, vote.voter)
             if vote_key in self.seen_votes:
                 return  # Bỏ qua vote trùng lặp
             
-            if not vote.validate(): return
+            if not vote.validate(self._verify): return
             
             # Đánh dấu đã thấy vote này
             self.seen_votes.add(vote_key)
@@ -264,40 +781,158 @@ class Node:
             is_new = self.consensus.add_vote(vote)
             if not is_new: return
             
+            if vote.type == Vote.PRECOMMIT and vote.block_hash is not None and vote.height >= self.current_height:
+                # Giữ chữ ký để làm commit certificate khi finalize
+                self.precommits.setdefault((vote.height, vote.round, vote.block_hash), {})[vote.voter] = vote.to_dict()
+            
+            if vote.height != self.current_height:
+                # Peer đã ở height cao hơn: mình tụt lại, xin các commit còn thiếu
+                if vote.height > self.current_height and sender_id is not None:
+                    self._request_commits(sender_id)
+                return
+            self.start_consensus()
+            
             block_hash = vote.block_hash
             
-            if vote.type == Vote.PREVOTE:
-                if self.consensus.check_threshold(vote.height, Vote.PREVOTE, block_hash):
-                    if not self.has_precommitted and vote.height == self.current_height:
-                        print(f"[{self.sim.current_time:.2f}] Node {self.node_id} reached 2/3 PREVOTE -> PRECOMMIT")
-                        self.broadcast_vote(Vote.PRECOMMIT, block_hash)
-                        self.has_precommitted = True
-
-            elif vote.type == Vote.PRECOMMIT:
-                if self.consensus.check_threshold(vote.height, Vote.PRECOMMIT, block_hash):
-                    if self.finalized_height < vote.height:
+            # Có người đã vote cho block mà mình chưa có -> hỏi body (ưu tiên chính người gửi vote)
+            if block_hash is not None and block_hash not in self.known_blocks and sender_id is not None:
+                self._note_block_holder(block_hash, sender_id)
+            
+            if vote.type == Vote.PRECOMMIT and block_hash is not None:
+                if self.consensus.check_threshold(vote.height, Vote.PRECOMMIT, block_hash, vote.round):
+                    if block_hash in self.known_blocks:
                         self.finalize_block(vote.height, block_hash)
+                        return
+                    # Chưa có block đã được commit: chờ body về rồi mới finalize
+                    self.pending_commit = (vote.height, block_hash)
+            
+            # f+1 validator đã ở round cao hơn -> nhảy tới round đó
+            if vote.round > self.round and self.consensus.round_voter_count(vote.height, vote.round) > self.consensus.max_faulty():
+                self.start_round(vote.round)
+            elif vote.round == self.round:
+                self._check_round_progress()
         except Exception as e:
             print(f"Error handling vote: {e}")
 
     def broadcast_vote(self, vote_type, block_hash):
-        vote = Vote(vote_type, self.current_height, block_hash, self.key_pair.pub_key_str)
-        vote.signature = self.key_pair.sign(vote.to_dict(include_sig=False), CTX_VOTE)
+        vote = Vote(vote_type, self.current_height, block_hash, self.key_pair.pub_key_str, round=self.round)
+        vote.signature = self._sign(vote.to_dict(include_sig=False), CTX_VOTE)
         msg = vote.to_dict()
         self.broadcast(msg)
         self.handle_vote(msg)
 
+    def _request_commits(self, peer_id: str, force: bool = False):
+        """
+        Xin peer các block đã finalize kèm commit certificate, từ height hiện tại trở đi.
+        Tối đa một yêu cầu mỗi sync_interval (tính cả từ lần finalize gần nhất: vote của
+        height kế tiếp tới ngay sau khi finalize là bình thường); force bỏ qua giới hạn này.
+        """
+        now = self.clock.current_time
+        if not force and now < self._next_sync_time:
+            return
+        self._next_sync_time = now + self.sync_interval
+        self.send_to_network(peer_id, {"msg_type": "GET_COMMITS", "from_height": self.current_height})
+
+    def handle_commit_request(self, sender_id: str, message: dict):
+        """Trả về tối đa sync_batch block đã finalize (kèm 2/3 PRECOMMIT) từ from_height"""
+        start = message.get("from_height", 1)
+        commits = []
+        for height in range(start, min(self.finalized_height, start + self.sync_batch - 1) + 1):
+            if height not in self.commits or height not in self.blocks:
+                break
+            commits.append({"block": self.blocks[height].to_dict(), "precommits": self.commits[height]})
+        if commits:
+            self.send_to_network(sender_id, {
+                "msg_type": "COMMITS",
+                "commits": commits,
+                "finalized_height": self.finalized_height
+            })
+
+    def _is_valid_commit(self, block: Block, block_hash: str, precommits: list) -> bool:
+        """2/3 validator đã PRECOMMIT block ở cùng một round, chữ ký hợp lệ"""
+        engine = self.consensus
+        voters = set()
+        round = None
+        for msg in precommits:
+            vote = Vote(msg['type'], msg['height'], msg['block_hash'], msg['voter'], msg['signature'], round=msg.get('round', 0))
+            if vote.type != Vote.PRECOMMIT or vote.height != block.height or vote.block_hash != block_hash:
+                return False
+            if round is None:
+                round = vote.round
+            if vote.round != round or vote.voter not in engine.validators or vote.voter in voters:
+                return False
+            if not vote.validate(self._verify):
+                return False
+            voters.add(vote.voter)
+        return len(voters) >= engine.threshold
+
+    def receive_commits(self, sender_id: str, message: dict):
+        """Áp dụng lần lượt các block đã commit cho height hiện tại trở đi (node tụt lại bắt kịp)"""
+        try:
+            applied = 0
+            for commit in message.get("commits", []):
+                block = self._block_from_dict(commit["block"])
+                if block.height < self.current_height:
+                    continue
+                if block.height > self.current_height:
+                    break
+                if not block.validate_signature(self._verify):
+                    return
+                block_hash = block.get_hash()
+                if not self._is_valid_commit(block, block_hash, commit["precommits"]):
+                    print(f"Invalid commit for height {block.height} from {sender_id}")
+                    return
+                self.known_blocks[block_hash] = block
+                self.commits[block.height] = commit["precommits"]
+                self.finalize_block(block.height, block_hash)
+                applied += 1
+            # Peer còn đi trước: xin tiếp ngay, không chờ sync_interval
+            if applied and message.get("finalized_height", 0) >= self.current_height:
+                self._request_commits(sender_id, force=True)
+        except Exception as e:
+            print(f"Error handling commits: {e}")
+
     def finalize_block(self, height, block_hash):
-        print(f"[{self.sim.current_time:.2f}] Node {self.node_id} FINALIZED block {height}")
+        print(f"[{self.clock.current_time:.2f}] Node {self.node_id} FINALIZED block {height}")
         self.finalized_height = height
+        self.finalize_times[height] = self.clock.current_time
+        
+        block = self.known_blocks.get(block_hash)
+        if block is not None:
+            self.blocks[height] = block
+            success = self.state_machine.apply_block(block)
+            if success: 
+                self.mempool = [] 
+                self.mempool_index = {}
         
-        if height in self.blocks:
-            block = self.blocks[height]
-            if block.get_hash() == block_hash:
-                success = self.state_machine.apply_block(block)
-                if success: 
-                    self.mempool = [] 
+        # Commit certificate của height này: PRECOMMIT của round có đủ 2/3 (nhiều chữ ký nhất)
+        certificates = [votes for (h, _, bh), votes in self.precommits.items() if h == height and bh == block_hash]
+        if certificates and height not in self.commits:
+            self.commits[height] = list(max(certificates, key=len).values())
+        self.precommits = {key: votes for key, votes in self.precommits.items() if key[0] > height}
+        self._next_sync_time = self.clock.current_time + self.sync_interval
+        
+        # Block của các height cũ không còn cần phục vụ cho peer
+        self.known_blocks = {bh: b for bh, b in self.known_blocks.items() if b.height >= height}
+        self.proposal_headers = {bh: hd for bh, hd in self.proposal_headers.items() if bh in self.known_blocks}
+        self.pending_headers = {bh: hd for bh, hd in self.pending_headers.items() if hd["height"] > height}
+        self.received_bodies = {bh: bd for bh, bd in self.received_bodies.items() if bd.get("height", height + 1) > height}
+        for bh in [bh for bh in self.body_requests if bh not in self.pending_headers]:
+            self._drop_body_request(bh)
+        self.partial_bodies = {bh: p for bh, p in self.partial_bodies.items() if bh in self.pending_headers}
+        self.pending_commit = None
+        # Transport không còn phải giữ body / header đã accept của các height này
+        self._forget_blocks(self.node_id, height)
         
         self.current_height += 1
+        self.round = 0
+        self.step = self.STEP_PROPOSE
+        self.height_started = False
         self.has_prevoted = False
-        self.has_precommitted = False
\ No newline at end of file
+        self.has_precommitted = False
+        self.proposals = {}
+        self.round_timeouts = set()
+        self.consensus.start_height(self.current_height)
+        
+        if self.auto_advance:
+            self.start_consensus()
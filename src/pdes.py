@@ -0,0 +1,153 @@
+# src/pdes.py
+"""
+PDES bảo thủ (conservative parallel discrete-event simulation).
+
+Các node được chia vào nhiều worker process, mỗi worker có PartitionSimulator
+và hàng đợi riêng. Mọi tin nhắn có độ trễ >= min_delay (hoặc độ trễ vùng nhỏ nhất
+khi dùng topology, xem Simulator.lookahead), nên trong cửa sổ
+[T, T + min_delay) không tin nhắn nào gửi trong cửa sổ có thể tới trước T + min_delay:
+mọi worker xử lý cửa sổ độc lập, rồi coordinator chuyển tin nhắn liên partition
+theo lô và mở cửa sổ kế tiếp tại thời điểm sự kiện sớm nhất toàn cục.
+
+Kết quả giống hệt engine tuần tự cùng seed vì:
+  - RNG theo link (drop/delay/duplicate chỉ phụ thuộc lịch sử gửi của link),
+  - seq của tin nhắn chỉ phụ thuộc sender (send_count, rank),
+  - body bị giữ ở phía receiver (không đọc trạng thái của partition khác),
+nên mỗi node thấy đúng chuỗi sự kiện như khi chạy tuần tự.
+"""
+import multiprocessing
+
+from src.network_model import NetworkModel
+from src.runner import build_network, node_names
+from src.utils import quiet_output
+from config.node_config import CONFIG
+
+
+def start_all(nodes):
+    """Setup mặc định: mọi node tự sang height mới và bắt đầu consensus ở t=0"""
+    for n in nodes:
+        n.auto_advance = True
+        n.start_consensus()
+
+
+def node_summary(node) -> dict:
+    """Kết quả của một node dùng để so sánh giữa các engine"""
+    return {
+        "finalized_height": node.finalized_height,
+        "blocks": {h: b.get_hash() for h, b in node.blocks.items()},
+        "finalize_times": dict(node.finalize_times),
+        "height_start_times": dict(node.height_start_times),
+        "state_hash": node.state_machine.get_state_hash(),
+        "round": node.round,
+    }
+
+
+def _lookahead(network_config: dict) -> float:
+    merged = dict(CONFIG["network"])
+    merged.update(network_config or {})
+    if merged.get("topology"):
+        return NetworkModel(merged["topology"]).min_latency
+    return merged.get("min_delay", 0.01)
+
+
+def run_sequential(num_nodes=None, seed=None, network_config=None, max_time=5.0, setup=start_all, quiet=True):
+    """Engine tuần tự, trả về {node_id: node_summary}"""
+    sim, nodes = build_network(num_nodes, seed=seed, network_config=network_config, key_prefix="pdes")
+    with quiet_output(quiet):
+        setup(nodes)
+        sim.run(max_time=max_time)
+    return {n.node_id: node_summary(n) for n in nodes}
+
+
+def run_parallel(num_nodes=None, seed=None, network_config=None, max_time=5.0, workers=2,
+                 setup=start_all, quiet=True, stats=None):
+    """
+    Engine PDES với `workers` process. Trả về {node_id: node_summary}, giống run_sequential.
+    stats (dict, tùy chọn) được điền số cửa sổ và số tin nhắn liên partition.
+    """
+    lookahead = _lookahead(network_config)
+    if lookahead <= 0:
+        raise ValueError("PDES needs min_delay > 0 as lookahead")
+
+    names = node_names(num_nodes)
+    partitions = [names[i::workers] for i in range(workers)]
+    owner = {name: i for i, part in enumerate(partitions) for name in part}
+    build_kwargs = {"num_nodes": num_nodes, "seed": seed, "network_config": network_config, "key_prefix": "pdes"}
+
+    ctx = multiprocessing.get_context()
+    conns, procs = [], []
+    for part in partitions:
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=_worker, args=(child, part, build_kwargs, setup, quiet), daemon=True)
+        proc.start()
+        child.close()
+        conns.append(parent)
+        procs.append(proc)
+
+    windows = 0
+    remote_messages = 0
+    try:
+        replies = [conn.recv() for conn in conns]
+        while True:
+            # Gom outbox của mọi worker theo partition đích; cửa sổ mới bắt đầu ở sự kiện sớm nhất
+            inbound = [[] for _ in partitions]
+            next_times = []
+            for outbox, next_time in replies:
+                if next_time is not None:
+                    next_times.append(next_time)
+                for entry in outbox:
+                    target = owner.get(entry[3])
+                    if target is not None:
+                        inbound[target].append(entry)
+                        next_times.append(entry[0])
+            if not next_times:
+                break
+            start = min(next_times)
+            if start > max_time:
+                break
+
+            end = start + lookahead
+            final = end > max_time
+            windows += 1
+            remote_messages += sum(len(batch) for batch in inbound)
+            for conn, batch in zip(conns, inbound):
+                conn.send(("RUN", max_time if final else end, final, batch))
+            replies = [conn.recv() for conn in conns]
+            if final:
+                break
+
+        results = {}
+        for conn in conns:
+            conn.send(("FINISH",))
+        for conn in conns:
+            results.update(conn.recv())
+    finally:
+        for conn in conns:
+            conn.close()
+        for proc in procs:
+            proc.join()
+
+    if stats is not None:
+        stats.update({"windows": windows, "remote_messages": remote_messages, "workers": workers})
+    # Trả về theo thứ tự node giống run_sequential
+    return {name: results[name] for name in names}
+
+
+def _worker(conn, hosted, build_kwargs, setup, quiet):
+    """Process con: chạy các node trong `hosted`, xử lý từng cửa sổ theo lệnh của coordinator"""
+    with quiet_output(quiet):
+        sim, nodes = build_network(hosted=hosted, **build_kwargs)
+        local = [n for n in nodes if n.node_id in sim.hosted]
+        setup(local)
+        conn.send((sim.take_outbox(), sim.next_event_time()))
+        while True:
+            command = conn.recv()
+            if command[0] == "RUN":
+                _, end, inclusive, batch = command
+                sim.deliver_remote(batch)
+                sim.run_until(end, inclusive)
+                conn.send((sim.take_outbox(), sim.next_event_time()))
+            else:
+                conn.send({n.node_id: node_summary(n) for n in local})
+                break
+    conn.close()
@@ -0,0 +1,122 @@
+# src/pending_bodies.py
+"""
+Body tới trước khi receiver accept header của block: giữ lại phía receiver cho tới khi
+header được accept (giao), receiver finalize height của block (bỏ), hoặc bị đẩy ra khi
+receiver giữ quá `limit` body (bỏ body giữ lâu nhất). Dùng chung cho Simulator và
+RealtimeRuntime; mỗi transport tự quyết item giữ là gì (event tuple, frame đã giải mã).
+"""
+from collections import defaultdict
+
+from src.trace import NullTraceSink, EV_DROP_BODY, EV_PENDING_BODY
+
+DEFAULT_MAX_PENDING_BODIES = 256
+
+
+class PendingBodies:
+    def __init__(self, limit: int = DEFAULT_MAX_PENDING_BODIES, trace_sink=None):
+        self.limit = limit
+        self.trace_sink = trace_sink or NullTraceSink()
+        # Đánh chỉ số theo (receiver, block_hash) để accept lấy ra O(1), không giữ dict rỗng:
+        # {receiver: {block_hash: {sender: (height, msg_id, item)}}}
+        self.blocks = {}
+        self.counts = {}  # {receiver: số body đang giữ}
+        # Accepted headers: {receiver: {block_hash: height hoặc None}}
+        self.accepted_headers = defaultdict(dict)
+        # Height đã finalize mà receiver báo qua forget: body cũ hơn bị bỏ luôn
+        self.forgotten_heights = {}
+
+    def __getstate__(self):
+        """Trạng thái để pickle: không kèm trace sink (như TokenBucketLimiter)"""
+        state = self.__dict__.copy()
+        state["trace_sink"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.trace_sink = NullTraceSink()
+
+    def hold(self, now: float, sender_id: str, receiver_id: str, body: dict, msg_id: int, item) -> bool:
+        """
+        Body tới receiver: False nếu header đã được accept (giao ngay), ngược lại True
+        (item bị giữ, hoặc bị bỏ vì thuộc height receiver đã finalize).
+        Body cùng block từ cùng sender thay bản đang giữ, không tính thêm vào giới hạn.
+        """
+        block_hash = body.get("block_hash")
+        if block_hash in self.accepted_headers[receiver_id]:
+            return False
+        height = body.get("height")
+        forgotten = self.forgotten_heights.get(receiver_id)
+        if height is not None and forgotten is not None and height <= forgotten:
+            self.trace_sink.emit(EV_DROP_BODY, now, sender_id, receiver_id, msg_id)
+            return True
+
+        held = self.blocks.get(receiver_id, {}).get(block_hash)
+        if held is None or sender_id not in held:
+            count = self.counts.get(receiver_id, 0)
+            if count >= self.limit:
+                if count == 0:
+                    self.trace_sink.emit(EV_DROP_BODY, now, sender_id, receiver_id, msg_id)
+                    return True
+                self._evict(now, receiver_id)
+                count -= 1
+            self.counts[receiver_id] = count + 1
+            held = self.blocks.setdefault(receiver_id, {}).setdefault(block_hash, {})
+        held[sender_id] = (height, msg_id, item)
+        self.trace_sink.emit(EV_PENDING_BODY, now, sender_id, receiver_id, msg_id)
+        return True
+
+    def _evict(self, now: float, receiver_id: str):
+        """Bỏ body bị giữ lâu nhất của receiver (block giữ sớm nhất, sender giữ sớm nhất)"""
+        blocks = self.blocks[receiver_id]
+        block_hash = next(iter(blocks))
+        held = blocks[block_hash]
+        sender_id = next(iter(held))
+        _, msg_id, _ = held.pop(sender_id)
+        if not held:
+            del blocks[block_hash]
+        if not blocks:
+            del self.blocks[receiver_id]
+        self.trace_sink.emit(EV_DROP_BODY, now, sender_id, receiver_id, msg_id)
+
+    def count(self, receiver_id: str = None) -> int:
+        """Số body đang bị giữ (của một receiver hoặc tổng)"""
+        if receiver_id is not None:
+            return self.counts.get(receiver_id, 0)
+        return sum(self.counts.values())
+
+    def accept(self, receiver_id: str, block_hash: str, height: int = None) -> list:
+        """Receiver accept header: trả về các item đang giữ của block, theo thứ tự được giữ"""
+        self.accepted_headers[receiver_id][block_hash] = height
+        blocks = self.blocks.get(receiver_id)
+        if not blocks:
+            return []
+        held = blocks.pop(block_hash, None)
+        if held is None:
+            return []
+        if not blocks:
+            del self.blocks[receiver_id]
+        self.counts[receiver_id] -= len(held)
+        return [item for _, _, item in held.values()]
+
+    def forget(self, receiver_id: str, height: int):
+        """
+        Receiver đã finalize `height`: bỏ header đã accept và body đang giữ của các
+        block height <= height. Body của các height này tới sau đó bị bỏ ngay.
+        """
+        self.forgotten_heights[receiver_id] = height
+        accepted = self.accepted_headers.get(receiver_id)
+        if accepted:
+            self.accepted_headers[receiver_id] = {
+                bh: h for bh, h in accepted.items() if h is None or h > height
+            }
+        blocks = self.blocks.get(receiver_id)
+        if not blocks:
+            return
+        for block_hash in list(blocks):
+            held = blocks[block_hash]
+            body_height = next(iter(held.values()))[0]
+            if body_height is not None and body_height <= height:
+                del blocks[block_hash]
+                self.counts[receiver_id] -= len(held)
+        if not blocks:
+            del self.blocks[receiver_id]
@@ -0,0 +1,206 @@
+# src/rate_limiter.py
+"""
+Rate limiter token bucket theo link (sender, receiver, lớp tin nhắn).
+
+Mỗi bucket chứa tối đa `burst` token, được nạp lại `max_messages_per_second`
+token mỗi giây mô phỏng; mỗi tin nhắn tiêu một token. Hết token thì tin bị chặn và
+link bị block trong `block_duration` giây (0 = chỉ chặn, không block).
+Mỗi lớp (consensus / block / tx) có bucket và ngân sách riêng nên spam TX
+không làm đói vote.
+
+Trạng thái nằm trong các mảng NumPy đánh chỉ số theo slot của link. Link rảnh
+(bucket đã đầy lại, không còn block chưa gỡ) mang trạng thái y như link mới nên được
+thu hồi định kỳ mà không đổi kết quả lẫn trace; bộ nhớ tỉ lệ với số link đang hoạt động.
+Link có block đã hết hạn vẫn được giữ tới lần admit kế tiếp, vì EV_UNBLOCK chỉ được
+ghi lúc đó.
+"""
+import numpy as np
+
+from src.message_classes import CLASS_IDS, CLASS_NAMES
+from src.trace import NullTraceSink, EV_BLOCK, EV_BLOCKED, EV_UNBLOCK
+
+
+class TokenBucketLimiter:
+    # Dọn link rảnh khi số slot đạt ngưỡng; ngưỡng kế tiếp = 2 * số slot còn lại
+    EVICT_MIN = 1024
+
+    def __init__(self, rate: float = 100.0, burst: float = None, block_duration: float = 1.0,
+                 classes: dict = None, trace_sink=None):
+        """
+        classes: ngân sách riêng theo lớp, ví dụ
+            {"tx": {"max_messages_per_second": 20, "burst": 40}}
+        lớp không khai báo dùng rate/burst mặc định.
+        """
+        self.block_duration = block_duration
+        self.trace_sink = trace_sink or NullTraceSink()
+        self.class_rate = np.full(len(CLASS_NAMES), float(rate))
+        self.class_burst = np.full(len(CLASS_NAMES), float(rate if burst is None else burst))
+        for name, budget in (classes or {}).items():
+            if name not in CLASS_IDS:
+                raise ValueError(f"Unknown message class: {name!r} (expected one of {list(CLASS_NAMES)})")
+            cls = CLASS_IDS[name]
+            self.class_rate[cls] = budget.get("max_messages_per_second", rate)
+            self.class_burst[cls] = budget.get("burst", self.class_rate[cls])
+        # Bản Python của bảng ngân sách cho đường một tin nhắn
+        self._rates = self.class_rate.tolist()
+        self._bursts = self.class_burst.tolist()
+
+        self.slots = {}  # {(sender, receiver, cls): slot}
+        self.keys = []   # slot -> key (None nếu slot trống)
+        self.free = []   # Slot đã thu hồi, dùng lại trước khi cấp slot mới
+        self.tokens = np.zeros(0)
+        self.last = np.zeros(0)           # Thời điểm nạp token gần nhất
+        self.blocked_until = np.zeros(0)  # 0 = không bị block
+        self.link_class = np.zeros(0, dtype=np.int8)
+        self._next_evict = self.EVICT_MIN
+
+    @classmethod
+    def from_config(cls, rate_config: dict, trace_sink=None):
+        """Tạo từ mục "rate_limit" của cấu hình mạng"""
+        return cls(
+            rate=rate_config.get("max_messages_per_second", 100),
+            burst=rate_config.get("burst"),
+            block_duration=rate_config.get("block_duration", 1.0),
+            classes=rate_config.get("classes"),
+            trace_sink=trace_sink,
+        )
+
+    def __getstate__(self):
+        # Trace sink không đi theo checkpoint; Simulator gắn lại sink khi nạp
+        state = self.__dict__.copy()
+        state["trace_sink"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.trace_sink = NullTraceSink()
+
+    def __len__(self):
+        """Số link đang có trạng thái"""
+        return len(self.slots)
+
+    def _slot(self, key, cls: int, now: float) -> int:
+        slot = self.slots.get(key)
+        if slot is not None:
+            return slot
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+            if slot >= len(self.tokens):
+                capacity = max(64, 2 * len(self.tokens))
+                self.tokens = np.resize(self.tokens, capacity)
+                self.last = np.resize(self.last, capacity)
+                self.blocked_until = np.resize(self.blocked_until, capacity)
+                self.link_class = np.resize(self.link_class, capacity)
+        self.slots[key] = slot
+        self.tokens[slot] = self._bursts[cls]
+        self.last[slot] = now
+        self.blocked_until[slot] = 0.0
+        self.link_class[slot] = cls
+        return slot
+
+    def admit(self, now: float, sender_id: str, receiver_id: str, cls: int, count: int = 1) -> int:
+        """Cho `count` tin nhắn cùng lúc qua link; trả về số tin được gửi (các tin đầu tiên)"""
+        if len(self.slots) >= self._next_evict:
+            self.evict_idle(now)
+        slot = self._slot((sender_id, receiver_id, cls), cls, now)
+        tokens = min(self._bursts[cls], float(self.tokens[slot]) + (now - float(self.last[slot])) * self._rates[cls])
+        self.last[slot] = now
+        blocked_until = float(self.blocked_until[slot])
+        if blocked_until:
+            if now < blocked_until:
+                self.tokens[slot] = tokens
+                self.trace_sink.emit(EV_BLOCKED, now, sender_id, receiver_id, 0)
+                return 0
+            self.blocked_until[slot] = 0.0
+            self.trace_sink.emit(EV_UNBLOCK, now, sender_id, receiver_id, 0)
+
+        allowed = min(count, int(tokens))
+        tokens -= allowed
+        self.tokens[slot] = tokens
+        if allowed < count and self.block_duration > 0:
+            # Tin vượt ngân sách đầu tiên kích hoạt block, các tin sau bị chặn
+            self.blocked_until[slot] = now + self.block_duration
+            self.trace_sink.emit(EV_BLOCK, now, sender_id, receiver_id, 0)
+        return allowed
+
+    def admit_many(self, now: float, sender_id: str, receivers, cls: int, count: int = 1) -> list:
+        """Như admit() cho từng receiver (receiver không trùng nhau), tính theo mảng"""
+        if len(set(receivers)) < len(receivers):
+            # Receiver lặp lại: trạng thái phải cập nhật tuần tự
+            return [self.admit(now, sender_id, r, cls, count) for r in receivers]
+        if len(self.slots) >= self._next_evict:
+            self.evict_idle(now)
+        get = self.slots.get
+        slots = [get((sender_id, r, cls)) for r in receivers]
+        if None in slots:
+            slots = [self._slot((sender_id, r, cls), cls, now) if slot is None else slot
+                     for r, slot in zip(receivers, slots)]
+        slots = np.array(slots, dtype=np.int64)
+
+        tokens = np.minimum(self.class_burst[cls], self.tokens[slots] + (now - self.last[slots]) * self.class_rate[cls])
+        self.last[slots] = now
+        blocked_until = self.blocked_until[slots]
+        if blocked_until.any():
+            blocked = now < blocked_until
+            unblocked = (blocked_until != 0) & ~blocked
+            allowed = np.where(blocked, 0.0, np.minimum(count, np.floor(tokens)))
+        else:
+            blocked = unblocked = None
+            allowed = np.minimum(count, np.floor(tokens))
+        tokens -= allowed
+        self.tokens[slots] = tokens
+        newly_blocked = allowed < count
+        if blocked is not None:
+            newly_blocked &= ~blocked
+        if self.block_duration > 0:
+            if unblocked is not None:
+                blocked_until[unblocked] = 0.0
+            self.blocked_until[slots] = np.where(newly_blocked, now + self.block_duration, blocked_until)
+        else:
+            newly_blocked[:] = False
+            self.blocked_until[slots] = 0.0
+
+        # Trace theo thứ tự receiver, như gọi admit() lần lượt
+        traced = newly_blocked if blocked is None else blocked | unblocked | newly_blocked
+        if traced.any():
+            emit = self.trace_sink.emit
+            hits = np.flatnonzero(traced).tolist()
+            new_block = newly_blocked.tolist()
+            if blocked is None:
+                for i in hits:
+                    emit(EV_BLOCK, now, sender_id, receivers[i], 0)
+            else:
+                was_blocked, unblock = blocked.tolist(), unblocked.tolist()
+                for i in hits:
+                    if was_blocked[i]:
+                        emit(EV_BLOCKED, now, sender_id, receivers[i], 0)
+                        continue
+                    if unblock[i]:
+                        emit(EV_UNBLOCK, now, sender_id, receivers[i], 0)
+                    if new_block[i]:
+                        emit(EV_BLOCK, now, sender_id, receivers[i], 0)
+        return allowed.astype(np.int64).tolist()
+
+    def evict_idle(self, now: float):
+        """
+        Thu hồi slot của link rảnh: bucket đã nạp đầy lại và không còn block chưa gỡ
+        (blocked_until == 0). Block hết hạn chỉ được gỡ, kèm EV_UNBLOCK, ở lần admit kế tiếp.
+        """
+        if self.slots:
+            used = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+            classes = self.link_class[used]
+            refilled = self.tokens[used] + (now - self.last[used]) * self.class_rate[classes]
+            idle = (refilled >= self.class_burst[classes]) & (self.blocked_until[used] == 0.0)
+            for slot in used[idle].tolist():
+                del self.slots[self.keys[slot]]
+                self.keys[slot] = None
+                self.free.append(slot)
+        self._next_evict = max(self.EVICT_MIN, 2 * len(self.slots))
+
+    def state(self) -> dict:
+        """{(sender, receiver, lớp): (tokens, blocked_until)} của các link đang có trạng thái"""
+        return {key: (float(self.tokens[slot]), float(self.blocked_until[slot])) for key, slot in self.slots.items()}
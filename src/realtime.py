@@ -0,0 +1,508 @@
+# src/realtime.py
+"""
+Runtime thời gian thực: chạy cùng logic Node trên asyncio và transport thật
+(TCP / UDP trên 127.0.0.1, hoặc ring buffer shared memory) thay cho Simulator sự kiện rời rạc.
+
+RealtimeRuntime cài đặt Transport và Clock (src/transport.py) như Simulator nên Node chạy
+không cần sửa. current_time là số giây wall-clock kể từ lúc runtime start.
+
+Mỗi tin nhắn là một frame: 4 byte độ dài payload (big-endian) + payload
+    [kind, sender, receiver, msg_id] "\n" message
+(cả hai phần là JSON đơn định; JSON không chứa newline thô nên tách được ở newline đầu tiên).
+  - TCP: mỗi node nghe một cổng; process mở một kết nối tới mỗi receiver, dùng chung
+    cho mọi node nó chạy (một process mỗi node -> đúng một kết nối mỗi link).
+  - UDP: mỗi frame là một datagram gửi từ socket của sender; frame lớn hơn
+    MAX_DATAGRAM bị bỏ.
+  - shm: mỗi link một ring SPSC trong shared memory (src/shm_ring.py), frame được chép
+    thẳng vào ring; ring đầy thì frame chờ trong backlog của link (không bị bỏ).
+    Receiver trộn record của mọi ring theo thời điểm ghi: đọc lần lượt từng ring sẽ
+    xáo trộn thứ tự giữa các sender (ví dụ header của height sau tới trước PRECOMMIT
+    cuối của height hiện tại và bị bỏ).
+Suy giảm mạng (drop, delay, jitter) được tiêm ở phía gửi, trước khi frame xuống socket.
+"""
+import asyncio
+import json
+import random
+import struct
+import time
+from collections import deque
+from operator import itemgetter
+
+from src.simulator import KIND_MESSAGE, KIND_HEADER, KIND_BODY, SEQ_STRIDE, Simulator
+from src.shm_ring import ShmFabric, DEFAULT_CAPACITY, RECORD
+from src.pending_bodies import PendingBodies, DEFAULT_MAX_PENDING_BODIES
+from src.transport import Transport, Clock
+from src.utils import deterministic_encode
+from src.trace import (
+    NullTraceSink, EV_SEND, EV_SEND_HEADER, EV_SEND_BODY, EV_DROP, EV_DROP_HEADER, EV_DROP_BODY,
+    EV_TIMER
+)
+
+FRAME_HEADER = struct.Struct(">I")
+# Frame lớn hơn bị coi là hỏng (kết nối bị đóng)
+MAX_FRAME = 16 * 1024 * 1024
+# Payload UDP tối đa trên IPv4
+MAX_DATAGRAM = 65507
+
+TRANSPORTS = ("tcp", "udp", "shm")
+_DECODER = json.JSONDecoder()
+# (mã trace khi gửi, mã trace khi bỏ) theo kind
+SEND_CODES = {
+    KIND_MESSAGE: (EV_SEND, EV_DROP),
+    KIND_HEADER: (EV_SEND_HEADER, EV_DROP_HEADER),
+    KIND_BODY: (EV_SEND_BODY, EV_DROP_BODY),
+}
+
+
+def frame_head(kind: int, sender_id: str, receiver_id: str, msg_id: int) -> bytes:
+    """Phần đầu của payload (tới hết newline); payload = frame_head + message đã encode"""
+    return deterministic_encode([kind, sender_id, receiver_id, msg_id]) + b"\n"
+
+
+def encode_frame(kind: int, sender_id: str, receiver_id: str, msg_id: int, encoded_message: bytes) -> bytes:
+    """Frame hoàn chỉnh (kèm tiền tố độ dài) từ message đã encode sẵn"""
+    head = frame_head(kind, sender_id, receiver_id, msg_id)
+    return b"".join((FRAME_HEADER.pack(len(head) + len(encoded_message)), head, encoded_message))
+
+
+def decode_frame(payload):
+    """
+    Payload (không có tiền tố độ dài; bytes hoặc memoryview vào ring shm)
+    -> (kind, sender_id, receiver_id, msg_id, message).
+    Giải mã UTF-8 thẳng từ buffer rồi parse hai giá trị JSON tại chỗ, không cắt bản sao trung gian.
+    """
+    text = str(payload, "utf-8")
+    (kind, sender_id, receiver_id, msg_id), end = _DECODER.raw_decode(text)
+    message, _ = _DECODER.raw_decode(text, end + 1)
+    return kind, sender_id, receiver_id, msg_id, message
+
+
+class Impairments:
+    """Drop / delay / jitter tiêm vào phía gửi của transport"""
+
+    def __init__(self, drop_prob: float = 0.0, delay: float = 0.0, jitter: float = 0.0, seed=None):
+        self.drop_prob = drop_prob
+        self.delay = delay
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def from_config(cls, config: dict, seed=None):
+        return cls(
+            drop_prob=config.get("drop_prob", 0.0),
+            delay=config.get("delay", 0.0),
+            jitter=config.get("jitter", 0.0),
+            seed=seed,
+        )
+
+    def sample(self):
+        """Độ trễ thêm (giây) cho một frame, None nếu frame bị bỏ"""
+        if self.drop_prob and self.rng.random() < self.drop_prob:
+            return None
+        if self.jitter:
+            return self.delay + self.jitter * self.rng.random()
+        return self.delay
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def datagram_received(self, data, addr):
+        if len(data) < FRAME_HEADER.size:
+            return
+        (length,) = FRAME_HEADER.unpack_from(data)
+        if length != len(data) - FRAME_HEADER.size:
+            return
+        self.runtime._deliver(data[FRAME_HEADER.size:])
+
+
+class RealtimeRuntime(Transport, Clock):
+    # Thời gian chờ tối đa để kết nối tới listener của peer (peer ở process khác có thể lên chậm)
+    CONNECT_TIMEOUT = 10.0
+    # shm: chu kỳ quét ring dự phòng (khi lỡ chuông cửa) và chu kỳ thử lại backlog khi ring đầy
+    SHM_POLL_INTERVAL = 0.01
+    SHM_RETRY_INTERVAL = 0.0005
+
+    def __init__(self, config: dict = None, trace_sink=None, fabric: ShmFabric = None):
+        """
+        config (mục "realtime" của CONFIG):
+            transport: "tcp" | "udp" | "shm"
+            host: địa chỉ listener (mặc định 127.0.0.1)
+            base_port: cổng của node rank r là base_port + r; 0 = hệ điều hành tự chọn
+                       (chỉ dùng được khi mọi node chạy trong cùng process)
+            impairments: {"drop_prob", "delay", "jitter"}
+            ring_capacity: byte mỗi ring (shm)
+            max_pending_bodies: số body chờ header tối đa mỗi receiver (như Simulator)
+            seed: seed của RNG suy giảm mạng
+        fabric: ShmFabric dùng chung khi các node chạy ở nhiều process (tạo trước khi fork);
+                None = runtime tự tạo lúc start (mọi node trong process này).
+        """
+        config = config or {}
+        self.transport = config.get("transport", "tcp")
+        if self.transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {self.transport!r} (expected one of {list(TRANSPORTS)})")
+        self.host = config.get("host", "127.0.0.1")
+        self.base_port = config.get("base_port", 0)
+        self.ring_capacity = config.get("ring_capacity", DEFAULT_CAPACITY)
+        self.fabric = fabric
+        self._own_fabric = False
+        self.impairments = Impairments.from_config(config.get("impairments", {}), config.get("seed"))
+        self.trace_sink = trace_sink or NullTraceSink()
+        self._trace = self.trace_sink.emit
+
+        self.nodes = {}       # Node chạy trong process này
+        self.node_ranks = {}  # Mọi node của mạng -> rank (quyết định cổng và msg_id)
+        self.addresses = {}   # node_id -> (host, port)
+        self._send_counts = {}
+
+        self.loop = None
+        self._start_time = None
+        self._servers = []
+        self._writers = {}    # receiver_id -> StreamWriter (TCP)
+        self._datagrams = {}  # node_id -> DatagramTransport của node (UDP)
+        self._readers = set()  # Task đọc của các kết nối TCP đến
+        self._backlog = {}    # (sender, receiver) -> deque[(parts, size)] chờ ring còn chỗ (shm)
+        self._retry_handle = None
+        self._poller = None
+        self._timers = {}     # timer_id -> asyncio.TimerHandle
+        self._next_timer_id = 0
+
+        # Body tới trước khi receiver accept header được giữ lại như Simulator
+        self.held_bodies = PendingBodies(config.get("max_pending_bodies", DEFAULT_MAX_PENDING_BODIES),
+                                         self.trace_sink)
+
+        self.stats = {"frames_sent": 0, "bytes_sent": 0, "dropped": 0, "delivered": 0}
+
+    # --- Đăng ký node (cùng interface với Simulator để dùng chung runner) ---
+
+    def register_node(self, node):
+        self.assign_rank(node.node_id)
+        self.nodes[node.node_id] = node
+
+    def assign_rank(self, node_id: str) -> int:
+        rank = self.node_ranks.get(node_id)
+        if rank is None:
+            rank = self.node_ranks[node_id] = len(self.node_ranks)
+        return rank
+
+    @property
+    def current_time(self) -> float:
+        if self.loop is None:
+            return 0.0
+        return self.loop.time() - self._start_time
+
+    # --- Vòng đời ---
+
+    async def start(self):
+        """Mở listener cho các node của process này và kết nối tới mọi node (TCP)"""
+        self.loop = asyncio.get_running_loop()
+        if self.transport == "shm":
+            self._start_shm()
+            self._start_time = self.loop.time()
+            return
+        for node_id, rank in self.node_ranks.items():
+            if node_id not in self.nodes:
+                if not self.base_port:
+                    raise ValueError("base_port is required when some nodes run in another process")
+                self.addresses[node_id] = (self.host, self.base_port + rank)
+        for node_id in self.nodes:
+            port = self.base_port + self.node_ranks[node_id] if self.base_port else 0
+            if self.transport == "tcp":
+                server = await asyncio.start_server(self._accept, self.host, port)
+                self._servers.append(server)
+                sockname = server.sockets[0].getsockname()
+            else:
+                transport, _ = await self.loop.create_datagram_endpoint(
+                    lambda: _DatagramReceiver(self), local_addr=(self.host, port))
+                self._datagrams[node_id] = transport
+                sockname = transport.get_extra_info("sockname")
+            self.addresses[node_id] = (self.host, sockname[1])
+        if self.transport == "tcp":
+            for receiver_id in self.node_ranks:
+                self._writers[receiver_id] = await self._connect(self.addresses[receiver_id])
+        self._start_time = self.loop.time()
+
+    def _start_shm(self):
+        if self.fabric is None:
+            if len(self.nodes) < len(self.node_ranks):
+                raise ValueError("shm transport across processes needs a ShmFabric created before fork")
+            self.fabric = ShmFabric(self.node_ranks, self.ring_capacity)
+            self._own_fabric = True
+        for node_id in self.nodes:
+            self.loop.add_reader(self.fabric.doorbell_fd(node_id), self._drain_shm, node_id)
+        self._incoming = {node_id: self.fabric.incoming(node_id) for node_id in self.nodes}
+        self._poller = self.loop.create_task(self._poll_shm())
+
+    async def _connect(self, address):
+        deadline = self.loop.time() + self.CONNECT_TIMEOUT
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(*address)
+                return writer
+            except OSError:
+                if self.loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.05)
+
+    async def run(self, duration: float):
+        """Chạy vòng lặp sự kiện thêm `duration` giây wall-clock"""
+        await asyncio.sleep(duration)
+
+    async def close(self):
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        if self.transport == "shm" and self.fabric is not None:
+            self._poller.cancel()
+            if self._retry_handle is not None:
+                self._retry_handle.cancel()
+            for node_id in self.nodes:
+                self.loop.remove_reader(self.fabric.doorbell_fd(node_id))
+            if self._own_fabric:
+                self.fabric.close()
+                self.fabric = None
+        for writer in self._writers.values():
+            writer.close()
+        for transport in self._datagrams.values():
+            transport.close()
+        for server in self._servers:
+            server.close()
+        for task in list(self._readers):
+            task.cancel()
+        for writer in self._writers.values():
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        for server in self._servers:
+            await server.wait_closed()
+        self._writers.clear()
+        self._datagrams.clear()
+        self._servers.clear()
+
+    # --- Timer ---
+
+    def schedule_timer(self, node_id: str, delay: float, callback_token) -> int:
+        """Sau `delay` giây wall-clock gọi node.on_timer(callback_token). Trả về timer_id."""
+        timer_id = self._next_timer_id
+        self._next_timer_id += 1
+        self._timers[timer_id] = self.loop.call_later(delay, self._fire, timer_id, node_id, callback_token)
+        return timer_id
+
+    def cancel(self, timer_id: int):
+        """Hủy timer; timer đã chạy hoặc không tồn tại thì bỏ qua"""
+        handle = self._timers.pop(timer_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _fire(self, timer_id: int, node_id: str, token):
+        del self._timers[timer_id]
+        self._trace(EV_TIMER, self.current_time, node_id, node_id, timer_id)
+        node = self.nodes.get(node_id)
+        if node is None:
+            return
+        try:
+            node.on_timer(token)
+        except Exception as e:
+            # Lỗi của handler không được lan ra event loop (như _dispatch)
+            print(f"Error firing timer {token!r} on {node_id}: {e}")
+
+    # --- Gửi ---
+
+    def _new_msg_id(self, sender_id: str) -> int:
+        """msg_id không trùng giữa các process: (số tin của sender) * SEQ_STRIDE + rank"""
+        count = self._send_counts.get(sender_id, 0)
+        self._send_counts[sender_id] = count + 1
+        return count * SEQ_STRIDE + self.node_ranks[sender_id]
+
+    def _send(self, kind: int, sender_id: str, receiver_id: str, encoded_message: bytes):
+        send_code, drop_code = SEND_CODES[kind]
+        msg_id = self._new_msg_id(sender_id)
+        now = self.current_time
+        delay = self.impairments.sample()
+        if delay is None:
+            self.stats["dropped"] += 1
+            self._trace(drop_code, now, sender_id, receiver_id, msg_id)
+            return
+        head = frame_head(kind, sender_id, receiver_id, msg_id)
+        if delay > 0:
+            self.loop.call_later(delay, self._write, sender_id, receiver_id, head, encoded_message)
+        else:
+            self._write(sender_id, receiver_id, head, encoded_message)
+        self._trace(send_code, now, sender_id, receiver_id, msg_id)
+
+    def _write(self, sender_id: str, receiver_id: str, head: bytes, encoded_message: bytes):
+        size = len(head) + len(encoded_message)
+        if self.transport == "shm":
+            self._write_ring(sender_id, receiver_id, (head, encoded_message), size, time.monotonic_ns())
+            return
+        frame = b"".join((FRAME_HEADER.pack(size), head, encoded_message))
+        if self.transport == "tcp":
+            writer = self._writers.get(receiver_id)
+            if writer is None or writer.is_closing():
+                self.stats["dropped"] += 1
+                return
+            writer.write(frame)
+        else:
+            if len(frame) - FRAME_HEADER.size > MAX_DATAGRAM:
+                self.stats["dropped"] += 1
+                return
+            transport = self._datagrams.get(sender_id)
+            if transport is None or transport.is_closing():
+                self.stats["dropped"] += 1
+                return
+            transport.sendto(frame, self.addresses[receiver_id])
+        self.stats["frames_sent"] += 1
+        self.stats["bytes_sent"] += len(frame)
+
+    def _write_ring(self, sender_id: str, receiver_id: str, parts, size: int, stamp: int):
+        if size + RECORD.size > self.fabric.capacity:
+            self.stats["dropped"] += 1
+            return
+        link = (sender_id, receiver_id)
+        backlog = self._backlog.get(link)
+        if backlog:
+            # Giữ thứ tự FIFO của link: frame mới xếp sau các frame đang chờ
+            backlog.append((parts, size, stamp))
+            return
+        wake = self.fabric.ring(sender_id, receiver_id).write(parts, size, stamp)
+        if wake is None:
+            self._backlog[link] = deque([(parts, size, stamp)])
+            if self._retry_handle is None:
+                self._retry_handle = self.loop.call_later(self.SHM_RETRY_INTERVAL, self._retry_backlog)
+            return
+        if wake:
+            self.fabric.ring_doorbell(receiver_id)
+        self.stats["frames_sent"] += 1
+        self.stats["bytes_sent"] += size + RECORD.size
+
+    def _retry_backlog(self):
+        self._retry_handle = None
+        for (sender_id, receiver_id), backlog in list(self._backlog.items()):
+            ring = self.fabric.ring(sender_id, receiver_id)
+            written = False
+            while backlog:
+                parts, size, stamp = backlog[0]
+                if ring.write(parts, size, stamp) is None:
+                    break
+                backlog.popleft()
+                written = True
+                self.stats["frames_sent"] += 1
+                self.stats["bytes_sent"] += size + RECORD.size
+            if written:
+                self.fabric.ring_doorbell(receiver_id)
+            if not backlog:
+                del self._backlog[(sender_id, receiver_id)]
+        if self._backlog:
+            self._retry_handle = self.loop.call_later(self.SHM_RETRY_INTERVAL, self._retry_backlog)
+
+    def send_message(self, sender_id: str, receiver_id: str, message: dict):
+        self._send(KIND_MESSAGE, sender_id, receiver_id, deterministic_encode(message))
+
+    def broadcast(self, sender_id: str, targets, message: dict, copies: int = 1):
+        """Gửi `copies` bản message tới mỗi target; message chỉ encode một lần"""
+        encoded = deterministic_encode(message)
+        for target in targets:
+            for _ in range(copies):
+                self._send(KIND_MESSAGE, sender_id, target, encoded)
+
+    def broadcast_header(self, sender_id: str, targets, header: dict, copies: int = 1):
+        encoded = deterministic_encode(header)
+        for target in targets:
+            for _ in range(copies):
+                self._send(KIND_HEADER, sender_id, target, encoded)
+
+    def send_header(self, sender_id: str, receiver_id: str, header: dict):
+        self._send(KIND_HEADER, sender_id, receiver_id, deterministic_encode(header))
+
+    def send_body(self, sender_id: str, receiver_id: str, body: dict, block_hash: str):
+        self._send(KIND_BODY, sender_id, receiver_id, deterministic_encode(body))
+
+    # --- Nhận ---
+
+    async def _accept(self, reader, writer):
+        task = asyncio.current_task()
+        self._readers.add(task)
+        try:
+            while True:
+                (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                if length > MAX_FRAME:
+                    print(f"Frame too large ({length} bytes), closing connection")
+                    break
+                self._deliver(await reader.readexactly(length))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._readers.discard(task)
+            writer.close()
+
+    def _drain_shm(self, node_id: str):
+        self.fabric.clear_doorbell(node_id)
+        rings = self._incoming[node_id]
+        records = []
+        for ring in rings:
+            records += ring.read()
+        # Mỗi ring đã theo thứ tự ghi; sort ổn định giữ nguyên thứ tự đó khi trùng thời điểm
+        records.sort(key=itemgetter(0))
+        try:
+            for _, payload in records:
+                self._deliver(payload)
+        finally:
+            # Payload là view vào ring: giao xong mới trả chỗ cho writer
+            for _, payload in records:
+                payload.release()
+            for ring in rings:
+                ring.release()
+
+    async def _poll_shm(self):
+        while True:
+            await asyncio.sleep(self.SHM_POLL_INTERVAL)
+            for node_id in self.nodes:
+                self._drain_shm(node_id)
+
+    def _deliver(self, payload: bytes):
+        kind, sender_id, receiver_id, msg_id, message = decode_frame(payload)
+        node = self.nodes.get(receiver_id)
+        if node is None:
+            return
+        if kind == KIND_BODY and self._hold_body(sender_id, receiver_id, message, msg_id):
+            return
+        self._dispatch(kind, sender_id, receiver_id, message, msg_id)
+
+    def _dispatch(self, kind: int, sender_id: str, receiver_id: str, message: dict, msg_id: int):
+        code, handler = Simulator.DISPATCH[kind]
+        self.stats["delivered"] += 1
+        self._trace(code, self.current_time, sender_id, receiver_id, msg_id)
+        try:
+            getattr(self.nodes[receiver_id], handler)(sender_id, message)
+        except Exception as e:
+            # Lỗi của một tin không được làm chết kết nối của cả link
+            print(f"Error delivering message to {receiver_id}: {e}")
+
+    def _hold_body(self, sender_id: str, receiver_id: str, body: dict, msg_id: int) -> bool:
+        """Giữ body khi receiver chưa accept header; True nếu body không được giao ngay"""
+        return self.held_bodies.hold(self.current_time, sender_id, receiver_id, body, msg_id,
+                                     (sender_id, body, msg_id))
+
+    @property
+    def pending_bodies(self) -> dict:
+        """{receiver: {block_hash: {sender: (height, msg_id, (sender, body, msg_id))}}} của body đang giữ"""
+        return self.held_bodies.blocks
+
+    @property
+    def accepted_headers(self) -> dict:
+        return self.held_bodies.accepted_headers
+
+    def pending_body_count(self, receiver_id: str = None) -> int:
+        """Số body đang bị giữ (của một receiver hoặc tổng)"""
+        return self.held_bodies.count(receiver_id)
+
+    def accept_header(self, receiver_id: str, block_hash: str, height: int = None):
+        """Node báo đã accept header: body đang giữ được giao ở lượt kế tiếp của event loop"""
+        for sender_id, body, msg_id in self.held_bodies.accept(receiver_id, block_hash, height):
+            self.loop.call_soon(self._dispatch, KIND_BODY, sender_id, receiver_id, body, msg_id)
+
+    def forget_blocks(self, receiver_id: str, height: int):
+        """Receiver đã finalize `height`: bỏ header đã accept và body đang giữ của height <= height"""
+        self.held_bodies.forget(receiver_id, height)
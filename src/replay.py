@@ -0,0 +1,345 @@
+# src/replay.py
+"""
+Ghi lại một lần chạy Simulator để replay nhanh khi điều tra lỗi đồng thuận.
+
+TraceRecorder ghi ra một file nhị phân gọn:
+  - snapshot của Simulator (cùng mọi Node) lúc bắt đầu ghi, như checkpoint;
+  - chuỗi sự kiện đã giao cho node theo đúng thứ tự xử lý (tin nhắn / header / body / timer)
+    kèm nội dung tin (pickle, trùng nội dung thì chỉ ghi một lần);
+  - kết quả của mọi lần kiểm chữ ký (1 byte) và mọi chữ ký node tạo ra (64 byte),
+    nằm ngay sau sự kiện gây ra chúng.
+TraceReplayer nạp lại các Node từ snapshot, gắn vào ReplayEngine (tin gửi đi bị bỏ vì tin
+tới đã có trong trace) rồi đưa từng sự kiện vào handler của node; ký và kiểm chữ ký
+được thay bằng kết quả đã ghi (Node.use_crypto), không chạy Ed25519 và không mô phỏng mạng.
+Node xử lý y hệt lần chạy gốc nên kết thúc ở cùng trạng thái; node đòi một kết quả crypto
+khác thứ tự đã ghi thì dừng với ReplayDivergence.
+
+Định dạng file:
+    MAGIC | HEADER (độ dài meta, độ dài snapshot) | meta (JSON) | snapshot (zlib) | records (zlib)
+  Record bắt đầu bằng 1 byte tag:
+    REC_NAME     tên node -> chỉ số 2 byte (như BinaryFileTraceSink)
+    REC_PAYLOAD  nội dung tin / timer token / tham số lời gọi, nhận chỉ số kế tiếp
+    REC_EVENT    kind (chỉ số handler, src/transport.py), time, receiver, sender, payload
+    REC_CALL     lời gọi từ bên ngoài vào node qua TraceRecorder.call (vd. create_transaction)
+    REC_VALID / REC_INVALID  kết quả một lần kiểm chữ ký
+    REC_SIGN     chữ ký node vừa tạo
+Chỉ nạp file tự tạo: snapshot và payload là pickle.
+"""
+import json
+import pickle
+import struct
+import zlib
+
+from src.transport import Transport, Clock, HANDLER_TIMER, node_handlers
+from src.utils import deterministic_encode
+
+MAGIC = b"L1RPLY01"
+HEADER = struct.Struct("<QQ")          # len(meta), len(snapshot)
+VERSION = 1
+
+REC_NAME = 0
+REC_PAYLOAD = 1
+REC_EVENT = 2
+REC_CALL = 3
+REC_VALID = 4
+REC_INVALID = 5
+REC_SIGN = 6
+
+NAME = struct.Struct("<BHH")           # REC_NAME, name_idx, name_len (+ bytes utf-8)
+PAYLOAD = struct.Struct("<BI")         # REC_PAYLOAD, len (+ pickle)
+EVENT = struct.Struct("<BBdHHI")       # REC_EVENT, kind, time, receiver_idx, sender_idx, payload_idx
+CALL = struct.Struct("<BdHI")          # REC_CALL, time, node_idx, payload_idx ((method, args))
+SIGN = struct.Struct("<BB")            # REC_SIGN, len (+ bytes chữ ký)
+
+
+class ReplayDivergence(Exception):
+    """Replay không đi đúng trace: node gọi crypto khác thứ tự đã ghi"""
+
+
+class TraceRecorder:
+    """
+    Ghi trace replay của `sim` từ thời điểm attach tới close.
+    Lời gọi từ ngoài vào node trong lúc ghi (tạo TX...) phải đi qua call() để được replay.
+    """
+    FLUSH_BYTES = 1 << 16
+    # Số payload khác nhau nhớ để khử trùng (các bản broadcast của một tin tới gần nhau)
+    PAYLOAD_MEMO = 4096
+
+    def __init__(self, path: str, sim, meta: dict = None):
+        self.path = path
+        self.sim = sim
+        self.name_ids = {}
+        self.payload_ids = {}
+        self.next_payload = 0
+        self.buffer = bytearray()
+        self.compressor = zlib.compressobj(1)
+        self.events = 0
+        self._crypto = {}  # {node_id: (sign, verify)} gốc, trả lại khi close
+
+        info = {"version": VERSION, "time": sim.current_time,
+                "processed_events": sim.processed_events, "nodes": list(sim.nodes)}
+        info.update(meta or {})
+        meta_bytes = deterministic_encode(info)
+        snapshot = zlib.compress(pickle.dumps(sim, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.file.write(HEADER.pack(len(meta_bytes), len(snapshot)))
+        self.file.write(meta_bytes)
+        self.file.write(snapshot)
+
+        for node_id, node in sim.nodes.items():
+            self._crypto[node_id] = (node._sign, node._verify)
+            node.use_crypto(self._recording_sign(node._sign), self._recording_verify(node._verify))
+        sim.set_handler_wrapper(self._wrap_handlers)
+
+    def _name_id(self, name) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.name_ids)
+            self.name_ids[name] = name_id
+            encoded = str(name).encode("utf-8")
+            self.buffer += NAME.pack(REC_NAME, name_id, len(encoded)) + encoded
+        return name_id
+
+    def _payload_id(self, obj) -> int:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        payload_id = self.payload_ids.get(data)
+        if payload_id is None:
+            if len(self.payload_ids) >= self.PAYLOAD_MEMO:
+                self.payload_ids.clear()
+            payload_id = self.payload_ids[data] = self.next_payload
+            self.next_payload += 1
+            self.buffer += PAYLOAD.pack(REC_PAYLOAD, len(data))
+            self.buffer += data
+        return payload_id
+
+    def _event(self, kind: int, receiver_id, sender_id, payload):
+        receiver = self._name_id(receiver_id)
+        sender = self._name_id(sender_id)
+        payload_id = self._payload_id(payload)
+        self.buffer += EVENT.pack(REC_EVENT, kind, self.sim.current_time, receiver, sender, payload_id)
+        self.events += 1
+        if len(self.buffer) >= self.FLUSH_BYTES:
+            self.flush()
+
+    def _wrap_handlers(self, node_id, handlers) -> tuple:
+        """Simulator.set_handler_wrapper: ghi sự kiện rồi mới gọi handler của node"""
+        wrapped = []
+        for kind, handler in enumerate(handlers):
+            if handler is None:
+                wrapped.append(None)
+            elif kind == HANDLER_TIMER:
+                wrapped.append(self._timer_handler(node_id, handler))
+            else:
+                wrapped.append(self._message_handler(kind, node_id, handler))
+        return tuple(wrapped)
+
+    def _message_handler(self, kind, node_id, handler):
+        event = self._event
+
+        def on_message(sender_id, message):
+            event(kind, node_id, sender_id, message)
+            handler(sender_id, message)
+        return on_message
+
+    def _timer_handler(self, node_id, handler):
+        event = self._event
+
+        def on_timer(token):
+            event(HANDLER_TIMER, node_id, node_id, token)
+            handler(token)
+        return on_timer
+
+    def _recording_sign(self, sign):
+        def recording_sign(message, context):
+            signature = sign(message, context)
+            raw = bytes.fromhex(signature)
+            self.buffer += SIGN.pack(REC_SIGN, len(raw)) + raw
+            return signature
+        return recording_sign
+
+    def _recording_verify(self, verify):
+        def recording_verify(pub_key_hex, message, signature_hex, context):
+            valid = verify(pub_key_hex, message, signature_hex, context)
+            self.buffer.append(REC_VALID if valid else REC_INVALID)
+            return valid
+        return recording_verify
+
+    def call(self, node_id: str, method: str, *args):
+        """Gọi node.method(*args) và ghi lại để replay gọi đúng lúc đó"""
+        node = self._name_id(node_id)
+        payload_id = self._payload_id((method, args))
+        self.buffer += CALL.pack(REC_CALL, self.sim.current_time, node, payload_id)
+        return getattr(self.sim.nodes[node_id], method)(*args)
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.compressor.compress(bytes(self.buffer)))
+            self.buffer = bytearray()
+
+    def close(self):
+        """Ghi nốt trace, trả lại handler và crypto gốc cho Simulator / node"""
+        if self.file is None:
+            return
+        self.flush()
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        self.file = None
+        self.sim.set_handler_wrapper(None)
+        for node_id, (sign, verify) in self._crypto.items():
+            self.sim.nodes[node_id].use_crypto(sign, verify)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayEngine(Transport, Clock):
+    """
+    Transport / Clock của replay: tin gửi đi và timer hẹn mới bị bỏ qua vì mọi sự kiện
+    node nhận đã có trong trace; current_time do TraceReplayer đặt theo từng sự kiện.
+    """
+
+    def __init__(self, current_time: float = 0.0):
+        self.current_time = current_time
+        self._next_timer_id = 0
+
+    def register_node(self, node):
+        pass
+
+    def schedule_timer(self, node_id, delay, callback_token):
+        self._next_timer_id += 1
+        return self._next_timer_id
+
+    def cancel(self, timer_id):
+        pass
+
+    def send_message(self, sender_id, receiver_id, message):
+        pass
+
+    def broadcast(self, sender_id, targets, message, copies=1):
+        pass
+
+    def send_header(self, sender_id, receiver_id, header):
+        pass
+
+    def broadcast_header(self, sender_id, targets, header, copies=1):
+        pass
+
+    def send_body(self, sender_id, receiver_id, body, block_hash):
+        pass
+
+
+def read_replay_meta(path: str) -> dict:
+    """Chỉ đọc phần meta của file trace replay"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a replay trace")
+        meta_len, _ = HEADER.unpack(f.read(HEADER.size))
+        return json.loads(f.read(meta_len))
+
+
+class TraceReplayer:
+    """
+    Nạp các Node từ trace của TraceRecorder; run() đưa lại mọi sự kiện đã ghi vào node.
+    Sau run(), self.nodes ở đúng trạng thái của lần chạy gốc lúc TraceRecorder.close.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a replay trace")
+            meta_len, snapshot_len = HEADER.unpack(f.read(HEADER.size))
+            self.meta = json.loads(f.read(meta_len))
+            snapshot = f.read(snapshot_len)
+            if len(snapshot) != snapshot_len:
+                raise ValueError(f"{path} is truncated")
+            records = f.read()
+        self.data = zlib.decompress(records)
+        self.pos = 0
+
+        sim = pickle.loads(zlib.decompress(snapshot))
+        self.nodes = sim.nodes
+        self.engine = ReplayEngine(sim.current_time)
+        for node in self.nodes.values():
+            node.bind_transport(self.engine)
+            node.use_crypto(self._sign, self._verify)
+        self.events = 0
+        self.calls = 0
+        self.verifies = 0
+        self.signs = 0
+
+    def _sign(self, message, context) -> str:
+        pos = self.pos
+        if pos >= len(self.data) or self.data[pos] != REC_SIGN:
+            raise ReplayDivergence(f"node signs at record offset {pos} but the trace has no signature there")
+        _, length = SIGN.unpack_from(self.data, pos)
+        start = pos + SIGN.size
+        self.pos = start + length
+        self.signs += 1
+        return self.data[start:start + length].hex()
+
+    def _verify(self, pub_key_hex, message, signature_hex, context) -> bool:
+        pos = self.pos
+        tag = self.data[pos] if pos < len(self.data) else None
+        if tag != REC_VALID and tag != REC_INVALID:
+            raise ReplayDivergence(f"node verifies at record offset {pos} but the trace has no outcome there")
+        self.pos = pos + 1
+        self.verifies += 1
+        return tag == REC_VALID
+
+    def run(self) -> int:
+        """Replay toàn bộ trace, trả về số sự kiện đã đưa vào node"""
+        data = self.data
+        end = len(data)
+        engine = self.engine
+        nodes = self.nodes
+        names = []
+        handlers = []   # theo chỉ số tên: node_handlers(node), None nếu không phải node
+        payloads = {}
+        next_payload = 0
+        unpack_event = EVENT.unpack_from
+        event_size = EVENT.size
+        loads = pickle.loads
+
+        while self.pos < end:
+            pos = self.pos
+            tag = data[pos]
+            if tag == REC_EVENT:
+                _, kind, time, receiver, sender, payload_id = unpack_event(data, pos)
+                self.pos = pos + event_size
+                engine.current_time = time
+                self.events += 1
+                if kind == HANDLER_TIMER:
+                    handlers[receiver][kind](payloads[payload_id])
+                else:
+                    handlers[receiver][kind](names[sender], payloads[payload_id])
+            elif tag == REC_PAYLOAD:
+                _, length = PAYLOAD.unpack_from(data, pos)
+                start = pos + PAYLOAD.size
+                self.pos = start + length
+                payloads[next_payload] = loads(data[start:start + length])
+                next_payload += 1
+                if len(payloads) > TraceRecorder.PAYLOAD_MEMO:
+                    # Recorder chỉ nhớ chừng ấy payload: id cũ hơn không còn được tham chiếu
+                    payloads.pop(next_payload - TraceRecorder.PAYLOAD_MEMO - 1, None)
+            elif tag == REC_NAME:
+                _, name_id, length = NAME.unpack_from(data, pos)
+                start = pos + NAME.size
+                self.pos = start + length
+                name = data[start:start + length].decode("utf-8")
+                names.append(name)
+                node = nodes.get(name)
+                handlers.append(None if node is None else node_handlers(node))
+            elif tag == REC_CALL:
+                _, time, node_idx, payload_id = CALL.unpack_from(data, pos)
+                self.pos = pos + CALL.size
+                engine.current_time = time
+                self.calls += 1
+                method, args = payloads[payload_id]
+                getattr(nodes[names[node_idx]], method)(*args)
+            else:
+                raise ReplayDivergence(f"crypto record at offset {pos} was not consumed by any node")
+        return self.events
@@ -0,0 +1,100 @@
+# src/result_cache.py
+"""
+Cache kết quả simulation trên đĩa, địa chỉ hóa theo nội dung:
+khóa = hash(CONFIG, điểm sweep gồm seed, fingerprint mã nguồn src/).
+Sửa code trong src/ hoặc CONFIG làm đổi khóa nên kết quả cũ tự động không còn được dùng;
+dung lượng bị giới hạn bằng cách xóa entry ít được dùng gần đây nhất.
+Chỉ run_sweep (src/sweep.py) đọc / ghi cache; run_point và các runner khác luôn chạy lại.
+"""
+import json
+import os
+import hashlib
+
+from src.utils import get_hash
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = ".cache/results"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_fingerprints = {}
+
+
+def code_fingerprint(src_dir: str = SRC_DIR) -> str:
+    """SHA-256 của mọi file .py trong src_dir (theo đường dẫn tương đối đã sort), tính một lần mỗi process"""
+    if src_dir not in _fingerprints:
+        digest = hashlib.sha256()
+        paths = []
+        for root, _, files in os.walk(src_dir):
+            paths.extend(os.path.join(root, name) for name in files if name.endswith(".py"))
+        for path in sorted(paths):
+            digest.update(os.path.relpath(path, src_dir).replace(os.sep, "/").encode())
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        _fingerprints[src_dir] = digest.hexdigest()
+    return _fingerprints[src_dir]
+
+
+def cache_key(point: dict, config: dict, fingerprint: str = None) -> str:
+    """Khóa chuẩn hóa: không phụ thuộc thứ tự khóa trong dict"""
+    return get_hash({"config": config, "point": point, "code": fingerprint or code_fingerprint()})
+
+
+class ResultCache:
+    """Mỗi entry là một file <key>.json; mtime dùng làm thời điểm truy cập gần nhất cho LRU"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        return [e for e in os.scandir(self.directory) if e.is_file() and e.name.endswith(".json")]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Kết quả đã lưu hoặc None"""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        os.utime(path)  # Đánh dấu vừa dùng
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        path = self._path(key)
+        data = json.dumps(value, sort_keys=True).encode("utf-8")
+        try:
+            self.total_bytes -= os.path.getsize(path)
+        except OSError:
+            pass
+        # Ghi file tạm rồi đổi tên để process khác không đọc phải entry ghi dở
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Xóa entry ít được dùng gần đây nhất cho tới khi tổng dung lượng <= max_bytes"""
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime_ns)
+        self.total_bytes = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.total_bytes -= size
@@ -0,0 +1,88 @@
+# src/runner.py
+"""
+Dựng mạng N node trên một Simulator (hoặc RealtimeRuntime), dùng chung cho script và benchmark.
+"""
+from src.node import Node
+from src.simulator import Simulator, PartitionSimulator
+from src.realtime import RealtimeRuntime
+from config.node_config import CONFIG
+
+
+def node_names(num_nodes: int = None) -> list:
+    """Tên node theo CONFIG, hoặc Node0..Node{N-1} khi chỉ định số node"""
+    if num_nodes is None:
+        return list(CONFIG["nodes"])
+    return [f"Node{i}" for i in range(num_nodes)]
+
+
+def build_network(num_nodes: int = None, seed: int = None, network_config: dict = None,
+                  config: dict = None, trace_sink=None, key_prefix: str = "node", hosted=None):
+    """
+    Tạo Simulator + các Node đã đăng ký, nối full mesh, validator set chung.
+    hosted: chỉ đăng ký các node này lên một PartitionSimulator (PDES); các node còn lại
+    vẫn được tạo (để có validator set) nhưng không chạy trong process này.
+    Trả về (sim, nodes).
+    """
+    config = config or CONFIG
+    sim_config = dict(config["network"])
+    if network_config:
+        sim_config.update(network_config)
+    if seed is not None:
+        sim_config["seed"] = seed
+    if hosted is None:
+        sim = Simulator(sim_config, trace_sink=trace_sink)
+    else:
+        sim = PartitionSimulator(sim_config, hosted, trace_sink=trace_sink)
+
+    return sim, attach_nodes(sim, num_nodes, seed, config, key_prefix, hosted)
+
+
+def build_realtime_network(num_nodes: int = None, seed: int = None, realtime_config: dict = None,
+                           config: dict = None, trace_sink=None, key_prefix: str = "node", hosted=None,
+                           fabric=None):
+    """
+    Như build_network nhưng trên RealtimeRuntime (asyncio + socket loopback).
+    hosted: chỉ chạy các node này trong process (các node khác ở process khác,
+    cần realtime_config["base_port"] để biết địa chỉ, hoặc `fabric` (ShmFabric tạo trước khi fork)
+    với transport "shm"). Gọi `await runtime.start()` trước khi chạy.
+    Trả về (runtime, nodes).
+    """
+    config = config or CONFIG
+    runtime_config = dict(config.get("realtime", {}))
+    if realtime_config:
+        runtime_config.update(realtime_config)
+    if seed is not None:
+        runtime_config.setdefault("seed", seed)
+    runtime = RealtimeRuntime(runtime_config, trace_sink=trace_sink, fabric=fabric)
+    return runtime, attach_nodes(runtime, num_nodes, seed, config, key_prefix, hosted)
+
+
+def attach_nodes(sim, num_nodes: int = None, seed: int = None, config: dict = None,
+                 key_prefix: str = "node", hosted=None, clock=None) -> list:
+    """
+    Tạo các Node trên `sim` (Transport: Simulator, RealtimeRuntime...), nối full mesh, validator set chung.
+    clock: Clock của các node nếu khác `sim`.
+    """
+    config = config or CONFIG
+    names = node_names(num_nodes)
+    nodes = []
+    validator_keys = []
+    for i, name in enumerate(names):
+        n = Node(name, sim, [], key_seed=f"{key_prefix}_{i}_{seed}", config=config, clock=clock)
+        nodes.append(n)
+        validator_keys.append(n.key_pair.pub_key_str)
+        if hosted is None or name in hosted:
+            sim.register_node(n)
+        else:
+            # Rank phải giống hệt simulator tuần tự để seq của tin nhắn trùng khớp
+            sim.assign_rank(name)
+
+    # Threshold BFT: 2/3 + 1
+    threshold = (len(names) * 2) // 3 + 1
+    for n in nodes:
+        n.consensus.validators = validator_keys
+        n.consensus.n = len(names)
+        n.consensus.threshold = threshold
+        for peer in nodes:
+            n.add_peer(peer.node_id)
+    return nodes
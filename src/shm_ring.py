@@ -0,0 +1,180 @@
+# src/shm_ring.py
+"""
+Ring buffer SPSC trên multiprocessing.shared_memory cho transport "shm" của RealtimeRuntime.
+
+Mỗi link (sender, receiver) có một ring riêng: chỉ process của sender ghi, chỉ process
+của receiver đọc, nên không cần khóa. Một ring gồm:
+  - head (u64, offset 0): tổng số byte đã ghi, chỉ writer cập nhật,
+  - tail (u64, offset 64): tổng số byte đã đọc, chỉ reader cập nhật
+    (hai counter ở hai cache line khác nhau),
+  - vùng dữ liệu `capacity` byte; record = u32 độ dài + u64 thời điểm ghi
+    (time.monotonic_ns, chung mọi process) + payload.
+Record không vắt qua cuối vùng: writer đánh dấu WRAP (hoặc bỏ trống nếu còn < 4 byte)
+rồi ghi từ đầu. Writer chép từng phần của frame thẳng vào vùng nhớ chung (không ghép
+bytes trung gian) rồi mới cập nhật head. Reader nhận payload dưới dạng memoryview vào ring
+(không chép) và chỉ cập nhật tail khi gọi release(), sau khi đã giải mã xong các view.
+Thời điểm ghi cho phép receiver trộn record của nhiều ring theo thứ tự tới (như socket).
+
+Receiver được đánh thức qua pipe "chuông cửa": writer gửi 1 byte khi thấy ring vừa rỗng
+(receiver đã đọc hết, có thể đang chờ). Receiver vẫn quét định kỳ để không kẹt nếu
+lỡ một lần báo.
+
+Bộ nhớ: ShmFabric cấp một ring cho mỗi link có hướng, tức N·(N-1)·(capacity + 128) byte
+cho N node; với capacity mặc định 256 KB là ~14 MB cho 8 node, ~250 MB cho 32 node.
+"""
+import os
+import struct
+from multiprocessing import shared_memory
+
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+RECORD = struct.Struct("<IQ")  # (độ dài payload, thời điểm ghi)
+RING_HEADER = 128
+WRAP = 0xFFFFFFFF
+DEFAULT_CAPACITY = 1 << 18
+
+
+class ShmRing:
+    def __init__(self, buf, offset: int, capacity: int):
+        self.buf = buf
+        self.head_at = offset
+        self.tail_at = offset + 64
+        self.base = offset + RING_HEADER
+        self.capacity = capacity
+        self._read_to = None  # tail sau các record read() đã trả nhưng chưa release()
+
+    def write(self, parts, size: int, stamp: int):
+        """
+        Ghi một record gồm các phần `parts` (tổng `size` byte), ghi lúc `stamp`.
+        Trả về None nếu ring không đủ chỗ, ngược lại True nếu cần đánh thức reader.
+        """
+        need = RECORD.size + size
+        if need > self.capacity:
+            raise ValueError(f"Record of {size} bytes does not fit in ring of {self.capacity} bytes")
+        buf = self.buf
+        start = U64.unpack_from(buf, self.head_at)[0]
+        tail = U64.unpack_from(buf, self.tail_at)[0]
+        head = start
+        pos = head % self.capacity
+        skip = self.capacity - pos if self.capacity - pos < need else 0
+        if head + skip + need - tail > self.capacity:
+            return None
+        if skip:
+            if skip >= U32.size:
+                U32.pack_into(buf, self.base + pos, WRAP)
+            head += skip
+            pos = 0
+        at = self.base + pos
+        RECORD.pack_into(buf, at, size, stamp)
+        at += RECORD.size
+        for part in parts:
+            end = at + len(part)
+            buf[at:end] = part
+            at = end
+        U64.pack_into(buf, self.head_at, head + need)
+        # Đọc lại tail sau khi công bố head: reader đã đọc hết tới `start` thì có thể đang chờ
+        return U64.unpack_from(buf, self.tail_at)[0] == start
+
+    def read(self) -> list:
+        """
+        Lấy các record mới trong ring: list (stamp, payload memoryview) theo thứ tự ghi.
+        View trỏ thẳng vào ring và chỉ hợp lệ tới release(); gọi read() lần nữa trước
+        release() chỉ trả các record ghi thêm sau lần đọc trước.
+        """
+        buf = self.buf
+        tail = self._read_to
+        if tail is None:
+            tail = U64.unpack_from(buf, self.tail_at)[0]
+        head = U64.unpack_from(buf, self.head_at)[0]
+        if tail == head:
+            return []
+        records = []
+        capacity = self.capacity
+        while tail != head:
+            pos = tail % capacity
+            contiguous = capacity - pos
+            if contiguous < U32.size:
+                tail += contiguous
+                continue
+            at = self.base + pos
+            (size,) = U32.unpack_from(buf, at)
+            if size == WRAP:
+                tail += contiguous
+                continue
+            stamp = U64.unpack_from(buf, at + U32.size)[0]
+            at += RECORD.size
+            records.append((stamp, buf[at:at + size]))
+            tail += RECORD.size + size
+        self._read_to = tail
+        return records
+
+    def release(self):
+        """Trả chỗ của mọi record đã read() cho writer (view của chúng không còn được dùng)"""
+        if self._read_to is not None:
+            U64.pack_into(self.buf, self.tail_at, self._read_to)
+            self._read_to = None
+
+    def __len__(self):
+        """Số byte đang chờ đọc (kể cả phần bỏ trống khi wrap)"""
+        return U64.unpack_from(self.buf, self.head_at)[0] - U64.unpack_from(self.buf, self.tail_at)[0]
+
+
+class ShmFabric:
+    """
+    Một segment shared memory chứa ring của mọi link có hướng giữa `node_ids`,
+    cùng một pipe chuông cửa cho mỗi node. Tạo ở process cha trước khi fork các
+    process node (process con thừa hưởng segment và pipe).
+    """
+
+    def __init__(self, node_ids, capacity: int = DEFAULT_CAPACITY):
+        self.node_ids = list(node_ids)
+        self.capacity = capacity
+        links = [(s, r) for s in self.node_ids for r in self.node_ids if s != r]
+        stride = RING_HEADER + capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, len(links) * stride))
+        self.rings = {link: ShmRing(self.shm.buf, i * stride, capacity) for i, link in enumerate(links)}
+        self.doorbells = {}
+        for node_id in self.node_ids:
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(read_fd, False)
+            os.set_blocking(write_fd, False)
+            self.doorbells[node_id] = (read_fd, write_fd)
+        self._owner = os.getpid()
+
+    def ring(self, sender_id: str, receiver_id: str) -> ShmRing:
+        return self.rings[(sender_id, receiver_id)]
+
+    def incoming(self, receiver_id: str) -> list:
+        """Các ring mà receiver đọc"""
+        return [ring for (_, r), ring in self.rings.items() if r == receiver_id]
+
+    def doorbell_fd(self, receiver_id: str) -> int:
+        return self.doorbells[receiver_id][0]
+
+    def ring_doorbell(self, receiver_id: str):
+        try:
+            os.write(self.doorbells[receiver_id][1], b"\0")
+        except BlockingIOError:
+            pass  # Pipe đầy: receiver chắc chắn sẽ thức dậy
+
+    def clear_doorbell(self, receiver_id: str):
+        fd = self.doorbells[receiver_id][0]
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        """Đóng segment và pipe; process tạo fabric còn xóa segment khỏi hệ thống"""
+        if self.shm is None:
+            return
+        self.rings = {}
+        for read_fd, write_fd in self.doorbells.values():
+            os.close(read_fd)
+            os.close(write_fd)
+        self.doorbells = {}
+        self.shm.close()
+        if os.getpid() == self._owner:
+            self.shm.unlink()
+        self.shm = None
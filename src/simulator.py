@@ -1,45 +1,89 @@
 # src/simulator.py
+import hashlib
 import heapq
-import random
-import logging
 import os
-from collections import defaultdict
-
-# Tạo logger riêng cho network (không dùng root logger)
-network_logger = logging.getLogger('network')
-network_logger.setLevel(logging.INFO)
-
-# Đảm bảo thư mục logs tồn tại
-os.makedirs('logs', exist_ok=True)
-
-# Xóa handlers cũ nếu có
-network_logger.handlers.clear()
-
-# Thêm file handler
-_file_handler = logging.FileHandler('logs/network.log', mode='w')
-_file_handler.setFormatter(logging.Formatter('%(message)s'))
-network_logger.addHandler(_file_handler)
-
-class Event:
-    def __init__(self, delivery_time, receiver_id, sender_id, message, event_type="MESSAGE"):
-        self.delivery_time = delivery_time
-        self.receiver_id = receiver_id
-        self.sender_id = sender_id
-        self.message = message
-        self.event_type = event_type  # MESSAGE, HEADER, BODY, UNBLOCK
-
-    # Để heapq so sánh được thứ tự dựa trên thời gian
-    def __lt__(self, other):
-        return self.delivery_time < other.delivery_time
-
-class Simulator:
-    def __init__(self, config: dict):
-        if "seed" in config:
-            random.seed(config["seed"])
-            
+from itertools import repeat
+
+import numpy as np
+
+from src.event_queue import make_event_queue
+from src.network_model import NetworkModel, encoded_size
+from src.message_classes import CLASS_BLOCK, classify
+from src.inbox import PriorityInbox, class_weights
+from src.pending_bodies import PendingBodies, DEFAULT_MAX_PENDING_BODIES
+from src.rate_limiter import TokenBucketLimiter
+from src.transport import Transport, Clock, HANDLER_TIMER, node_handlers
+from src.trace import (
+    NullTraceSink, EV_SEND, EV_SEND_HEADER, EV_SEND_BODY, EV_RECV, EV_RECV_HEADER, EV_RECV_BODY,
+    EV_DROP, EV_DROP_HEADER, EV_DROP_BODY, EV_DUPLICATE, EV_TIMER, EV_INBOX_DROP
+)
+
+# Loại sự kiện tin nhắn trong heap
+KIND_MESSAGE = 0
+KIND_HEADER = 1
+KIND_BODY = 2
+# Node lấy tin kế tiếp từ inbox (chỉ có khi bật mô hình năng lực xử lý)
+KIND_SERVICE = 3
+# Đóng phong bì gom tin của một link và gửi đi (chỉ có khi bật batching)
+KIND_FLUSH = 4
+
+# seq = (số tin nhắn sender đã gửi) * SEQ_STRIDE + rank của sender
+SEQ_STRIDE = 1 << 20
+# Số mẫu ngẫu nhiên mỗi tin rút từ stream của link: drop, delay, duplicate, delay bản sao
+LINK_SAMPLES = 4
+
+class Simulator(Transport, Clock):
+    """
+    Thứ tự toàn phần của sự kiện (không phụ thuộc cài đặt heap):
+      - Tin nhắn là tuple (delivery_time, seq, kind, receiver_id, sender_id, message, msg_id)
+        với seq = send_count * SEQ_STRIDE + rank: send_count đếm tin nhắn của riêng sender,
+        rank là thứ tự đăng ký node. seq không bao giờ trùng nên so sánh tuple dừng ở
+        (delivery_time, seq) và không chạm tới message; tin nhắn của cùng sender ra theo
+        thứ tự gửi. seq chỉ phụ thuộc vào lịch sử của sender nên không đổi khi các node
+        được chia ra nhiều process (PDES).
+      - Khi bật mô hình xử lý ("processing"), lượt lấy tin từ inbox cũng là một tuple
+        trong hàng đợi tin nhắn (kind KIND_SERVICE, seq lấy theo receiver); khi bật
+        batching, lượt đóng phong bì là tuple kind KIND_FLUSH với seq lấy theo sender.
+      - Timer là tuple (fire_time, timer_id, node_id, token), timer_id cũng tăng dần.
+      - Giữa hai hàng đợi: sự kiện có thời điểm nhỏ hơn chạy trước; trùng thời điểm
+        thì tin nhắn chạy trước timer.
+    Tức là sự kiện được xử lý theo khóa (time, 0 nếu tin nhắn / 1 nếu timer, seq hoặc timer_id).
+
+    Handler của node được lấy (node_handlers) một lần ở đầu mỗi run_until và khi register_node,
+    nên gán lại handler của node chỉ có tác dụng từ lượt run_until kế tiếp. set_handler_wrapper
+    bọc các handler đó (ghi trace replay, src/replay.py).
+    """
+    # Số tombstone tối thiểu trước khi dọn heap timer
+    TIMER_COMPACT_MIN = 64
+    # Bảng dispatch theo kind: (mã trace khi nhận, tên hàm xử lý của node)
+    DISPATCH = (
+        (EV_RECV, "receive"),                # KIND_MESSAGE
+        (EV_RECV_HEADER, "receive_header"),  # KIND_HEADER
+        (EV_RECV_BODY, "receive_body"),      # KIND_BODY
+    )
+    RECV_CODES = tuple(code for code, _ in DISPATCH)
+
+    def __init__(self, config: dict, trace_sink=None):
+        # Trace sink riêng cho mỗi Simulator (mặc định không ghi gì)
+        self.trace_sink = trace_sink or NullTraceSink()
+        self._trace = self.trace_sink.emit
+        self._next_msg_id = 0
+        
+        # RNG riêng cho từng Simulator, không đụng tới module `random` toàn cục.
+        # Mỗi link (sender, receiver) có stream riêng suy ra từ seed, nên thêm node
+        # hoặc tin nhắn trên link khác không làm xáo trộn các lần rút của link này.
+        self.seed = config.get("seed")
+        if self.seed is None:
+            self.seed = int.from_bytes(os.urandom(8), "big")
+        self._link_rngs = {}    # {(sender_id, receiver_id): numpy Generator}, dùng chung cho send_* và broadcast
+        
         self.nodes = {}       # Map: node_id -> Node object
-        self.events = []      # Priority Queue (Min-Heap)
+        self._handlers = {}   # Map: node_id -> node_handlers(node)
+        self.handler_wrapper = None  # wrapper(node_id, handlers) -> handlers, ví dụ TraceRecorder
+        self.node_ranks = {}  # Map: node_id -> rank (thứ tự đăng ký), dùng trong seq
+        self._send_counts = {}
         self.current_time = 0.0
+        self.processed_events = 0  # Số tin nhắn + timer đã xử lý
         
         # Lấy cấu hình mạng từ config, hỗ trợ cả flat config và nested config
         if "network" in config:
@@ -50,169 +94,573 @@ class Simulator:
             self.duplicate_prob = network_config.get("duplicate_prob", 0.0)
             # Rate limiting config
             rate_config = network_config.get("rate_limit", {})
-            self.max_msg_per_sec = rate_config.get("max_messages_per_second", 100)
-            self.block_duration = rate_config.get("block_duration", 1.0)
+            max_pending_bodies = network_config.get("max_pending_bodies", DEFAULT_MAX_PENDING_BODIES)
         else:
             self.min_delay = config.get("min_delay", 0.01)
             self.max_delay = config.get("max_delay", 0.1)
             self.drop_prob = config.get("drop_prob", 0.0)
             self.duplicate_prob = config.get("duplicate_prob", 0.0)
-            self.max_msg_per_sec = config.get("max_messages_per_second", 100)
-            self.block_duration = config.get("block_duration", 1.0)
-        
-        # Rate limiting state: Đếm số tin nhắn từ mỗi sender trong 1 giây
-        self.message_counts = defaultdict(lambda: {"count": 0, "window_start": 0.0})
-        # Blocked peers: {(sender, receiver): unblock_time}
-        self.blocked_peers = {}
-        # Pending block bodies: {(sender, receiver, block_hash): block_data}
-        self.pending_bodies = {}
-        # Accepted headers: {(receiver, block_hash): True}
-        self.accepted_headers = defaultdict(set)
-
-    def register_node(self, node):
-        self.nodes[node.node_id] = node
-
-    def _check_rate_limit(self, sender_id: str, receiver_id: str) -> bool:
-        """Kiểm tra và cập nhật rate limit. Trả về True nếu được phép gửi."""
-        pair_key = (sender_id, receiver_id)
+            rate_config = {
+                "max_messages_per_second": config.get("max_messages_per_second", 100),
+                "burst": config.get("burst"),
+                "block_duration": config.get("block_duration", 1.0),
+                "classes": config.get("rate_classes"),
+            }
+            # Mục "network" của CONFIG truyền thẳng vào (như runner.build_network) vẫn có "rate_limit" lồng
+            rate_config.update(config.get("rate_limit", {}))
+            max_pending_bodies = config.get("max_pending_bodies", DEFAULT_MAX_PENDING_BODIES)
+            network_config = config
         
-        # Kiểm tra xem peer có đang bị block không
-        if pair_key in self.blocked_peers:
-            if self.current_time < self.blocked_peers[pair_key]:
-                network_logger.info(f"{self.current_time:.3f} BLOCKED {sender_id}->{receiver_id} (rate limit)")
-                return False
-            else:
-                # Hết thời gian block
-                del self.blocked_peers[pair_key]
-                network_logger.info(f"{self.current_time:.3f} UNBLOCK {sender_id}->{receiver_id}")
+        # Mô hình topology (độ trễ theo vùng, băng thông uplink, hàng đợi gửi) thay cho
+        # uniform(min_delay, max_delay) khi config có "topology".
+        # lookahead: độ trễ nhỏ nhất mà mọi tin nhắn chắc chắn có.
+        topology = network_config.get("topology")
+        self.model = NetworkModel(topology) if topology else None
+        self.lookahead = self.model.min_latency if self.model else self.min_delay
+        
+        # Hàng đợi tin nhắn: "heap" (mặc định) hoặc "calendar" (bucket theo thời gian).
+        # Hai loại cho cùng thứ tự (time, seq); bucket mặc định rộng bằng lookahead.
+        self.scheduler = network_config.get("scheduler", "heap")
+        self.events = make_event_queue(
+            self.scheduler,
+            bucket_width=network_config.get("bucket_width") or self.lookahead
+        )
+        self._push = self.events.push
         
-        # Cập nhật đếm tin nhắn
-        stats = self.message_counts[pair_key]
-        if self.current_time - stats["window_start"] >= 1.0:
-            # Reset window
-            stats["count"] = 0
-            stats["window_start"] = self.current_time
+        # Rate limiting: token bucket theo (sender, receiver, lớp tin nhắn)
+        self.rate_limiter = TokenBucketLimiter.from_config(rate_config, trace_sink=self.trace_sink)
         
-        stats["count"] += 1
+        # Mô hình năng lực xử lý (tùy chọn): tin tới được xếp vào inbox của receiver theo lớp,
+        # node xử lý `capacity` tin mỗi giây mô phỏng, lấy tin theo trọng số của lớp.
+        processing = network_config.get("processing")
+        if processing:
+            if processing["capacity"] <= 0:
+                raise ValueError("processing capacity must be > 0")
+            self.service_time = 1.0 / processing["capacity"]
+            self.inbox_weights = class_weights(processing.get("weights"))
+            self.inbox_limit = processing.get("inbox_limit")
+            self.inboxes = {}     # {receiver: PriorityInbox}
+            self._busy_until = {}  # {receiver: thời điểm xử lý xong tin đang xử lý}
+        else:
+            self.inboxes = None
         
-        # Kiểm tra vượt ngưỡng
-        if stats["count"] > self.max_msg_per_sec:
-            self.blocked_peers[pair_key] = self.current_time + self.block_duration
-            network_logger.info(f"{self.current_time:.3f} BLOCK {sender_id}->{receiver_id} (exceeded rate limit)")
-            return False
+        # Batching (tùy chọn): tin nhắn thường từ sender tới receiver trong cửa sổ `window`
+        # giây được gom vào một phong bì, rate limit / drop / delay áp một lần cho cả phong bì.
+        # window = 0: gom các tin gửi cùng một thời điểm.
+        batching = network_config.get("batching")
+        self.batch_window = batching.get("window", 0.0) if batching else None
+        self._envelopes = {}  # {sender: {(receiver, lớp tin, số bản gửi): [danh sách message]}}
+        # Body tới trước khi receiver accept header, giữ ở phía receiver (src/pending_bodies.py)
+        self.held_bodies = PendingBodies(max_pending_bodies, self.trace_sink)
         
-        return True
+        # Timers: heap riêng (fire_time, timer_id, node_id, callback_token), tách khỏi heap tin nhắn.
+        # Hủy timer chỉ đánh dấu tombstone; timer bị hủy bị bỏ qua khi lên đầu heap
+        # và heap được dọn lại khi tombstone chiếm quá nửa. live_timers: id của timer chưa chạy,
+        # chưa hủy; hủy timer không có trong đó (đã chạy, đã hủy) không tạo tombstone.
+        self.timers = []
+        self.cancelled_timers = set()
+        self.live_timers = set()
+        self._next_timer_id = 0
+
+    def set_trace_sink(self, trace_sink):
+        """Đổi trace sink của Simulator (và rate limiter, kho body đang giữ), ví dụ sau khi nạp checkpoint"""
+        self.trace_sink = trace_sink or NullTraceSink()
+        self._trace = self.trace_sink.emit
+        self.rate_limiter.trace_sink = self.trace_sink
+        self.held_bodies.trace_sink = self.trace_sink
+
+    def set_handler_wrapper(self, wrapper):
+        """
+        Bọc handler của mọi node: wrapper(node_id, node_handlers(node)) trả về tuple handler
+        cùng thứ tự mà Simulator gọi thay cho handler của node (None để bỏ).
+        Chỉ tốn thêm khi lấy handler, không tốn gì ở mỗi sự kiện khi không bọc.
+        """
+        self.handler_wrapper = wrapper
+        self._handlers = {node_id: self._bind_handlers(node) for node_id, node in self.nodes.items()}
+
+    def _bind_handlers(self, node) -> tuple:
+        handlers = node_handlers(node)
+        if self.handler_wrapper is not None:
+            handlers = self.handler_wrapper(node.node_id, handlers)
+        return handlers
+
+    def __getstate__(self):
+        """Trạng thái để pickle (checkpoint): không kèm trace sink, handler đã lấy sẵn và wrapper"""
+        state = self.__dict__.copy()
+        del state["trace_sink"], state["_trace"], state["_handlers"], state["handler_wrapper"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.set_handler_wrapper(None)
+        self.set_trace_sink(None)
+
+    def schedule_timer(self, node_id: str, delay: float, callback_token) -> int:
+        """Hẹn giờ cho node: sau `delay` giây mô phỏng gọi node.on_timer(callback_token). Trả về timer_id."""
+        timer_id = self._next_timer_id
+        self._next_timer_id += 1
+        self.live_timers.add(timer_id)
+        heapq.heappush(self.timers, (self.current_time + delay, timer_id, node_id, callback_token))
+        return timer_id
+
+    def cancel(self, timer_id: int):
+        """Hủy timer (lazy deletion). Hủy timer đã chạy hoặc không tồn tại không có tác dụng."""
+        if timer_id not in self.live_timers:
+            return
+        self.live_timers.remove(timer_id)
+        self.cancelled_timers.add(timer_id)
+        if len(self.cancelled_timers) > self.TIMER_COMPACT_MIN and len(self.cancelled_timers) * 2 > len(self.timers):
+            self._compact_timers()
+
+    def _compact_timers(self):
+        """Xây lại heap timer không còn tombstone, O(n)"""
+        self.timers = [t for t in self.timers if t[1] not in self.cancelled_timers]
+        heapq.heapify(self.timers)
+        self.cancelled_timers.clear()
+
+    def _next_timer_time(self):
+        """Thời điểm timer sống sớm nhất (bỏ tombstone ở đầu heap), None nếu không còn timer"""
+        while self.timers and self.timers[0][1] in self.cancelled_timers:
+            _, timer_id, _, _ = heapq.heappop(self.timers)
+            self.cancelled_timers.discard(timer_id)
+        if not self.timers:
+            return None
+        return self.timers[0][0]
+
+    def pending_timer_count(self) -> int:
+        return len(self.live_timers)
+
+    def register_node(self, node):
+        self.assign_rank(node.node_id)
+        self.nodes[node.node_id] = node
+        self._handlers[node.node_id] = self._bind_handlers(node)
+
+    def assign_rank(self, node_id: str) -> int:
+        rank = self.node_ranks.get(node_id)
+        if rank is None:
+            rank = self.node_ranks[node_id] = len(self.node_ranks)
+            if self.model is not None:
+                self.model.add_node(node_id, rank)
+        return rank
+
+    def _check_rate_limit(self, sender_id: str, receiver_id: str, msg_class: int) -> bool:
+        """Kiểm tra và cập nhật rate limit. Trả về True nếu được phép gửi."""
+        return self.rate_limiter.admit(self.current_time, sender_id, receiver_id, msg_class) == 1
+
+    def link_rng(self, sender_id: str, receiver_id: str) -> np.random.Generator:
+        """
+        Stream ngẫu nhiên của link sender -> receiver. Mỗi tin trên link (send_*, hay một bản
+        của broadcast) rút đúng LINK_SAMPLES mẫu: drop, delay, duplicate, delay của bản sao,
+        nên kết quả của link chỉ phụ thuộc các tin trước đó trên chính link này.
+        """
+        rng = self._link_rngs.get((sender_id, receiver_id))
+        if rng is None:
+            digest = hashlib.sha256(f"{self.seed}|{sender_id}|{receiver_id}".encode()).digest()
+            rng = self._link_rngs[(sender_id, receiver_id)] = np.random.default_rng(int.from_bytes(digest[:8], "big"))
+        return rng
+
+    def _link_samples(self, sender_id: str, receiver_id: str) -> list:
+        """LINK_SAMPLES mẫu cho một tin trên link: [drop, delay, duplicate, delay bản sao]"""
+        return self.link_rng(sender_id, receiver_id).random(LINK_SAMPLES).tolist()
+
+    def _delivery_time(self, sender_id: str, receiver_id: str, message, u: float) -> float:
+        """Thời điểm tới của một tin nhắn từ mẫu delay u (cùng công thức với broadcast)"""
+        if self.model is None:
+            return self.current_time + (self.min_delay + (self.max_delay - self.min_delay) * u)
+        return self.model.delivery_time(self.current_time, self.assign_rank(sender_id), self.assign_rank(receiver_id),
+                                        encoded_size(message), u)
+
+    def _duplicate_delay(self, sender_id: str, receiver_id: str, u: float) -> float:
+        """Bản sao tới muộn hơn bản gốc bao lâu"""
+        if self.model is None:
+            return self.min_delay + (self.max_delay - self.min_delay) * u
+        return self.model.link_latency(self.assign_rank(sender_id), self.assign_rank(receiver_id)) * u
+
+    def _new_msg_id(self) -> int:
+        self._next_msg_id += 1
+        return self._next_msg_id
+
+    def _next_seq(self, sender_id: str) -> int:
+        count = self._send_counts.get(sender_id, 0)
+        self._send_counts[sender_id] = count + 1
+        return count * SEQ_STRIDE + self.assign_rank(sender_id)
+
+    def _next_seqs(self, sender_id: str, count: int):
+        """count seq liên tiếp của sender (như gọi _next_seq count lần)"""
+        first = self._send_counts.get(sender_id, 0)
+        self._send_counts[sender_id] = first + count
+        return np.arange(first, first + count, dtype=np.int64) * SEQ_STRIDE + self.assign_rank(sender_id)
+
+    def _push_event(self, delivery_time, kind, receiver_id, sender_id, message, msg_id):
+        seq = self._next_seq(sender_id)
+        self._push((delivery_time, seq, kind, receiver_id, sender_id, message, msg_id))
+
+    def _push_many(self, entries):
+        self.events.push_many(entries)
+
+    def _enqueue(self, event):
+        """Tin tới receiver đang bật mô hình xử lý: xếp vào inbox, hẹn lượt xử lý nếu inbox đang rỗng"""
+        _, _, kind, receiver_id, sender_id, message, msg_id = event
+        inbox = self.inboxes.get(receiver_id)
+        if inbox is None:
+            inbox = self.inboxes[receiver_id] = PriorityInbox(self.inbox_weights, self.inbox_limit)
+        msg_class = CLASS_BLOCK if kind != KIND_MESSAGE else classify(message)
+        if not inbox.push(msg_class, event):
+            self._trace(EV_INBOX_DROP, self.current_time, sender_id, receiver_id, msg_id)
+            return
+        if len(inbox) == 1:
+            start = max(self.current_time, self._busy_until.get(receiver_id, 0.0))
+            self._push_event(start, KIND_SERVICE, receiver_id, receiver_id, None, 0)
+
+    def _serve(self, receiver_id: str):
+        """Lượt xử lý của receiver: lấy một tin từ inbox và giao cho node"""
+        inbox = self.inboxes[receiver_id]
+        _, _, kind, _, sender_id, message, msg_id = inbox.pop()
+        now = self.current_time
+        done = self._busy_until[receiver_id] = now + self.service_time
+        if inbox:
+            self._push_event(done, KIND_SERVICE, receiver_id, receiver_id, None, 0)
+        self._trace(self.RECV_CODES[kind], now, sender_id, receiver_id, msg_id)
+        self._handlers[receiver_id][kind](sender_id, message)
+
+    def inbox_size(self, receiver_id: str) -> int:
+        """Số tin đang chờ xử lý trong inbox của receiver"""
+        inbox = self.inboxes.get(receiver_id) if self.inboxes is not None else None
+        return len(inbox) if inbox is not None else 0
+
+    def pending_event_count(self) -> int:
+        return len(self.events)
 
     def send_header(self, sender_id: str, receiver_id: str, header: dict):
         """Gửi Header của block trước (theo yêu cầu đề bài)"""
-        if not self._check_rate_limit(sender_id, receiver_id):
+        if not self._check_rate_limit(sender_id, receiver_id, CLASS_BLOCK):
             return
-            
-        if random.random() < self.drop_prob:
-            network_logger.info(f"{self.current_time:.3f} DROP_HEADER {sender_id}->{receiver_id}")
+        
+        msg_id = self._new_msg_id()
+        drop_u, delay_u, _, _ = self._link_samples(sender_id, receiver_id)
+        if drop_u < self.drop_prob:
+            self._trace(EV_DROP_HEADER, self.current_time, sender_id, receiver_id, msg_id)
             return
 
-        delay = random.uniform(self.min_delay, self.max_delay)
-        delivery_time = self.current_time + delay
+        delivery_time = self._delivery_time(sender_id, receiver_id, header, delay_u)
         
-        event = Event(delivery_time, receiver_id, sender_id, header, "HEADER")
-        heapq.heappush(self.events, event)
+        self._push_event(delivery_time, KIND_HEADER, receiver_id, sender_id, header, msg_id)
         
-        network_logger.info(f"{self.current_time:.3f} SEND_HEADER {sender_id}->{receiver_id} height={header.get('height')}")
+        self._trace(EV_SEND_HEADER, self.current_time, sender_id, receiver_id, msg_id)
 
     def send_body(self, sender_id: str, receiver_id: str, body: dict, block_hash: str):
-        """Gửi Body của block (chỉ khi receiver đã accept header)"""
-        if not self._check_rate_limit(sender_id, receiver_id):
+        """
+        Gửi Body của block. Receiver chỉ nhận body sau khi đã accept header:
+        body tới sớm được giữ lại ở phía receiver (xem run) cho tới accept_header.
+        """
+        if not self._check_rate_limit(sender_id, receiver_id, CLASS_BLOCK):
             return
-            
-        # Kiểm tra xem receiver đã accept header chưa
-        if block_hash not in self.accepted_headers[receiver_id]:
-            # Lưu pending body để gửi sau khi header được accept
-            self.pending_bodies[(sender_id, receiver_id, block_hash)] = body
-            network_logger.info(f"{self.current_time:.3f} PENDING_BODY {sender_id}->{receiver_id} (waiting for header)")
-            return
-            
-        if random.random() < self.drop_prob:
-            network_logger.info(f"{self.current_time:.3f} DROP_BODY {sender_id}->{receiver_id}")
+        
+        msg_id = self._new_msg_id()
+        drop_u, delay_u, _, _ = self._link_samples(sender_id, receiver_id)
+        if drop_u < self.drop_prob:
+            self._trace(EV_DROP_BODY, self.current_time, sender_id, receiver_id, msg_id)
             return
 
-        delay = random.uniform(self.min_delay, self.max_delay)
-        delivery_time = self.current_time + delay
+        delivery_time = self._delivery_time(sender_id, receiver_id, body, delay_u)
         
-        event = Event(delivery_time, receiver_id, sender_id, body, "BODY")
-        heapq.heappush(self.events, event)
+        self._push_event(delivery_time, KIND_BODY, receiver_id, sender_id, body, msg_id)
         
-        network_logger.info(f"{self.current_time:.3f} SEND_BODY {sender_id}->{receiver_id} height={body.get('height')}")
+        self._trace(EV_SEND_BODY, self.current_time, sender_id, receiver_id, msg_id)
+
+    def _hold_body(self, event):
+        """
+        Body tới khi receiver chưa accept header: giữ lại, trả về True nếu không được giao
+        (bị giữ, hoặc bị bỏ vì thuộc height receiver đã finalize).
+        """
+        _, _, _, receiver_id, sender_id, body, msg_id = event
+        return self.held_bodies.hold(self.current_time, sender_id, receiver_id, body, msg_id, event)
+
+    @property
+    def pending_bodies(self) -> dict:
+        """{receiver: {block_hash: {sender: (height, msg_id, event tuple)}}} của body đang giữ"""
+        return self.held_bodies.blocks
 
-    def accept_header(self, receiver_id: str, block_hash: str):
+    @property
+    def accepted_headers(self) -> dict:
+        """{receiver: {block_hash: height hoặc None}}"""
+        return self.held_bodies.accepted_headers
+
+    def pending_body_count(self, receiver_id: str = None) -> int:
+        """Số body đang bị giữ (của một receiver hoặc tổng)"""
+        return self.held_bodies.count(receiver_id)
+
+    def accept_header(self, receiver_id: str, block_hash: str, height: int = None):
         """Node báo đã accept header, cho phép nhận body"""
-        self.accepted_headers[receiver_id].add(block_hash)
+        # Giao các body đang bị giữ ngay tại thời điểm hiện tại (giữ seq gốc để thứ tự đơn định)
+        now = self.current_time
+        for event in self.held_bodies.accept(receiver_id, block_hash, height):
+            self._push((now,) + event[1:])
+
+    def forget_blocks(self, receiver_id: str, height: int):
+        """
+        Receiver đã finalize `height`: bỏ header đã accept và body đang giữ của các
+        block height <= height. Body của các height này tới sau đó bị bỏ ngay.
+        """
+        self.held_bodies.forget(receiver_id, height)
+
+    def broadcast(self, sender_id: str, targets, message: dict, copies: int = 1):
+        """
+        Gửi `copies` bản của message tới mỗi target (tương đương vòng lặp send_message).
+        Mẫu drop/delay/duplicate của mỗi link được rút trong một lần gọi NumPy từ stream
+        của chính link đó (cùng stream, cùng thứ tự với send_message), phần còn lại
+        tính theo mảng cho cả lô; sự kiện được đẩy vào hàng đợi theo lô.
+        """
+        if self.batch_window is not None:
+            for target in targets:
+                self._add_to_envelope(sender_id, target, message, copies)
+            return
+        self._broadcast(sender_id, targets, message, copies, KIND_MESSAGE, EV_SEND, EV_DROP)
+
+    def broadcast_header(self, sender_id: str, targets, header: dict, copies: int = 1):
+        """Như broadcast() nhưng cho block header (tương đương vòng lặp send_header)"""
+        self._broadcast(sender_id, targets, header, copies, KIND_HEADER, EV_SEND_HEADER, EV_DROP_HEADER)
+
+    def _broadcast(self, sender_id, targets, message, copies, kind, send_code, drop_code):
+        now = self.current_time
+        # Rate limit cả lô theo mảng, các bản đầu tiên của mỗi target được gửi
+        msg_class = CLASS_BLOCK if kind != KIND_MESSAGE else classify(message)
+        admitted = self.rate_limiter.admit_many(now, sender_id, targets, msg_class, copies)
+        total = sum(admitted)
+        if total == 0:
+            return
+        receivers = np.repeat(np.array(targets, dtype=object), admitted)
+        msg_ids = np.arange(self._next_msg_id + 1, self._next_msg_id + 1 + total, dtype=np.int64)
+        self._next_msg_id += total
+        
+        # Hàng 0: drop, 1: delay, 2: duplicate, 3: delay thêm của bản sao. Mỗi bản rút đủ
+        # LINK_SAMPLES mẫu từ link của nó (như _transmit), nên link không phụ thuộc target khác.
+        link_rng = self.link_rng
+        samples = np.concatenate([
+            link_rng(sender_id, target).random((count, LINK_SAMPLES))
+            for target, count in zip(targets, admitted) if count
+        ]).T
+        span = self.max_delay - self.min_delay
+        kept = samples[0] >= self.drop_prob
+        dropped = ~kept
+        if dropped.any():
+            self.trace_sink.emit_many(drop_code, now, sender_id, receivers[dropped].tolist(), msg_ids[dropped].tolist())
+        if not kept.any():
+            return
         
-        # Gửi các pending bodies đang chờ
-        keys_to_remove = []
-        for key, body in self.pending_bodies.items():
-            sender_id, recv_id, b_hash = key
-            if recv_id == receiver_id and b_hash == block_hash:
-                self.send_body(sender_id, receiver_id, body, block_hash)
-                keys_to_remove.append(key)
+        if self.model is None:
+            delivery = now + (self.min_delay + span * samples[1][kept])
+        else:
+            # Chỉ tin không bị drop chiếm uplink (giống send_message), serialize theo thứ tự gửi
+            sender_rank = self.assign_rank(sender_id)
+            kept_ranks = np.repeat(np.array([self.assign_rank(t) for t in targets], dtype=np.int64), admitted)[kept]
+            delivery = self.model.broadcast_delivery_times(now, sender_rank, kept_ranks, encoded_size(message),
+                                                           samples[1][kept])
+        kept_receivers = receivers[kept].tolist()
+        kept_ids = msg_ids[kept].tolist()
+        entries = zip(delivery.tolist(), self._next_seqs(sender_id, len(kept_ids)).tolist(), repeat(kind),
+                      kept_receivers, repeat(sender_id), repeat(message), kept_ids)
+        self._push_many(entries)
+        self.trace_sink.emit_many(send_code, now, sender_id, kept_receivers, kept_ids)
         
-        for key in keys_to_remove:
-            del self.pending_bodies[key]
+        # Chỉ tin nhắn thường được nhân đôi (giống send_message)
+        if kind != KIND_MESSAGE:
+            return
+        dup = samples[2][kept] < self.duplicate_prob
+        if dup.any():
+            if self.model is None:
+                dup_delivery = delivery[dup] + (self.min_delay + span * samples[3][kept][dup])
+            else:
+                dup_delivery = delivery[dup] + self.model.duplicate_delays(sender_rank, kept_ranks[dup], samples[3][kept][dup])
+            dup_receivers = receivers[kept][dup].tolist()
+            dup_ids = msg_ids[kept][dup].tolist()
+            entries = zip(dup_delivery.tolist(), self._next_seqs(sender_id, len(dup_ids)).tolist(), repeat(kind),
+                          dup_receivers, repeat(sender_id), repeat(message), dup_ids)
+            self._push_many(entries)
+            self.trace_sink.emit_many(EV_DUPLICATE, now, sender_id, dup_receivers, dup_ids)
 
     def send_message(self, sender_id: str, receiver_id: str, message: dict):
         """Mô phỏng gửi tin qua mạng không tin cậy"""
-        
-        # Kiểm tra rate limit
-        if not self._check_rate_limit(sender_id, receiver_id):
+        if self.batch_window is not None:
+            self._add_to_envelope(sender_id, receiver_id, message, 1)
+            return
+        self._transmit(sender_id, receiver_id, message)
+
+    def _add_to_envelope(self, sender_id: str, receiver_id: str, message: dict, copies: int):
+        """
+        Thêm tin vào phong bì đang mở của link; tin đầu tiên của sender trong cửa sổ hẹn giờ đóng.
+        Mỗi phong bì chỉ chứa tin cùng lớp và cùng số bản gửi, để tin TX không đi theo ngân sách
+        consensus hay bị gửi lại theo số bản của một vote nằm chung phong bì.
+        """
+        envelopes = self._envelopes.get(sender_id)
+        if envelopes is None:
+            envelopes = self._envelopes[sender_id] = {}
+            # Một sự kiện đóng cho mọi phong bì của sender, nằm ở partition của sender
+            self._push_event(self.current_time + self.batch_window, KIND_FLUSH, sender_id, sender_id, None, 0)
+        key = (receiver_id, classify(message), copies)
+        envelope = envelopes.get(key)
+        if envelope is None:
+            envelopes[key] = [message]
+        else:
+            envelope.append(message)
+
+    def _flush(self, sender_id: str):
+        """
+        Gửi mọi phong bì của sender, mỗi phong bì như một tin nhắn (tin lẻ gửi nguyên dạng).
+        Các link có cùng nội dung phong bì (ví dụ cùng vote tới mọi peer) đi chung một broadcast.
+        """
+        groups = {}
+        for (receiver_id, _, copies), messages in self._envelopes.pop(sender_id).items():
+            key = (tuple(map(id, messages)), copies)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = (messages, copies, [receiver_id])
+            else:
+                group[2].append(receiver_id)
+        for messages, copies, receivers in groups.values():
+            payload = messages[0] if len(messages) == 1 else {"msg_type": "BATCH", "messages": messages}
+            if len(receivers) == 1 and copies == 1:
+                self._transmit(sender_id, receivers[0], payload)
+            else:
+                self._broadcast(sender_id, receivers, payload, copies, KIND_MESSAGE, EV_SEND, EV_DROP)
+
+    def _transmit(self, sender_id: str, receiver_id: str, message: dict):
+        """Rate limit, drop, delay, duplicate cho một tin nhắn (hoặc một phong bì) trên link"""
+        # Kiểm tra rate limit (ngân sách theo lớp tin nhắn)
+        if not self._check_rate_limit(sender_id, receiver_id, classify(message)):
             return
         
+        msg_id = self._new_msg_id()
+        drop_u, delay_u, dup_u, dup_delay_u = self._link_samples(sender_id, receiver_id)
+        
         # 1. DROP: Kiểm tra xem tin có bị mất không
-        if random.random() < self.drop_prob:
-            network_logger.info(f"{self.current_time:.3f} DROP {sender_id}->{receiver_id} {message}")
+        if drop_u < self.drop_prob:
+            self._trace(EV_DROP, self.current_time, sender_id, receiver_id, msg_id)
             return # Tin nhắn biến mất
 
-        # 2. DELAY: Tính toán thời gian đến ngẫu nhiên
-        delay = random.uniform(self.min_delay, self.max_delay)
-        delivery_time = self.current_time + delay
+        # 2. DELAY: Tính toán thời gian đến ngẫu nhiên (hoặc theo topology)
+        delivery_time = self._delivery_time(sender_id, receiver_id, message, delay_u)
         
         # Tạo sự kiện
-        event = Event(delivery_time, receiver_id, sender_id, message)
-        heapq.heappush(self.events, event)
+        self._push_event(delivery_time, KIND_MESSAGE, receiver_id, sender_id, message, msg_id)
         
-        # Log sự kiện SEND
-        network_logger.info(f"{self.current_time:.3f} SEND {sender_id}->{receiver_id} msg={message}")
+        # Ghi sự kiện SEND
+        self._trace(EV_SEND, self.current_time, sender_id, receiver_id, msg_id)
 
-        # 3. DUPLICATE: Nhân đôi tin nhắn
-        if random.random() < self.duplicate_prob:
-            extra_delay = random.uniform(self.min_delay, self.max_delay)
-            dup_event = Event(delivery_time + extra_delay, receiver_id, sender_id, message)
-            heapq.heappush(self.events, dup_event)
-            network_logger.info(f"{self.current_time:.3f} DUPLICATE {sender_id}->{receiver_id}")
+        # 3. DUPLICATE: Nhân đôi tin nhắn (bản sao giữ nguyên msg_id)
+        if dup_u < self.duplicate_prob:
+            extra_delay = self._duplicate_delay(sender_id, receiver_id, dup_delay_u)
+            self._push_event(delivery_time + extra_delay, KIND_MESSAGE, receiver_id, sender_id, message, msg_id)
+            self._trace(EV_DUPLICATE, self.current_time, sender_id, receiver_id, msg_id)
 
     def run(self, max_time=100.0):
-        """Vòng lặp chính xử lý sự kiện"""
+        """Vòng lặp chính xử lý sự kiện (tin nhắn và timer) theo thứ tự toàn phần ở docstring lớp"""
         print(f"--- Simulation Started (Max Time: {max_time}) ---")
+        self.run_until(max_time)
+
+    def next_event_time(self):
+        """Thời điểm sự kiện (tin nhắn hoặc timer) sớm nhất còn chờ, None nếu hết"""
+        times = [t for t in (self.events.peek_time(), self._next_timer_time()) if t is not None]
+        return min(times) if times else None
+
+    def run_until(self, end_time: float, inclusive: bool = True):
+        """Xử lý mọi sự kiện có time <= end_time (hoặc < end_time nếu inclusive=False)"""
+        if not inclusive:
+            # Số float liền trước end_time (math.nextafter chỉ có từ Python 3.9)
+            end_time = float(np.nextafter(end_time, -np.inf))
         
-        while self.events:
-            # Lấy sự kiện có thời gian nhỏ nhất ra
-            event = heapq.heappop(self.events)
+        peek_time = self.events.peek_time
+        pop_event = self.events.pop
+        handlers = self._handlers = {node_id: self._bind_handlers(node) for node_id, node in self.nodes.items()}
+        recv_codes = self.RECV_CODES
+        trace = self._trace
+        inboxes = self.inboxes
+        processed = 0
+        
+        while True:
+            # Heap timer có thể được xây lại khi compact, nên đọc lại mỗi vòng
+            timers = self.timers
+            if self.cancelled_timers:
+                timer_time = self._next_timer_time()
+            else:
+                timer_time = timers[0][0] if timers else None
             
-            if event.delivery_time > max_time:
+            # Khi trùng thời điểm, tin nhắn được xử lý trước timer
+            event_time = peek_time()
+            if event_time is not None and (timer_time is None or event_time <= timer_time):
+                if event_time > end_time:
+                    break
+                event = pop_event()
+                delivery_time, _, kind, receiver_id, sender_id, message, msg_id = event
+                self.current_time = delivery_time
+                processed += 1
+                if kind >= KIND_SERVICE:
+                    if kind == KIND_SERVICE:
+                        self._serve(receiver_id)
+                    else:
+                        self._flush(sender_id)
+                    continue
+                bound = handlers.get(receiver_id)
+                if bound is None:
+                    continue
+                if kind == KIND_BODY and self._hold_body(event):
+                    continue
+                if inboxes is not None:
+                    self._enqueue(event)
+                    continue
+                trace(recv_codes[kind], delivery_time, sender_id, receiver_id, msg_id)
+                bound[kind](sender_id, message)
+            elif timer_time is not None and timer_time <= end_time:
+                fire_time, timer_id, node_id, token = heapq.heappop(timers)
+                self.live_timers.discard(timer_id)
+                self.current_time = fire_time
+                processed += 1
+                trace(EV_TIMER, fire_time, node_id, node_id, timer_id)
+                bound = handlers.get(node_id)
+                if bound is not None:
+                    bound[HANDLER_TIMER](token)
+            else:
                 break
-            
-            # Cập nhật thời gian hệ thống
-            self.current_time = event.delivery_time
-            
-            # Giao tin nhắn cho Node
-            if event.receiver_id in self.nodes:
-                node = self.nodes[event.receiver_id]
-                
-                if event.event_type == "HEADER":
-                    node.receive_header(event.sender_id, event.message)
-                    network_logger.info(f"{self.current_time:.3f} RECV_HEADER {event.receiver_id}<-{event.sender_id}")
-                elif event.event_type == "BODY":
-                    node.receive_body(event.sender_id, event.message)
-                    network_logger.info(f"{self.current_time:.3f} RECV_BODY {event.receiver_id}<-{event.sender_id}")
-                else:
-                    node.receive(event.sender_id, event.message)
-                    network_logger.info(f"{self.current_time:.3f} RECV {event.receiver_id}<-{event.sender_id} msg={event.message}")
\ No newline at end of file
+        
+        self.processed_events += processed
+
+
+class PartitionSimulator(Simulator):
+    """
+    Simulator của một partition trong chế độ PDES: chỉ chạy các node trong `hosted`.
+    Tin nhắn gửi tới node ở partition khác không vào hàng đợi mà được gom vào outbox,
+    coordinator chuyển chúng sang partition đích theo lô ở cuối mỗi cửa sổ thời gian.
+    """
+
+    def __init__(self, config: dict, hosted, trace_sink=None):
+        super().__init__(config, trace_sink=trace_sink)
+        if self.lookahead <= 0:
+            raise ValueError("PDES needs min_delay > 0 as lookahead")
+        self.hosted = set(hosted)
+        self.outbox = []
+
+    def _push_event(self, delivery_time, kind, receiver_id, sender_id, message, msg_id):
+        entry = (delivery_time, self._next_seq(sender_id), kind, receiver_id, sender_id, message, msg_id)
+        if receiver_id in self.hosted:
+            self._push(entry)
+        else:
+            self.outbox.append(entry)
+
+    def _push_many(self, entries):
+        hosted = self.hosted
+        local = []
+        for entry in entries:
+            if entry[3] in hosted:
+                local.append(entry)
+            else:
+                self.outbox.append(entry)
+        self.events.push_many(local)
+
+    def take_outbox(self) -> list:
+        outbox, self.outbox = self.outbox, []
+        return outbox
+
+    def deliver_remote(self, entries):
+        """Nhận lô tin nhắn từ partition khác (đã có sẵn delivery_time và seq)"""
+        for entry in entries:
+            self._push(entry)
@@ -1,8 +1,11 @@
 import copy
+from src.crypto import verify_signature
 from src.utils import get_hash
 
 class StateMachine:
-    def __init__(self):
+    def __init__(self, verify=verify_signature):
+        # Hàm kiểm chữ ký TX (Node.use_crypto có thể thay)
+        self.verify = verify
         # Lưu trữ dữ liệu chính: {"Alice/balance": 100, ...}
         self.data = {}
         # Lưu nonce để chống replay attack: {"Alice_pubkey": 5}
@@ -16,24 +19,24 @@ class StateMachine:
         return get_hash(self.data)
 
     def validate_transaction(self, tx) -> bool:
-        """Kiểm tra logic giao dịch trước khi thực thi"""
-        # 1. Kiểm tra chữ ký (đã có trong model nhưng check lại cho chắc)
-        if not tx.validate():
-            print(f"Invalid signature from {tx.sender[:8]}")
-            return False
-
-        # 2. Kiểm tra quyền sở hữu (Sender chỉ sửa key của chính mình)
+        """Kiểm tra logic giao dịch trước khi thực thi (các quy tắc rẻ trước, chữ ký sau cùng)"""
+        # 1. Kiểm tra quyền sở hữu (Sender chỉ sửa key của chính mình)
         # Quy tắc: Key phải bắt đầu bằng Sender ID (theo yêu cầu đề bài Section 7)
         # "Each transaction affects only data owned by its sender"
         if not tx.key.startswith(tx.sender):
             print(f"Ownership violation: {tx.sender[:8]} cannot modify key {tx.key[:16]}")
             return False
 
-        # 3. Kiểm tra Nonce (Chống phát lại)
+        # 2. Kiểm tra Nonce (Chống phát lại)
         last_nonce = self.nonces.get(tx.sender, -1)
         if tx.nonce <= last_nonce:
             print(f"Invalid nonce from {tx.sender[:8]}: {tx.nonce} <= {last_nonce}")
             return False
+
+        # 3. Kiểm tra chữ ký (đã có trong model nhưng check lại cho chắc) - đắt nhất nên để cuối
+        if not tx.validate(self.verify):
+            print(f"Invalid signature from {tx.sender[:8]}")
+            return False
             
         return True
 
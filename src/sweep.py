@@ -0,0 +1,222 @@
+# src/sweep.py
+"""
+Monte Carlo sweep: chạy nhiều simulation (seed x lưới cấu hình mạng) song song
+trên ProcessPoolExecutor, trả kết quả về ngay khi từng run xong, ghi nối vào
+file JSONL để có thể resume, và tổng hợp thành bảng.
+"""
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.runner import build_network
+from src.result_cache import cache_key
+from config.node_config import CONFIG
+from src.trace import (
+    CountingTraceSink, EV_SEND, EV_SEND_HEADER, EV_SEND_BODY, EV_DUPLICATE,
+    EV_DROP, EV_DROP_HEADER, EV_DROP_BODY
+)
+from src.utils import quiet_output
+
+# Các khóa của một điểm sweep được chuyển thẳng vào cấu hình mạng
+NETWORK_KEYS = ("min_delay", "max_delay", "drop_prob", "duplicate_prob", "scheduler")
+DEFAULT_MAX_TIME = 5.0
+
+
+def point_key(point: dict) -> str:
+    """Khóa chuẩn hóa của một điểm sweep (không phụ thuộc thứ tự khóa)"""
+    return json.dumps(point, sort_keys=True, separators=(",", ":"))
+
+
+def expand_grid(seeds, **axes) -> list:
+    """
+    Tích Descartes của các trục cấu hình và seed.
+    expand_grid(range(3), drop_prob=[0.0, 0.1]) -> 6 điểm {"drop_prob": ..., "seed": ...}
+    """
+    names = sorted(axes)
+    points = []
+    for values in itertools.product(*(axes[name] for name in names)):
+        for seed in seeds:
+            point = dict(zip(names, values))
+            point["seed"] = seed
+            points.append(point)
+    return points
+
+
+def collect_metrics(sim, nodes, counter: CountingTraceSink) -> dict:
+    """Chỉ số của một run: finality, số tin nhắn, vi phạm safety, state hash"""
+    latencies = [
+        n.finalize_times[h] - n.height_start_times[h]
+        for n in nodes for h in n.finalize_times if h in n.height_start_times
+    ]
+    # Safety: mỗi height chỉ được có một block được finalize (blocks[height] của node chưa
+    # finalize tới height đó chỉ là proposal đang xét, không tính)
+    violations = 0
+    max_height = max(n.finalized_height for n in nodes)
+    for height in range(1, max_height + 1):
+        hashes = {n.blocks[height].get_hash() for n in nodes if height <= n.finalized_height and height in n.blocks}
+        if len(hashes) > 1:
+            violations += 1
+    state = hashlib.sha256()
+    for n in nodes:
+        state.update(f"{n.node_id}:{n.finalized_height}:{n.state_machine.get_state_hash()};".encode())
+
+    return {
+        "heights": {n.node_id: n.finalized_height for n in nodes},
+        "min_height": min(n.finalized_height for n in nodes),
+        "max_height": max_height,
+        "mean_finality": sum(latencies) / len(latencies) if latencies else None,
+        "max_finality": max(latencies) if latencies else None,
+        "messages": counter.count(EV_SEND, EV_SEND_HEADER, EV_SEND_BODY, EV_DUPLICATE),
+        "dropped": counter.count(EV_DROP, EV_DROP_HEADER, EV_DROP_BODY),
+        "events": sim.processed_events,
+        "safety_violations": violations,
+        "state_hash": state.hexdigest(),
+    }
+
+
+def run_point(point: dict) -> dict:
+    """
+    Chạy một simulation cho một điểm sweep. Hàm top-level để gửi được sang process con.
+    Không qua cache: run_sweep mới tra / ghi ResultCache quanh hàm này.
+    Khóa hỗ trợ: seed, num_nodes, max_time và NETWORK_KEYS.
+    """
+    network_config = {k: point[k] for k in NETWORK_KEYS if k in point}
+    counter = CountingTraceSink()
+    sim, nodes = build_network(point.get("num_nodes"), seed=point["seed"], network_config=network_config,
+                               trace_sink=counter, key_prefix="sweep")
+    start = time.perf_counter()
+    # Bỏ log print của node: hàng nghìn run sẽ làm ngập stdout
+    with quiet_output():
+        for n in nodes:
+            n.auto_advance = True
+            n.start_consensus()
+        sim.run(max_time=point.get("max_time", DEFAULT_MAX_TIME))
+
+    result = {"point": point, "key": point_key(point), "wall_time": time.perf_counter() - start}
+    result.update(collect_metrics(sim, nodes, counter))
+    return result
+
+
+def load_results(path: str) -> dict:
+    """Đọc kết quả đã có {key: result}; dòng ghi dở (bị ngắt giữa chừng) bị bỏ qua"""
+    results = {}
+    if not path or not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["key"]] = result
+    return results
+
+
+def run_sweep(points, results_path: str = None, workers: int = None, run=run_point, cache=None):
+    """
+    Generator: chạy các điểm chưa có trong results_path, yield từng kết quả ngay khi xong
+    (thứ tự hoàn thành, không phải thứ tự điểm) và ghi nối vào file.
+    workers=1 chạy tuần tự trong process hiện tại.
+    cache (ResultCache): điểm đã từng tính với cùng CONFIG + mã nguồn được lấy từ cache
+    (đánh dấu "cached": True) thay vì chạy lại.
+    """
+    done = load_results(results_path)
+    todo = [p for p in points if point_key(p) not in done]
+    hits = []
+    if cache is not None:
+        misses = []
+        for p in todo:
+            cached = cache.get(cache_key(p, CONFIG))
+            if cached is None:
+                misses.append(p)
+            else:
+                hits.append(dict(cached, cached=True))
+        todo = misses
+    out = open(results_path, "a+") if results_path else None
+    if out is not None and out.tell() > 0:
+        # Lần trước bị ngắt giữa một dòng: xuống dòng để kết quả mới không dính vào dòng hỏng
+        out.seek(out.tell() - 1)
+        if out.read(1) != "\n":
+            out.write("\n")
+    try:
+        yield from _record(hits, out)
+        if workers == 1:
+            finished = (run(p) for p in todo)
+            yield from _record(finished, out, cache)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            futures = []
+            try:
+                futures = [pool.submit(run, p) for p in todo]
+                yield from _record((f.result() for f in as_completed(futures)), out, cache)
+            finally:
+                # Dừng giữa chừng (Ctrl+C, close()): bỏ các run chưa bắt đầu, kết quả đã ghi vẫn giữ.
+                # Hủy từng future thay cho shutdown(cancel_futures=True), vốn cần Python 3.9
+                for future in futures:
+                    future.cancel()
+                pool.shutdown(wait=True)
+    finally:
+        if out is not None:
+            out.close()
+
+
+def _record(results, out, cache=None):
+    for result in results:
+        if cache is not None:
+            cache.put(cache_key(result["point"], CONFIG), result)
+        if out is not None:
+            out.write(json.dumps(result, sort_keys=True) + "\n")
+            out.flush()
+        yield result
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(results, by=("drop_prob", "max_delay")) -> list:
+    """Gộp kết quả theo các trục `by`, mỗi nhóm một dòng thống kê"""
+    groups = {}
+    for result in results:
+        group = tuple(result["point"].get(axis) for axis in by)
+        groups.setdefault(group, []).append(result)
+
+    rows = []
+    for group in sorted(groups, key=lambda g: tuple((v is None, v) for v in g)):
+        runs = groups[group]
+        finality = [r["mean_finality"] for r in runs if r["mean_finality"] is not None]
+        rows.append({
+            **dict(zip(by, group)),
+            "runs": len(runs),
+            "live": sum(1 for r in runs if r["min_height"] >= 1) / len(runs),
+            "mean_height": sum(r["min_height"] for r in runs) / len(runs),
+            "mean_finality": sum(finality) / len(finality) if finality else None,
+            "p95_finality": _percentile(finality, 0.95) if finality else None,
+            "mean_messages": sum(r["messages"] for r in runs) / len(runs),
+            "safety_violations": sum(r["safety_violations"] for r in runs),
+        })
+    return rows
+
+
+def format_table(rows) -> str:
+    """Bảng text căn cột cho kết quả summarize()"""
+    if not rows:
+        return "(no results)"
+    columns = list(rows[0])
+
+    def cell(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return str(value)
+
+    table = [columns] + [[cell(row[c]) for c in columns] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    lines = ["  ".join(text.rjust(width) for text, width in zip(line, widths)) for line in table]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
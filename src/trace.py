@@ -0,0 +1,261 @@
+# src/trace.py
+"""
+Trace sink cho Simulator: mỗi sự kiện mạng là một record gọn
+(event code, time, src, dst, msg_id). Sink quyết định lưu ở đâu;
+việc format thành chuỗi chỉ xảy ra khi có người đọc trace.
+"""
+import hashlib
+import struct
+from collections import deque
+
+# Mã sự kiện
+EV_SEND = 1
+EV_SEND_HEADER = 2
+EV_SEND_BODY = 3
+EV_RECV = 4
+EV_RECV_HEADER = 5
+EV_RECV_BODY = 6
+EV_DROP = 7
+EV_DROP_HEADER = 8
+EV_DROP_BODY = 9
+EV_DUPLICATE = 10
+EV_PENDING_BODY = 11
+EV_BLOCK = 12
+EV_BLOCKED = 13
+EV_UNBLOCK = 14
+EV_TIMER = 15
+EV_INBOX_DROP = 16
+
+EVENT_NAMES = {
+    EV_SEND: "SEND",
+    EV_SEND_HEADER: "SEND_HEADER",
+    EV_SEND_BODY: "SEND_BODY",
+    EV_RECV: "RECV",
+    EV_RECV_HEADER: "RECV_HEADER",
+    EV_RECV_BODY: "RECV_BODY",
+    EV_DROP: "DROP",
+    EV_DROP_HEADER: "DROP_HEADER",
+    EV_DROP_BODY: "DROP_BODY",
+    EV_DUPLICATE: "DUPLICATE",
+    EV_PENDING_BODY: "PENDING_BODY",
+    EV_BLOCK: "BLOCK",
+    EV_BLOCKED: "BLOCKED",
+    EV_UNBLOCK: "UNBLOCK",
+    EV_TIMER: "TIMER",
+    EV_INBOX_DROP: "INBOX_DROP",
+}
+
+
+def format_record(record) -> str:
+    """(code, time, src, dst, msg_id) -> dòng log dễ đọc"""
+    code, time, src, dst, msg_id = record
+    return f"{time:.3f} {EVENT_NAMES.get(code, code)} {src}->{dst} #{msg_id}"
+
+
+class TraceSink:
+    """Interface: Simulator gọi emit() cho mỗi sự kiện mạng"""
+
+    def emit(self, code: int, time: float, src: str, dst: str, msg_id: int):
+        raise NotImplementedError
+
+    def emit_many(self, code: int, time: float, src: str, dsts, msg_ids):
+        """Nhiều record cùng code/time/src (broadcast)"""
+        emit = self.emit
+        for dst, msg_id in zip(dsts, msg_ids):
+            emit(code, time, src, dst, msg_id)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NullTraceSink(TraceSink):
+    """Bỏ qua mọi record (mặc định, gần như không tốn chi phí)"""
+
+    def emit(self, code, time, src, dst, msg_id):
+        pass
+
+    def emit_many(self, code, time, src, dsts, msg_ids):
+        pass
+
+
+class CountingTraceSink(TraceSink):
+    """Chỉ đếm số record theo mã sự kiện, dùng cho thống kê khi không cần trace đầy đủ"""
+
+    def __init__(self):
+        self.counts = [0] * (max(EVENT_NAMES) + 1)
+
+    def emit(self, code, time, src, dst, msg_id):
+        self.counts[code] += 1
+
+    def emit_many(self, code, time, src, dsts, msg_ids):
+        self.counts[code] += len(dsts)
+
+    def count(self, *codes) -> int:
+        return sum(self.counts[code] for code in codes)
+
+    def as_dict(self) -> dict:
+        return {EVENT_NAMES[code]: n for code, n in enumerate(self.counts) if n and code in EVENT_NAMES}
+
+
+class RingBufferTraceSink(TraceSink):
+    """Giữ `capacity` record gần nhất trong bộ nhớ (capacity=None: giữ tất cả)"""
+
+    def __init__(self, capacity: int = 100000):
+        self.buffer = deque(maxlen=capacity)
+        self.total = 0
+
+    def emit(self, code, time, src, dst, msg_id):
+        self.buffer.append((code, time, src, dst, msg_id))
+        self.total += 1
+
+    def records(self) -> list:
+        return list(self.buffer)
+
+    def lines(self):
+        for record in self.buffer:
+            yield format_record(record)
+
+
+class BinaryFileTraceSink(TraceSink):
+    """
+    Ghi record ra file nhị phân kích thước cố định.
+    Tên node được ghi một lần (record NAME) rồi tham chiếu bằng chỉ số 2 byte.
+    """
+    MAGIC = b"L1TRACE1"
+    RECORD = struct.Struct("<BdHHQ")   # code, time, src_idx, dst_idx, msg_id
+    NAME = struct.Struct("<BHH")       # 0, name_idx, name_len (+ bytes utf-8)
+    FLUSH_BYTES = 1 << 16
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(self.MAGIC)
+        self.buffer = bytearray()
+        self.name_ids = {}
+
+    def _name_id(self, name) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.name_ids)
+            self.name_ids[name] = name_id
+            encoded = str(name).encode("utf-8")
+            self.buffer += self.NAME.pack(0, name_id, len(encoded)) + encoded
+        return name_id
+
+    def emit(self, code, time, src, dst, msg_id):
+        self.buffer += self.RECORD.pack(code, time, self._name_id(src), self._name_id(dst), msg_id)
+        if len(self.buffer) >= self.FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __getstate__(self):
+        """Checkpoint: ghi hết buffer, nhớ độ dài file và bảng tên"""
+        self.flush()
+        self.file.flush()
+        return {"path": self.path, "offset": self.file.tell(), "name_ids": dict(self.name_ids)}
+
+    def __setstate__(self, state):
+        """
+        Resume: mở lại file, cắt về độ dài lúc checkpoint rồi ghi tiếp, nên file trace
+        sau khi resume giống hệt từng byte file của lần chạy không bị ngắt.
+        """
+        self.path = state["path"]
+        self.name_ids = dict(state["name_ids"])
+        self.buffer = bytearray()
+        self.file = open(self.path, "r+b")
+        self.file.seek(0, 2)
+        if self.file.tell() < state["offset"]:
+            self.file.close()
+            raise ValueError(f"{self.path} is shorter than at checkpoint time")
+        self.file.truncate(state["offset"])
+        self.file.seek(state["offset"])
+
+
+class HashingTraceSink(TraceSink):
+    """
+    Hash trace ngay khi record được tạo, không ghi đĩa: SHA-256 trên đúng các byte mà
+    BinaryFileTraceSink ghi ra file (digest() == sha256 của file đó).
+    Mỗi `checkpoint_every` record là một checkpoint: gọi on_checkpoint(sink) để so hash
+    với lần chạy khác (src/determinism.py). Chỉ giữ record của cửa sổ hiện tại và cửa sổ
+    trước (window()) để chỉ ra record lệch đầu tiên cùng ngữ cảnh.
+    """
+    MAGIC = BinaryFileTraceSink.MAGIC
+    RECORD = BinaryFileTraceSink.RECORD
+    NAME = BinaryFileTraceSink.NAME
+
+    def __init__(self, checkpoint_every: int = 10000, on_checkpoint=None):
+        self.hash = hashlib.sha256(self.MAGIC)
+        self.buffer = bytearray()
+        self.name_ids = {}
+        self.count = 0
+        self.checkpoint_every = checkpoint_every
+        self.on_checkpoint = on_checkpoint
+        self.previous = []
+        self.current = []
+
+    _name_id = BinaryFileTraceSink._name_id
+
+    def emit(self, code, time, src, dst, msg_id):
+        self.buffer += self.RECORD.pack(code, time, self._name_id(src), self._name_id(dst), msg_id)
+        self.current.append((code, time, src, dst, msg_id))
+        self.count += 1
+        if len(self.current) >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Báo on_checkpoint (window() lúc này gồm cửa sổ vừa xong) rồi chuyển sang cửa sổ mới"""
+        self.hash.update(self.buffer)
+        self.buffer = bytearray()
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(self)
+        self.previous, self.current = self.current, []
+
+    def digest(self) -> str:
+        """Hash của mọi record tới hiện tại"""
+        self.hash.update(self.buffer)
+        self.buffer = bytearray()
+        return self.hash.hexdigest()
+
+    def window(self) -> tuple:
+        """(chỉ số của record đầu, các record) của cửa sổ trước và cửa sổ hiện tại"""
+        records = self.previous + self.current
+        return self.count - len(records), records
+
+
+def read_binary_trace(path: str):
+    """Đọc lại file của BinaryFileTraceSink, trả về từng record (code, time, src, dst, msg_id)"""
+    record_size = BinaryFileTraceSink.RECORD.size
+    name_size = BinaryFileTraceSink.NAME.size
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(BinaryFileTraceSink.MAGIC):
+        raise ValueError(f"{path} is not a trace file")
+
+    names = {}
+    pos = len(BinaryFileTraceSink.MAGIC)
+    while pos < len(data):
+        if data[pos] == 0:
+            _, name_id, length = BinaryFileTraceSink.NAME.unpack_from(data, pos)
+            pos += name_size
+            names[name_id] = data[pos:pos + length].decode("utf-8")
+            pos += length
+        else:
+            code, time, src, dst, msg_id = BinaryFileTraceSink.RECORD.unpack_from(data, pos)
+            pos += record_size
+            yield (code, time, names[src], names[dst], msg_id)
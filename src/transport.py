@@ -0,0 +1,80 @@
+# src/transport.py
+"""
+Interface hẹp mà Node phụ thuộc, tách Node khỏi engine chạy nó:
+  - Transport: gửi tin / header / body giữa các node, báo header đã accept để engine giao body.
+  - Clock: thời gian hiện tại của node (current_time) và timer.
+Simulator (sự kiện rời rạc) và RealtimeRuntime (asyncio + socket / shared memory) cài đặt
+cả hai; engine khác chỉ cần có các hàm dưới đây, không phải sửa Node.
+
+Đường nóng không tốn thêm gì so với gọi thẳng engine:
+  - Node lấy sẵn bound method của transport / clock một lần khi gắn vào engine
+    (Node.bind_transport), mỗi lần gửi chỉ là đọc một attribute của node rồi gọi.
+  - Thời gian là attribute current_time chứ không phải hàm: với Simulator đọc giờ
+    không tốn một lời gọi hàm.
+  - Engine làm điều ngược lại: handler của node (receive, receive_header, receive_body,
+    on_timer) được lấy một lần mỗi lượt chạy (node_handlers) thay vì getattr theo tên
+    ở mỗi sự kiện.
+"""
+
+# Handler của node theo thứ tự: chỉ số 0..2 trùng KIND_MESSAGE / KIND_HEADER / KIND_BODY
+# của Simulator, chỉ số HANDLER_TIMER là on_timer
+HANDLER_NAMES = ("receive", "receive_header", "receive_body", "on_timer")
+HANDLER_TIMER = 3
+
+
+def node_handlers(node) -> tuple:
+    """Bound method của các handler trong HANDLER_NAMES (None nếu node không có)"""
+    return tuple(getattr(node, name, None) for name in HANDLER_NAMES)
+
+
+class Clock:
+    """
+    Interface: thời gian và timer của node.
+    current_time: giây hiện tại (mô phỏng hoặc wall-clock), attribute thường (Simulator)
+    hoặc property (RealtimeRuntime).
+    """
+
+    def schedule_timer(self, node_id: str, delay: float, callback_token) -> int:
+        """Sau `delay` giây gọi node.on_timer(callback_token). Trả về timer_id."""
+        raise NotImplementedError
+
+    def cancel(self, timer_id: int):
+        """Hủy timer; timer_id None, đã chạy hoặc không tồn tại thì bỏ qua"""
+        raise NotImplementedError
+
+
+class Transport:
+    """Interface: chuyển tin giữa các node đã register_node"""
+
+    def register_node(self, node):
+        raise NotImplementedError
+
+    def send_message(self, sender_id: str, receiver_id: str, message: dict):
+        raise NotImplementedError
+
+    def broadcast(self, sender_id: str, targets, message: dict, copies: int = 1):
+        """`copies` bản của message tới mỗi target (engine có thể gửi cả lô rẻ hơn)"""
+        send = self.send_message
+        for receiver_id in targets:
+            for _ in range(copies):
+                send(sender_id, receiver_id, message)
+
+    def send_header(self, sender_id: str, receiver_id: str, header: dict):
+        raise NotImplementedError
+
+    def broadcast_header(self, sender_id: str, targets, header: dict, copies: int = 1):
+        send = self.send_header
+        for receiver_id in targets:
+            for _ in range(copies):
+                send(sender_id, receiver_id, header)
+
+    def send_body(self, sender_id: str, receiver_id: str, body: dict, block_hash: str):
+        """Body chỉ được giao sau khi receiver accept_header(block_hash)"""
+        raise NotImplementedError
+
+    def accept_header(self, receiver_id: str, block_hash: str, height: int = None):
+        pass
+
+    def forget_blocks(self, receiver_id: str, height: int):
+        """Receiver đã finalize `height`: không cần giữ body của các height <= height nữa"""
+        pass
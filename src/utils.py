@@ -1,5 +1,7 @@
+import contextlib
 import json
 import hashlib
+import os
 
 def deterministic_encode(data: dict) -> bytes:
     """
@@ -16,4 +18,14 @@ def get_hash(data: dict) -> str:
     Trả về chuỗi hex SHA-256 của data.
     """
     encoded = deterministic_encode(data)
-    return hashlib.sha256(encoded).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@contextlib.contextmanager
+def quiet_output(quiet: bool = True):
+    """Bỏ log print của node (redirect stdout vào devnull); quiet=False thì in bình thường"""
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
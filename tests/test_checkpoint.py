@@ -0,0 +1,119 @@
+# tests/test_checkpoint.py
+import sys
+import os
+import copy
+import hashlib
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.node_config import CONFIG
+from src.checkpoint import save_checkpoint, load_checkpoint, read_checkpoint_meta
+from src.runner import build_network
+from src.trace import RingBufferTraceSink, BinaryFileTraceSink
+
+NETWORKS = {
+    "chaos": {"drop_prob": 0.1, "duplicate_prob": 0.05},
+    "calendar_batching": {"scheduler": "calendar", "batching": {"window": 0.005}},
+    "topology_processing": {
+        "topology": {"regions": ["eu", "us"], "latency": [[0.01, 0.05], [0.05, 0.01]], "jitter": 0.002},
+        "processing": {"capacity": 2000},
+    },
+}
+
+
+def start(network_config, trace_sink, num_nodes=6):
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    sim, nodes = build_network(num_nodes, seed=11, network_config=network_config, config=config,
+                               trace_sink=trace_sink, key_prefix="ckpt")
+    for i, n in enumerate(nodes):
+        n.create_transaction(f"{n.key_pair.pub_key_str}/k{i}", f"v{i}")
+    for n in nodes:
+        n.start_consensus()
+    return sim, nodes
+
+
+def snapshot(sim) -> dict:
+    return {
+        node_id: (n.finalized_height, n.state_machine.get_state_hash(), len(n.mempool), n.round,
+                  [n.blocks[h].get_hash() for h in sorted(n.blocks)])
+        for node_id, n in sim.nodes.items()
+    }
+
+
+@pytest.mark.parametrize("network", sorted(NETWORKS))
+def test_resume_matches_uninterrupted_run(network, tmp_path):
+    full, _ = start(NETWORKS[network], RingBufferTraceSink(None))
+    full.run_until(6.0)
+
+    sim, _ = start(NETWORKS[network], RingBufferTraceSink(None))
+    sim.run_until(2.5)
+    path = str(tmp_path / "sim.ckpt")
+    save_checkpoint(sim, path, meta={"network": network})
+    resumed = load_checkpoint(path)
+    resumed.run_until(6.0)
+
+    assert max(n.finalized_height for n in full.nodes.values()) >= 3
+    assert resumed.trace_sink.records() == full.trace_sink.records()
+    assert snapshot(resumed) == snapshot(full)
+    assert resumed.processed_events == full.processed_events
+    # Bản gốc chạy tiếp sau khi checkpoint cũng không bị ảnh hưởng
+    sim.run_until(6.0)
+    assert sim.trace_sink.records() == full.trace_sink.records()
+
+
+def test_binary_trace_resumes_byte_identical(tmp_path):
+    full_path, part_path, ckpt = (str(tmp_path / name) for name in ("full.trace", "part.trace", "sim.ckpt"))
+    sink = BinaryFileTraceSink(full_path)
+    full, _ = start(NETWORKS["chaos"], sink)
+    full.run_until(5.0)
+    sink.close()
+
+    sink = BinaryFileTraceSink(part_path)
+    sim, _ = start(NETWORKS["chaos"], sink)
+    sim.run_until(1.7)
+    save_checkpoint(sim, ckpt)
+    # Lần chạy bị ngắt giữa chừng, file trace đã có thêm record sau checkpoint
+    sim.run_until(3.0)
+    sink.close()
+
+    resumed = load_checkpoint(ckpt)
+    resumed.run_until(5.0)
+    resumed.trace_sink.close()
+    with open(full_path, "rb") as a, open(part_path, "rb") as b:
+        assert hashlib.sha256(a.read()).digest() == hashlib.sha256(b.read()).digest()
+
+
+def test_checkpoint_meta_and_format(tmp_path):
+    sim, nodes = start(NETWORKS["chaos"], None, num_nodes=4)
+    sim.run_until(1.0)
+    path = str(tmp_path / "sim.ckpt")
+    compressed = save_checkpoint(sim, path, meta={"seed": 11})
+    meta = read_checkpoint_meta(path)
+    assert meta["seed"] == 11 and meta["time"] == sim.current_time
+    assert meta["heights"] == {n.node_id: n.finalized_height for n in nodes}
+    assert meta["pending_events"] == sim.pending_event_count()
+
+    raw = save_checkpoint(sim, str(tmp_path / "raw.ckpt"), compress=False)
+    assert compressed < raw
+    sink = RingBufferTraceSink(None)
+    resumed = load_checkpoint(str(tmp_path / "raw.ckpt"), trace_sink=sink)
+    assert resumed.trace_sink is sink and resumed.rate_limiter.trace_sink is sink
+    assert all(n.transport is resumed for n in resumed.nodes.values())
+
+    (tmp_path / "bad.ckpt").write_bytes(b"not a checkpoint")
+    with pytest.raises(ValueError):
+        load_checkpoint(str(tmp_path / "bad.ckpt"))
+
+
+if __name__ == "__main__":
+    import tempfile
+    import pathlib
+    for network in sorted(NETWORKS):
+        with tempfile.TemporaryDirectory() as d:
+            test_resume_matches_uninterrupted_run(network, pathlib.Path(d))
+    for test in (test_binary_trace_resumes_byte_identical, test_checkpoint_meta_and_format):
+        with tempfile.TemporaryDirectory() as d:
+            test(pathlib.Path(d))
+    print("All checkpoint tests passed!")
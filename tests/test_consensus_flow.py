@@ -6,6 +6,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.node import Node
 from src.simulator import Simulator
+from src.trace import CountingTraceSink, EV_SEND_HEADER, EV_SEND_BODY
+from src.models import Transaction
+from src.crypto import CTX_TX
 from config.node_config import CONFIG
 
 def test_consensus_happy_path():
@@ -54,5 +57,164 @@ def test_consensus_happy_path():
         assert n.finalized_height == 1, f"{n.node_id} chưa finalize block 1!"
         print(f"PASS: {n.node_id} finalized block 1")
 
+def setup_lossless_network(config=CONFIG, trace_sink=None, network=None):
+    """Mạng không drop/duplicate với các node từ config (network: ghi đè thêm cấu hình mạng)"""
+    network_config = CONFIG["network"].copy()
+    network_config["drop_prob"] = 0.0
+    network_config["duplicate_prob"] = 0.0
+    network_config.update(network or {})
+    sim = Simulator(network_config, trace_sink=trace_sink)
+    
+    node_names = CONFIG["nodes"]
+    num_nodes = len(node_names)
+    
+    validator_keys = []
+    nodes = []
+    for i in range(num_nodes):
+        n = Node(node_names[i], sim, [], config=config)
+        nodes.append(n)
+        validator_keys.append(n.key_pair.pub_key_str)
+        sim.register_node(n)
+
+    for n in nodes:
+        n.consensus.validators = validator_keys
+        n.consensus.n = num_nodes
+        n.consensus.threshold = (num_nodes * 2) // 3 + 1
+        for peer in nodes:
+            n.add_peer(peer.node_id)
+    return sim, nodes
+
+def test_block_body_pulled_once_per_peer():
+    """Pull model: header gửi retry_count lần, body chỉ gửi 1 lần cho mỗi peer"""
+    # Đếm số header/body được gửi qua trace
+    counter = CountingTraceSink()
+    sim, nodes = setup_lossless_network(trace_sink=counter)
+    num_nodes = len(nodes)
+
+    nodes[0].start_consensus()
+    sim.run(max_time=10.0)
+    counts = {"HEADER": counter.count(EV_SEND_HEADER), "BODY": counter.count(EV_SEND_BODY)}
+
+    retry_count = CONFIG["consensus"]["retry_count"]
+    assert counts["HEADER"] == (num_nodes - 1) * retry_count
+    assert counts["BODY"] == num_nodes - 1, f"Body gửi {counts['BODY']} lần, mong đợi {num_nodes - 1}"
+    
+    block_hash = nodes[0].blocks[1].get_hash()
+    for n in nodes:
+        assert n.finalized_height == 1
+        assert n.blocks[1].get_hash() == block_hash
+
+def test_compact_block_reconstructed_from_mempool():
+    """Compact block: TX đã gossip thì dựng lại từ mempool, TX thiếu xin trong 1 lượt GET_TXS"""
+    sim, nodes = setup_lossless_network()
+    
+    # 3 node tạo TX và gossip trước khi có proposal
+    for n in nodes[1:4]:
+        n.create_transaction(f"{n.key_pair.pub_key_str}/k", "v")
+    sim.run(max_time=1.0)
+    
+    # TX chỉ proposer có (không gossip) -> các node khác phải xin lại
+    private_sender = nodes[4]
+    private_tx = Transaction(private_sender.key_pair.pub_key_str, f"{private_sender.key_pair.pub_key_str}/p", "x", 0)
+    private_tx.signature = private_sender.key_pair.sign(private_tx.to_dict(include_sig=False), CTX_TX)
+    nodes[0].add_to_mempool(private_tx)
+    
+    nodes[0].start_consensus()
+    sim.run(max_time=10.0)
+    
+    block_hash = nodes[0].blocks[1].get_hash()
+    assert len(nodes[0].blocks[1].txs) == 4
+    for n in nodes[1:]:
+        assert n.finalized_height == 1
+        assert n.blocks[1].get_hash() == block_hash
+    
+    # Các node đều có sẵn 3/4 TX trong mempool (kể cả TX của chính mình)
+    for n in nodes[1:]:
+        assert n.compact_stats["blocks"] == 1
+        assert n.compact_stats["tx_requests"] == 1
+        assert n.get_compact_hit_rate() == 0.75
+
+def test_transaction_gossip_covers_network_with_linear_messages():
+    """Gossip TX: mỗi node relay đúng 1 lần tới tx_fanout peer -> O(N) tin nhắn, phủ toàn mạng"""
+    config = dict(CONFIG, consensus=dict(CONFIG["consensus"], tx_regossip_count=0))
+    sim, nodes = setup_lossless_network(config)
+    num_nodes = len(nodes)
+    
+    tx_messages = []
+    original_send_message = sim.send_message
+
+    def counting_send_message(sender_id, receiver_id, message):
+        if "key" in message and "value" in message:
+            tx_messages.append((sender_id, receiver_id))
+        original_send_message(sender_id, receiver_id, message)
+
+    sim.send_message = counting_send_message
+    
+    tx = nodes[3].create_transaction(f"{nodes[3].key_pair.pub_key_str}/k", "v")
+    sim.run(max_time=5.0)
+    
+    for n in nodes:
+        assert tx.get_short_id() in n.mempool_index, f"{n.node_id} không nhận được TX"
+    assert len(tx_messages) <= num_nodes * nodes[0].tx_fanout
+    
+    # TX trùng lặp không được relay lại
+    before = len(tx_messages)
+    nodes[5].handle_transaction(nodes[3].node_id, tx.to_dict())
+    assert len(tx_messages) == before
+
+def _spread_transaction(regossip_count, drop_prob):
+    """Một TX từ nodes[3] trên mạng mất gói: trả về (nodes, tx, số tin nhắn TX đã gửi)"""
+    config = dict(CONFIG, consensus=dict(CONFIG["consensus"], tx_regossip_count=regossip_count))
+    sim, nodes = setup_lossless_network(config, network={"drop_prob": drop_prob, "seed": 4})
+    
+    tx_messages = []
+    original_send_message = sim.send_message
+
+    def counting_send_message(sender_id, receiver_id, message):
+        if "key" in message and "value" in message:
+            tx_messages.append((sender_id, receiver_id))
+        original_send_message(sender_id, receiver_id, message)
+
+    sim.send_message = counting_send_message
+    
+    tx = nodes[3].create_transaction(f"{nodes[3].key_pair.pub_key_str}/k", "v")
+    sim.run(max_time=nodes[0].tx_seen_ttl)
+    return nodes, tx, len(tx_messages)
+
+def test_transaction_regossip_covers_lossy_network():
+    """Mất gói: relay một lần bỏ sót node, TX còn trong mempool được gửi lại tới khi phủ toàn mạng"""
+    nodes, tx, _ = _spread_transaction(regossip_count=0, drop_prob=0.4)
+    assert not all(tx.get_short_id() in n.mempool_index for n in nodes)
+    
+    regossip_count = CONFIG["consensus"]["tx_regossip_count"]
+    nodes, tx, sent = _spread_transaction(regossip_count, drop_prob=0.4)
+    for n in nodes:
+        assert tx.get_short_id() in n.mempool_index, f"{n.node_id} không nhận được TX"
+    # Gửi lại có giới hạn: mỗi node tối đa (1 + tx_regossip_count) lượt tới tx_fanout peer
+    assert sent <= len(nodes) * nodes[0].tx_fanout * (1 + regossip_count)
+    assert all(not n._regossip_queue for n in nodes)
+
+def test_consensus_with_link_batching():
+    """Batching: vote/TX cùng link trong cửa sổ đi chung một phong bì, Node.receive mở ra xử lý từng tin"""
+    counter = CountingTraceSink()
+    sim, nodes = setup_lossless_network(trace_sink=counter, network={"batching": {"window": 0.01}})
+    for n in nodes[1:4]:
+        n.create_transaction(f"{n.key_pair.pub_key_str}/k", "v")
+    sim.run(max_time=1.0)
+    for n in nodes:
+        n.start_consensus()
+    sim.run(max_time=10.0)
+
+    block_hash = nodes[0].blocks[1].get_hash()
+    for n in nodes:
+        assert n.finalized_height >= 1
+        assert n.blocks[1].get_hash() == block_hash
+        assert len(n.blocks[1].txs) == 3
+
 if __name__ == "__main__":
-    test_consensus_happy_path()
\ No newline at end of file
+    test_consensus_happy_path()
+    test_block_body_pulled_once_per_peer()
+    test_compact_block_reconstructed_from_mempool()
+    test_transaction_gossip_covers_network_with_linear_messages()
+    test_transaction_regossip_covers_lossy_network()
+    test_consensus_with_link_batching()
\ No newline at end of file
@@ -0,0 +1,89 @@
+# tests/test_determinism.py
+import sys
+import os
+import copy
+import hashlib
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.node_config import CONFIG
+from src.determinism import check_determinism
+from src.runner import build_network
+from src.trace import BinaryFileTraceSink, HashingTraceSink, RingBufferTraceSink
+
+
+def run(run_index, trace_sink, diverge_at=None):
+    """Mô phỏng dùng chung; diverge_at: lần chạy 1 tăng duplicate_prob từ thời điểm đó"""
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    sim, nodes = build_network(6, seed=3, network_config={"drop_prob": 0.05}, config=config,
+                               trace_sink=trace_sink, key_prefix="determinism")
+    for n in nodes:
+        n.start_consensus()
+    if diverge_at is not None and run_index == 1:
+        sim.run_until(diverge_at)
+        sim.duplicate_prob += 0.1
+    sim.run_until(6.0)
+    return {n.node_id: n.state_machine.get_state_hash() for n in nodes}
+
+
+def run_diverging(run_index, trace_sink):
+    return run(run_index, trace_sink, diverge_at=2.0)
+
+
+def test_hashing_sink_matches_binary_file(tmp_path):
+    path = str(tmp_path / "run.trace")
+    file_sink = BinaryFileTraceSink(path)
+    run(0, file_sink)
+    file_sink.close()
+
+    checkpoints = []
+    sink = HashingTraceSink(checkpoint_every=500, on_checkpoint=lambda s: checkpoints.append(s.count))
+    run(0, sink)
+    with open(path, "rb") as f:
+        assert sink.digest() == hashlib.sha256(f.read()).hexdigest()
+    assert sink.count > 1000
+    assert checkpoints == list(range(500, sink.count + 1, 500))
+    # Chỉ giữ hai cửa sổ gần nhất
+    first, records = sink.window()
+    assert first + len(records) == sink.count and len(records) < 1000
+
+
+def test_parallel_runs_identical():
+    report = check_determinism(run, runs=3, checkpoint_every=1000)
+    assert report["identical"] and report["divergence"] is None
+    assert report["checkpoints"] == report["records"] // 1000 > 0
+    assert len(set(report["digests"])) == 1 and len(report["digests"]) == 3
+    assert report["summaries"][0] == report["summaries"][2]
+
+
+def test_divergence_located_with_context():
+    report = check_determinism(run_diverging, runs=2, checkpoint_every=1000, context=3)
+    assert not report["identical"]
+
+    # Record lệch đầu tiên tìm thẳng từ hai trace đầy đủ trong bộ nhớ
+    traces = []
+    for run_index in range(2):
+        sink = RingBufferTraceSink(None)
+        run_diverging(run_index, sink)
+        traces.append(sink.records())
+    index = next(i for i, (a, b) in enumerate(zip(*traces)) if a != b)
+
+    divergence = report["divergence"]
+    assert divergence["index"] == index
+    assert report["records"] <= index < report["records"] + 1000
+    for lines in divergence["context"]:
+        marked = [line for line in lines if line.startswith(">>")]
+        assert len(marked) == 1 and marked[0].startswith(f">> #{index} ")
+        assert len(lines) == 7
+    assert divergence["context"][0] != divergence["context"][1]
+
+
+if __name__ == "__main__":
+    import tempfile
+    import pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_hashing_sink_matches_binary_file(pathlib.Path(d))
+    test_parallel_runs_identical()
+    test_divergence_located_with_context()
+    print("All determinism tests passed!")
@@ -0,0 +1,75 @@
+# tests/test_pdes.py
+"""
+PDES: chia node ra nhiều process phải cho kết quả giống hệt engine tuần tự cùng seed.
+"""
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pdes import run_sequential, run_parallel
+from src.simulator import PartitionSimulator
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_matches_sequential(workers):
+    network = {"drop_prob": 0.1, "duplicate_prob": 0.05}
+    sequential = run_sequential(seed=7, network_config=network, max_time=4.0)
+    stats = {}
+    parallel = run_parallel(seed=7, network_config=network, max_time=4.0, workers=workers, stats=stats)
+
+    assert parallel == sequential
+    assert min(s["finalized_height"] for s in sequential.values()) >= 1
+    assert stats["remote_messages"] > 0
+
+
+def test_parallel_matches_sequential_with_heavy_loss_and_calendar_queue():
+    """Drop/duplicate cao (nhiều round change, body bị giữ chờ header) và calendar scheduler"""
+    network = {"drop_prob": 0.3, "duplicate_prob": 0.2, "scheduler": "calendar"}
+    sequential = run_sequential(seed=11, network_config=network, max_time=4.0)
+    assert run_parallel(seed=11, network_config=network, max_time=4.0, workers=4) == sequential
+
+
+def test_parallel_matches_sequential_with_topology():
+    """Lookahead lấy từ độ trễ vùng nhỏ nhất; hàng đợi uplink của sender không phụ thuộc partition"""
+    network = {"topology": {
+        "regions": ["us", "eu"],
+        "latency": [[0.02, 0.08], [0.08, 0.02]],
+        "jitter": 0.01,
+        "uplink_bandwidth": 2e5,
+    }}
+    sequential = run_sequential(seed=5, network_config=network, max_time=4.0)
+    assert run_parallel(seed=5, network_config=network, max_time=4.0, workers=2) == sequential
+    assert min(s["finalized_height"] for s in sequential.values()) >= 1
+
+
+def test_parallel_matches_sequential_with_processing_capacity():
+    """Inbox và lượt xử lý của receiver chỉ phụ thuộc tin nhắn tới receiver đó"""
+    network = {"processing": {"capacity": 300, "weights": {"consensus": 4, "block": 2, "tx": 1}}}
+    sequential = run_sequential(seed=7, network_config=network, max_time=4.0)
+    assert run_parallel(seed=7, network_config=network, max_time=4.0, workers=3) == sequential
+
+
+def test_parallel_matches_sequential_with_batching():
+    """Phong bì và sự kiện đóng phong bì nằm ở partition của sender"""
+    network = {"drop_prob": 0.1, "batching": {"window": 0.005}}
+    sequential = run_sequential(seed=3, network_config=network, max_time=4.0)
+    assert run_parallel(seed=3, network_config=network, max_time=4.0, workers=2) == sequential
+
+
+def test_pdes_requires_positive_lookahead():
+    with pytest.raises(ValueError):
+        PartitionSimulator({"min_delay": 0.0, "max_delay": 0.1}, hosted=["Node0"])
+    with pytest.raises(ValueError):
+        run_parallel(network_config={"min_delay": 0.0}, workers=2)
+
+
+if __name__ == "__main__":
+    test_parallel_matches_sequential(2)
+    test_parallel_matches_sequential_with_heavy_loss_and_calendar_queue()
+    test_parallel_matches_sequential_with_topology()
+    test_parallel_matches_sequential_with_processing_capacity()
+    test_parallel_matches_sequential_with_batching()
+    test_pdes_requires_positive_lookahead()
+    print("All PDES tests passed!")
@@ -0,0 +1,128 @@
+# tests/test_rate_limiter.py
+import sys
+import os
+import random
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rate_limiter import TokenBucketLimiter
+from src.message_classes import CLASS_CONSENSUS, CLASS_BLOCK, CLASS_TX, classify
+from src.trace import RingBufferTraceSink, EV_BLOCK, EV_BLOCKED, EV_UNBLOCK
+
+
+def test_burst_then_refill():
+    limiter = TokenBucketLimiter(rate=10, burst=5, block_duration=0)
+    assert limiter.admit(0.0, "A", "B", CLASS_CONSENSUS, 7) == 5
+    assert limiter.admit(0.05, "A", "B", CLASS_CONSENSUS) == 0
+    assert limiter.admit(0.1, "A", "B", CLASS_CONSENSUS) == 1
+    # Bucket không vượt burst dù rảnh lâu
+    assert limiter.admit(100.0, "A", "B", CLASS_CONSENSUS, 10) == 5
+
+
+def test_no_double_burst_at_window_edge():
+    """Cửa sổ cố định cho 2x ngưỡng quanh mốc 1 giây; token bucket thì không"""
+    limiter = TokenBucketLimiter(rate=100, block_duration=0)
+    assert limiter.admit(0.99, "A", "B", CLASS_CONSENSUS, 100) == 100
+    assert limiter.admit(1.0, "A", "B", CLASS_CONSENSUS, 100) == 1
+
+
+def test_exhausted_bucket_blocks_link():
+    sink = RingBufferTraceSink(capacity=None)
+    limiter = TokenBucketLimiter(rate=10, burst=2, block_duration=1.0, trace_sink=sink)
+    assert limiter.admit(0.0, "A", "B", CLASS_CONSENSUS, 3) == 2
+    assert [r[0] for r in sink.records()] == [EV_BLOCK]
+    # Bị block dù bucket đã nạp lại
+    assert limiter.admit(0.5, "A", "B", CLASS_CONSENSUS) == 0
+    assert limiter.admit(1.0, "A", "B", CLASS_CONSENSUS) == 1
+
+
+def test_tx_spam_does_not_starve_votes():
+    limiter = TokenBucketLimiter(rate=100, classes={"tx": {"max_messages_per_second": 5, "burst": 5}})
+    assert limiter.admit(0.0, "A", "B", CLASS_TX, 50) == 5
+    assert limiter.admit(0.0, "A", "B", CLASS_TX) == 0
+    assert limiter.admit(0.0, "A", "B", CLASS_CONSENSUS, 50) == 50
+    assert limiter.admit(0.0, "A", "B", CLASS_BLOCK, 50) == 50
+
+
+def test_unknown_class_rejected():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(classes={"gossip": {"burst": 1}})
+
+
+def test_classify_messages():
+    assert classify({"type": "PREVOTE", "height": 1}) == CLASS_CONSENSUS
+    assert classify({"msg_type": "GET_BODY", "block_hash": "h"}) == CLASS_BLOCK
+    assert classify({"txs": [], "height": 1}) == CLASS_BLOCK
+    assert classify({"sender": "s", "key": "k", "value": "v", "nonce": 0}) == CLASS_TX
+
+
+def test_admit_many_matches_admit_loop():
+    rng = random.Random(3)
+    scalar_sink = RingBufferTraceSink(capacity=None)
+    batch_sink = RingBufferTraceSink(capacity=None)
+    scalar = TokenBucketLimiter(rate=20, burst=6, block_duration=0.3, trace_sink=scalar_sink)
+    batched = TokenBucketLimiter(rate=20, burst=6, block_duration=0.3, trace_sink=batch_sink)
+    targets = [f"N{i}" for i in range(20)]
+    now = 0.0
+    for _ in range(200):
+        now += rng.choice([0.0, 0.01, 0.1])
+        chosen = rng.sample(targets, rng.randint(1, len(targets)))
+        copies = rng.randint(1, 4)
+        expected = [scalar.admit(now, "S", t, CLASS_CONSENSUS, copies) for t in chosen]
+        assert batched.admit_many(now, "S", chosen, CLASS_CONSENSUS, copies) == expected
+    assert scalar.state() == batched.state()
+    # Cùng record, cùng thứ tự (trace được so bởi công cụ determinism / replay)
+    assert scalar_sink.records() == batch_sink.records()
+    codes = {record[0] for record in scalar_sink.records()}
+    assert {EV_BLOCK, EV_BLOCKED, EV_UNBLOCK} <= codes
+
+
+def test_idle_links_are_evicted_without_changing_results():
+    limiter = TokenBucketLimiter(rate=10, burst=2, block_duration=0.5)
+    limiter.EVICT_MIN = limiter._next_evict = 8
+    reference = TokenBucketLimiter(rate=10, burst=2, block_duration=0.5)
+    for t in range(50):
+        now = t * 0.25
+        for k in range(4):
+            receiver = f"N{t * 4 + k}"
+            for lim in (limiter, reference):
+                lim.admit(now, "S", receiver, CLASS_CONSENSUS, 2)
+        # Link cũ quay lại sau khi đã bị thu hồi: kết quả như chưa từng bị thu hồi
+        if t >= 10:
+            old = f"N{(t - 10) * 4}"
+            assert limiter.admit(now, "S", old, CLASS_CONSENSUS, 2) == reference.admit(now, "S", old, CLASS_CONSENSUS, 2)
+    assert len(limiter) < 40 < len(reference)
+
+
+def test_eviction_keeps_expired_blocks_until_unblock_traced():
+    """Block hết hạn nhưng chưa admit lại: link không bị thu hồi, EV_UNBLOCK vẫn được ghi"""
+    sinks = [RingBufferTraceSink(capacity=None), RingBufferTraceSink(capacity=None)]
+    limiter, reference = (TokenBucketLimiter(rate=10, burst=2, block_duration=0.5, trace_sink=sink)
+                          for sink in sinks)
+    for lim in (limiter, reference):
+        assert lim.admit(0.0, "S", "B", CLASS_CONSENSUS, 3) == 2
+        lim.admit(0.0, "S", "C", CLASS_CONSENSUS)
+    # Block của S->B đã hết hạn, bucket đã đầy lại; S->C rảnh
+    limiter.evict_idle(5.0)
+    assert list(limiter.state()) == [("S", "B", CLASS_CONSENSUS)]
+
+    for lim in (limiter, reference):
+        assert lim.admit(6.0, "S", "B", CLASS_CONSENSUS) == 1
+    assert sinks[0].records() == sinks[1].records()
+    assert [(code, dst) for code, _, _, dst, _ in sinks[0].records()] == [(EV_BLOCK, "B"), (EV_UNBLOCK, "B")]
+    # Đã gỡ block: lần dọn sau thu hồi được
+    limiter.evict_idle(10.0)
+    assert len(limiter) == 0
+
+
+if __name__ == "__main__":
+    test_burst_then_refill()
+    test_no_double_burst_at_window_edge()
+    test_exhausted_bucket_blocks_link()
+    test_tx_spam_does_not_starve_votes()
+    test_classify_messages()
+    test_admit_many_matches_admit_loop()
+    test_idle_links_are_evicted_without_changing_results()
+    test_eviction_keeps_expired_blocks_until_unblock_traced()
+    print("All rate limiter tests passed!")
@@ -0,0 +1,329 @@
+# tests/test_realtime.py
+import sys
+import os
+import asyncio
+import contextlib
+import copy
+import io
+import multiprocessing
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.node_config import CONFIG
+from src.realtime import RealtimeRuntime, Impairments, encode_frame, decode_frame, FRAME_HEADER
+from src.runner import build_realtime_network
+from src.shm_ring import ShmRing, ShmFabric
+from src.simulator import Simulator, KIND_HEADER
+from src.trace import RingBufferTraceSink, EV_PENDING_BODY, EV_DROP_BODY, EV_RECV_BODY
+from src.utils import deterministic_encode
+
+
+class Recorder:
+    def __init__(self, node_id, runtime):
+        self.node_id = node_id
+        self.received = []
+        runtime.register_node(self)
+
+    def receive(self, sender_id, message):
+        self.received.append(("msg", sender_id, message))
+
+    def receive_header(self, sender_id, header):
+        self.received.append(("header", sender_id, header))
+
+    def receive_body(self, sender_id, body):
+        self.received.append(("body", sender_id, body))
+
+    def on_timer(self, token):
+        self.received.append(("timer", token))
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def test_frame_roundtrip():
+    message = {"type": "PREVOTE", "text": "a\nb", "height": 3}
+    frame = encode_frame(KIND_HEADER, "A", "B", 42, deterministic_encode(message))
+    (length,) = FRAME_HEADER.unpack_from(frame)
+    assert length == len(frame) - FRAME_HEADER.size
+    assert decode_frame(frame[FRAME_HEADER.size:]) == (KIND_HEADER, "A", "B", 42, message)
+
+
+def test_impairments():
+    assert Impairments(drop_prob=1.0).sample() is None
+    delays = [Impairments(delay=0.01, jitter=0.005, seed=s).sample() for s in range(50)]
+    assert all(0.01 <= d <= 0.015 for d in delays)
+    with pytest.raises(ValueError):
+        RealtimeRuntime({"transport": "quic"})
+
+
+def test_shm_ring_wraps_and_fills():
+    ring = ShmRing(memoryview(bytearray(64 + 128)), 0, 64)
+    assert ring.read() == []
+    # Ring rỗng -> cần đánh thức reader; ring còn dữ liệu chưa đọc -> không cần
+    assert ring.write((b"abc", b"de"), 5, 1) is True
+    assert ring.write((b"x" * 10,), 10, 2) is False
+    assert ring.read() == [(1, b"abcde"), (2, b"x" * 10)]
+    ring.release()
+    for i in range(20):
+        payload = bytes([i]) * (i % 7 + 1)
+        assert ring.write((payload,), len(payload), i) is True
+        assert ring.read() == [(i, payload)]
+        ring.release()
+    # Đầy: trả về None; record đã đọc nhưng chưa release vẫn giữ chỗ
+    while ring.write((b"y" * 8,), 8, 0) is not None:
+        pass
+    records = ring.read()
+    assert records and all(p == b"y" * 8 for _, p in records)
+    assert ring.write((b"y" * 8,), 8, 0) is None and ring.read() == []
+    ring.release()
+    assert ring.write((b"z",), 1, 5) is True and len(ring) > 0
+    # Đọc tiếp trước release chỉ trả record mới; payload là view vào ring, không phải bản sao
+    ring.write((b"q",), 1, 6)
+    assert ring.read() == [(5, b"z")] + [(6, b"q")] and ring.read() == []
+    ring.write((b"r",), 1, 7)
+    (stamp, view), = ring.read()
+    assert stamp == 7 and isinstance(view, memoryview) and view.obj is ring.buf.obj
+    ring.release()
+    assert len(ring) == 0
+    with pytest.raises(ValueError):
+        ring.write((b"w" * 100,), 100, 0)
+
+
+@pytest.mark.parametrize("transport", ["tcp", "udp", "shm"])
+def test_messages_and_timers_over_loopback(transport):
+    async def scenario():
+        runtime = RealtimeRuntime({"transport": transport})
+        a, b = Recorder("A", runtime), Recorder("B", runtime)
+        await runtime.start()
+        runtime.send_message("A", "B", {"x": 1})
+        runtime.broadcast("B", ["A"], {"y": 2}, copies=2)
+        runtime.schedule_timer("A", 0.01, "fired")
+        cancelled = runtime.schedule_timer("A", 0.01, "cancelled")
+        runtime.cancel(cancelled)
+        ok = await wait_for(lambda: len(b.received) == 1 and len(a.received) == 3)
+        await runtime.close()
+        return ok, a.received, b.received
+
+    ok, at_a, at_b = asyncio.run(scenario())
+    assert ok
+    assert at_b == [("msg", "A", {"x": 1})]
+    assert sorted(map(repr, at_a)) == sorted(map(repr, [("msg", "B", {"y": 2})] * 2 + [("timer", "fired")]))
+
+
+def test_body_held_until_header_accepted():
+    async def scenario():
+        runtime = RealtimeRuntime({"transport": "tcp"})
+        Recorder("A", runtime)
+        b = Recorder("B", runtime)
+        await runtime.start()
+        body = {"msg_type": "BODY", "block_hash": "h1", "height": 1}
+        runtime.send_body("A", "B", body, "h1")
+        held = await wait_for(lambda: "B" in runtime.pending_bodies)
+        early = list(b.received)
+        runtime.accept_header("B", "h1", 1)
+        delivered = await wait_for(lambda: len(b.received) == 1)
+        # Body của height đã finalize bị bỏ
+        runtime.forget_blocks("B", 1)
+        runtime.send_body("A", "B", dict(body, block_hash="h0"), "h0")
+        await asyncio.sleep(0.05)
+        await runtime.close()
+        return held, early, delivered, b.received, runtime.pending_bodies
+
+    held, early, delivered, received, pending = asyncio.run(scenario())
+    assert held and early == [] and delivered
+    assert received == [("body", "A", {"msg_type": "BODY", "block_hash": "h1", "height": 1})]
+    assert pending == {}
+
+
+HELD_BODIES = [("h1", 1), ("h1", 1), ("h2", 1), ("h3", 2), ("h4", 2)]
+BODY_CODES = (EV_PENDING_BODY, EV_DROP_BODY, EV_RECV_BODY)
+
+
+def _body_trace(sink):
+    return [(code, src, dst) for code, _, src, dst, _ in sink.records() if code in BODY_CODES]
+
+
+def _held_bodies_in_simulator():
+    sink = RingBufferTraceSink(capacity=None)
+    sim = Simulator({"min_delay": 0.1, "max_delay": 0.1, "max_pending_bodies": 3,
+                     "max_messages_per_second": 1000}, trace_sink=sink)
+    Recorder("A", sim)
+    b = Recorder("B", sim)
+    for block_hash, height in HELD_BODIES:
+        sim.send_body("A", "B", {"block_hash": block_hash, "height": height}, block_hash)
+    sim.run(max_time=1.0)
+    count = sim.pending_body_count("B")
+    sim.forget_blocks("B", 1)
+    sim.send_body("A", "B", {"block_hash": "h0", "height": 1}, "h0")
+    sim.run(max_time=2.0)
+    sim.accept_header("B", "h3", 2)
+    sim.run(max_time=3.0)
+    return count, sorted(sim.pending_bodies["B"]), b.received, _body_trace(sink)
+
+
+def test_held_bodies_follow_simulator_rules():
+    """Giới hạn, đẩy body cũ, thay bản cùng sender và forget_blocks giống hệt Simulator"""
+    async def scenario():
+        sink = RingBufferTraceSink(capacity=None)
+        runtime = RealtimeRuntime({"transport": "tcp", "max_pending_bodies": 3}, trace_sink=sink)
+        Recorder("A", runtime)
+        b = Recorder("B", runtime)
+        await runtime.start()
+        for block_hash, height in HELD_BODIES:
+            runtime.send_body("A", "B", {"block_hash": block_hash, "height": height}, block_hash)
+        await wait_for(lambda: _body_trace(sink).count((EV_PENDING_BODY, "A", "B")) == len(HELD_BODIES))
+        count = runtime.pending_body_count("B")
+        runtime.forget_blocks("B", 1)
+        runtime.send_body("A", "B", {"block_hash": "h0", "height": 1}, "h0")
+        await wait_for(lambda: _body_trace(sink).count((EV_DROP_BODY, "A", "B")) == 2)
+        runtime.accept_header("B", "h3", 2)
+        await wait_for(lambda: len(b.received) == 1)
+        await runtime.close()
+        return count, sorted(runtime.pending_bodies["B"]), b.received, _body_trace(sink)
+
+    expected = _held_bodies_in_simulator()
+    # h4 đẩy h1 (body giữ lâu nhất) ra; forget bỏ h2, h0 tới muộn bị bỏ ngay; h3 được giao
+    assert expected[:3] == (3, ["h4"], [("body", "A", {"block_hash": "h3", "height": 2})])
+    assert asyncio.run(scenario()) == expected
+
+
+def test_pending_bodies_capped_and_timer_errors_logged():
+    """Body chờ header bị giới hạn mỗi receiver; timer lỗi không làm dừng event loop"""
+    async def scenario():
+        runtime = RealtimeRuntime({"transport": "tcp", "max_pending_bodies": 2})
+        Recorder("A", runtime)
+        b = Recorder("B", runtime)
+        await runtime.start()
+        for i in range(4):
+            runtime.send_body("A", "B", {"msg_type": "BODY", "block_hash": f"h{i}", "height": 5}, f"h{i}")
+        full = await wait_for(lambda: "h3" in runtime.pending_bodies.get("B", {}))
+        held = sorted(runtime.pending_bodies["B"])
+        runtime.accept_header("B", "h3", 5)
+        runtime.forget_blocks("B", 5)
+
+        def broken(token):
+            raise RuntimeError("boom")
+        b.on_timer = broken
+        runtime.schedule_timer("B", 0.0, "bad")
+        runtime.schedule_timer("A", 0.01, "good")
+        fired = await wait_for(lambda: any(r[0] == "timer" for r in runtime.nodes["A"].received))
+        await runtime.close()
+        return full, held, fired, runtime.pending_body_count("B"), runtime.pending_bodies
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        full, held, fired, count, pending = asyncio.run(scenario())
+    # Hai body giữ sớm nhất bị thay bởi hai body mới nhất
+    assert full and held == ["h2", "h3"]
+    assert fired and count == 0 and pending == {}
+    assert "Error firing timer 'bad' on B: boom" in output.getvalue()
+
+
+def test_shm_backlog_when_ring_full():
+    async def scenario():
+        runtime = RealtimeRuntime({"transport": "shm", "ring_capacity": 512})
+        Recorder("A", runtime)
+        b = Recorder("B", runtime)
+        await runtime.start()
+        for i in range(200):
+            runtime.send_message("A", "B", {"i": i})
+        ok = await wait_for(lambda: len(b.received) == 200)
+        await runtime.close()
+        return ok, b.received
+
+    ok, received = asyncio.run(scenario())
+    assert ok
+    assert [m["i"] for _, _, m in received] == list(range(200))
+
+
+def _shm_echo(fabric, ready):
+    async def serve():
+        runtime = RealtimeRuntime({"transport": "shm"}, fabric=fabric)
+        runtime.assign_rank("A")
+        echo = Recorder("B", runtime)
+        echo.receive = lambda sender_id, message: runtime.send_message("B", sender_id, dict(message, echoed=True))
+        await runtime.start()
+        ready.wait()
+        await runtime.run(1.0)
+        await runtime.close()
+    asyncio.run(serve())
+
+
+def test_shm_transport_across_processes():
+    fabric = ShmFabric(["A", "B"])
+    ctx = multiprocessing.get_context("fork")
+    ready = ctx.Event()
+    child = ctx.Process(target=_shm_echo, args=(fabric, ready))
+    child.start()
+
+    async def scenario():
+        runtime = RealtimeRuntime({"transport": "shm"}, fabric=fabric)
+        a = Recorder("A", runtime)
+        runtime.assign_rank("B")
+        await runtime.start()
+        ready.set()
+        for i in range(50):
+            runtime.send_message("A", "B", {"i": i})
+        ok = await wait_for(lambda: len(a.received) == 50)
+        await runtime.close()
+        return ok, a.received
+
+    try:
+        ok, received = asyncio.run(scenario())
+    finally:
+        child.join()
+        fabric.close()
+    assert ok
+    assert [m for _, _, m in received] == [{"i": i, "echoed": True} for i in range(50)]
+
+
+@pytest.mark.parametrize("transport,impairments", [
+    ("tcp", {}),
+    ("udp", {"drop_prob": 0.1, "delay": 0.005, "jitter": 0.005}),
+    ("shm", {}),
+])
+def test_consensus_over_loopback(transport, impairments):
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+
+    async def scenario():
+        runtime, nodes = build_realtime_network(4, seed=5, config=config, key_prefix="rt",
+                                                realtime_config={"transport": transport, "impairments": impairments})
+        await runtime.start()
+        for i in range(3):
+            nodes[i].create_transaction(f"{nodes[i].key_pair.pub_key_str}/k{i}", f"v{i}")
+        for n in nodes:
+            n.start_consensus()
+        ok = await wait_for(lambda: all(n.finalized_height >= 2 for n in nodes), timeout=15.0)
+        await runtime.close()
+        return ok, nodes
+
+    ok, nodes = asyncio.run(scenario())
+    assert ok
+    # An toàn: mọi node finalize cùng block ở mỗi height
+    for height in (1, 2):
+        assert len({n.blocks[height].get_hash() for n in nodes}) == 1
+
+
+if __name__ == "__main__":
+    test_frame_roundtrip()
+    test_impairments()
+    test_shm_ring_wraps_and_fills()
+    for transport in ("tcp", "udp", "shm"):
+        test_messages_and_timers_over_loopback(transport)
+    test_body_held_until_header_accepted()
+    test_held_bodies_follow_simulator_rules()
+    test_pending_bodies_capped_and_timer_errors_logged()
+    test_shm_backlog_when_ring_full()
+    test_shm_transport_across_processes()
+    test_consensus_over_loopback("tcp", {})
+    test_consensus_over_loopback("udp", {"drop_prob": 0.1, "delay": 0.005, "jitter": 0.005})
+    test_consensus_over_loopback("shm", {})
+    print("All realtime tests passed!")
@@ -0,0 +1,80 @@
+# tests/test_result_cache.py
+import sys
+import os
+import time
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.result_cache import ResultCache, cache_key, code_fingerprint
+from src.sweep import expand_grid, point_key, run_sweep
+from config.node_config import CONFIG
+
+
+def test_cache_key_is_canonical_and_sensitive():
+    point = {"seed": 1, "drop_prob": 0.1}
+    key = cache_key(point, CONFIG, "code-a")
+    assert key == cache_key({"drop_prob": 0.1, "seed": 1}, CONFIG, "code-a")
+    assert key != cache_key({"seed": 2, "drop_prob": 0.1}, CONFIG, "code-a")
+    assert key != cache_key(point, CONFIG, "code-b")
+    changed = dict(CONFIG, consensus=dict(CONFIG["consensus"], retry_count=2))
+    assert key != cache_key(point, changed, "code-a")
+
+
+def test_code_fingerprint_tracks_source_files(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    first = code_fingerprint(str(tmp_path))
+    assert first == code_fingerprint(str(tmp_path))
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "a.py").write_text("x = 2\n")
+    assert code_fingerprint(str(other)) != first
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("k") is None
+    cache.put("k", {"state_hash": "abc", "heights": {"Node0": 3}})
+    assert ResultCache(str(tmp_path)).get("k") == {"state_hash": "abc", "heights": {"Node0": 3}}
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    payload = {"data": "x" * 1000}
+    cache = ResultCache(str(tmp_path), max_bytes=3500)
+    for key in ("a", "b", "c"):
+        cache.put(key, payload)
+        time.sleep(0.01)
+    cache.get("a")  # "a" vừa được dùng, "b" là cũ nhất
+    time.sleep(0.01)
+    cache.put("d", payload)
+
+    assert cache.total_bytes <= 3500
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
+
+
+def test_sweep_skips_points_already_in_cache(tmp_path):
+    """Mở rộng lưới thêm một giá trị drop_prob: chỉ các điểm mới được chạy"""
+    calls = []
+    def counting_run(point):
+        calls.append(point_key(point))
+        return {"point": point, "key": point_key(point), "min_height": 1, "mean_finality": 0.2,
+                "messages": 10, "safety_violations": 0}
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    first = expand_grid(range(3), drop_prob=[0.0])
+    list(run_sweep(first, workers=1, run=counting_run, cache=cache))
+    assert len(calls) == 3
+
+    calls.clear()
+    second = expand_grid(range(3), drop_prob=[0.0, 0.2])
+    results = list(run_sweep(second, str(tmp_path / "second.jsonl"), workers=1, run=counting_run, cache=cache))
+    assert len(results) == 6
+    assert sorted(calls) == sorted(point_key(p) for p in second if p["drop_prob"] == 0.2)
+    assert sum(1 for r in results if r.get("cached")) == 3
+
+
+if __name__ == "__main__":
+    test_cache_key_is_canonical_and_sensitive()
+    print("All result cache tests passed!")
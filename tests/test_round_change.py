@@ -0,0 +1,197 @@
+# tests/test_round_change.py
+"""
+Round-based view change: proposer chết hoặc block bị mất thì các node
+timeout, vote nil, sang round mới với proposer khác và vẫn finalize.
+"""
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.node import Node
+from src.simulator import Simulator
+from src.consensus import ConsensusEngine
+from src.models import Vote
+from src.crypto import KeyPair, CTX_VOTE
+from config.node_config import CONFIG
+
+
+def setup_network(config_override=None, dead=(), seed=2024):
+    """8 node, các node trong `dead` không được đăng ký với simulator (coi như chết)"""
+    network_config = CONFIG["network"].copy()
+    network_config["seed"] = seed
+    if config_override:
+        network_config.update(config_override)
+    sim = Simulator(network_config)
+
+    nodes = []
+    validator_keys = []
+    for i, name in enumerate(CONFIG["nodes"]):
+        n = Node(name, sim, [], key_seed=f"round_{i}_{seed}", config=CONFIG)
+        nodes.append(n)
+        validator_keys.append(n.key_pair.pub_key_str)
+        if name not in dead:
+            sim.register_node(n)
+
+    for n in nodes:
+        n.consensus.validators = validator_keys
+        n.consensus.n = len(validator_keys)
+        n.consensus.threshold = (len(validator_keys) * 2) // 3 + 1
+        for peer in nodes:
+            n.add_peer(peer.node_id)
+
+    live = [n for n in nodes if n.node_id not in dead]
+    return sim, nodes, live
+
+
+def test_proposer_rotates_per_round():
+    _, nodes, _ = setup_network()
+    keys = nodes[0].consensus.validators
+    assert nodes[0].proposer_for(1, 0) == keys[0]
+    assert nodes[0].proposer_for(1, 1) == keys[1]
+    assert nodes[0].proposer_for(2, 0) == keys[1]
+    assert nodes[0].proposer_for(1, 8) == keys[0]
+
+
+def test_dead_proposer_finalizes_in_next_round():
+    """Proposer round 0 chết: các node còn lại timeout, sang round 1 và finalize block của Node1"""
+    sim, nodes, live = setup_network({"drop_prob": 0.0}, dead=("Node0",))
+
+    for n in live:
+        n.start_consensus()
+    sim.run(max_time=20.0)
+
+    hashes = set()
+    for n in live:
+        assert n.finalized_height == 1, f"{n.node_id} chưa finalize"
+        hashes.add(n.blocks[1].get_hash())
+        # Block được đề xuất bởi proposer của round 1
+        assert n.blocks[1].proposer == nodes[1].key_pair.pub_key_str
+        # Độ trễ finality bị chặn bởi timeout round 0 + một round bình thường
+        latency = n.finalize_times[1] - n.height_start_times[1]
+        assert latency < n.timeout_propose + n.timeout_prevote + n.timeout_precommit + 2.0
+    assert len(hashes) == 1
+
+
+def test_two_dead_proposers_with_drops_stay_safe():
+    """Hai proposer liên tiếp chết, mạng drop 10%: vẫn finalize và chỉ 1 block"""
+    sim, nodes, live = setup_network({"drop_prob": 0.1}, dead=("Node0", "Node1"))
+
+    for n in live:
+        n.start_consensus()
+    sim.run(max_time=30.0)
+
+    finalized = [n for n in live if n.finalized_height >= 1]
+    assert len(finalized) >= live[0].consensus.threshold
+    assert len({n.blocks[1].get_hash() for n in finalized}) == 1
+
+
+def test_locked_node_refuses_other_block_without_new_polka():
+    """Quy tắc khóa: đã khóa block A thì chỉ prevote B khi thấy 2/3 PREVOTE cho B ở round sau khóa"""
+    validators = [KeyPair() for _ in range(4)]
+    keys = [v.pub_key_str for v in validators]
+    engine = ConsensusEngine(keys[0], keys)
+
+    engine.lock("block_A", 0)
+    assert engine.can_prevote(1, 1, "block_A")
+    assert not engine.can_prevote(1, 1, "block_B")
+
+    # 2/3 PREVOTE cho B ở round 1 -> được phép prevote B ở round 2
+    for v in validators[:engine.threshold]:
+        vote = Vote(Vote.PREVOTE, 1, "block_B", v.pub_key_str, round=1)
+        vote.signature = v.sign(vote.to_dict(include_sig=False), CTX_VOTE)
+        engine.add_vote(vote)
+    assert not engine.can_prevote(1, 1, "block_B")
+    assert engine.can_prevote(1, 2, "block_B")
+
+
+def test_round_skip_on_f_plus_one_votes():
+    """f+1 validator gửi vote ở round cao hơn -> node nhảy tới round đó"""
+    sim, nodes, live = setup_network({"drop_prob": 0.0})
+    node = nodes[3]
+    node.start_consensus()
+    f = node.consensus.max_faulty()
+
+    for voter in nodes[4:4 + f + 1]:
+        vote = Vote(Vote.PREVOTE, 1, Vote.NIL, voter.key_pair.pub_key_str, round=3)
+        vote.signature = voter.key_pair.sign(vote.to_dict(include_sig=False), CTX_VOTE)
+        node.handle_vote(vote.to_dict(), voter.node_id)
+
+    assert node.round == 3
+
+
+def test_lagging_node_catches_up_through_commits():
+    """Node vắng mặt nhiều height rồi quay lại: xin block đã commit từ peer và bắt kịp"""
+    sim, nodes, live = setup_network({"drop_prob": 0.1}, dead=("Node7",))
+    for n in nodes:
+        n.auto_advance = True
+    for n in live:
+        n.start_consensus()
+    sim.run_until(6.0)
+    assert min(n.finalized_height for n in live) >= 5
+    
+    late = nodes[7]
+    synced = []
+    apply_commits = late.receive_commits
+    def recording_receive_commits(sender_id, message):
+        before = late.finalized_height
+        apply_commits(sender_id, message)
+        synced.extend(range(before + 1, late.finalized_height + 1))
+    late.receive_commits = recording_receive_commits
+    sim.register_node(late)
+    late.start_consensus()
+    sim.run_until(12.0)
+    
+    # Peer không còn giữ body của các height cũ: chỉ bắt kịp được qua GET_COMMITS
+    assert late.finalized_height >= min(n.finalized_height for n in live) - 1
+    assert synced
+    # Bắt kịp xong thì node quay lại theo round: các height sau được finalize bằng vote của chính nó
+    assert late.finalized_height > max(synced)
+    for height in range(1, late.finalized_height + 1):
+        assert {n.blocks[height].get_hash() for n in nodes if n.finalized_height >= height} == {late.blocks[height].get_hash()}
+        assert len(late.commits[height]) >= late.consensus.threshold
+    if late.finalized_height == nodes[0].finalized_height:
+        assert late.state_machine.get_state_hash() == nodes[0].state_machine.get_state_hash()
+
+
+def test_commits_without_quorum_rejected():
+    """COMMITS có certificate thiếu, giả hoặc block bị sửa không được áp dụng"""
+    sim, nodes, live = setup_network({"drop_prob": 0.0}, dead=("Node7",))
+    for n in live:
+        n.start_consensus()
+    sim.run_until(3.0)
+    source, late = nodes[0], nodes[7]
+    assert source.finalized_height >= 1 and late.finalized_height == 0
+    
+    block = source.blocks[1].to_dict()
+    precommits = source.commits[1]
+    short = precommits[:late.consensus.threshold - 1]
+    outsider = KeyPair()
+    stranger = Vote(Vote.PRECOMMIT, 1, source.blocks[1].get_hash(), outsider.pub_key_str, round=precommits[0]["round"])
+    stranger.signature = outsider.sign(stranger.to_dict(include_sig=False), CTX_VOTE)
+    rejected = [
+        (block, short),                                                # thiếu 2/3
+        (block, short + [short[0]]),                                   # một voter đếm hai lần
+        (block, short + [stranger.to_dict()]),                         # voter ngoài tập validator
+        (block, [dict(v, round=v["round"] + 1) for v in precommits]),  # chữ ký không khớp nội dung
+        (dict(block, state_hash="forged"), precommits),                # block bị sửa sau khi ký
+    ]
+    for forged_block, votes in rejected:
+        late.receive_commits(source.node_id, {"msg_type": "COMMITS", "commits": [
+            {"block": forged_block, "precommits": votes}]})
+        assert late.finalized_height == 0
+    
+    late.receive_commits(source.node_id, {"msg_type": "COMMITS", "commits": [{"block": block, "precommits": precommits}]})
+    assert late.finalized_height == 1 and late.blocks[1].get_hash() == source.blocks[1].get_hash()
+
+
+if __name__ == "__main__":
+    test_proposer_rotates_per_round()
+    test_dead_proposer_finalizes_in_next_round()
+    test_two_dead_proposers_with_drops_stay_safe()
+    test_locked_node_refuses_other_block_without_new_polka()
+    test_round_skip_on_f_plus_one_votes()
+    test_lagging_node_catches_up_through_commits()
+    test_commits_without_quorum_rejected()
+    print("All round change tests passed!")
@@ -0,0 +1,636 @@
+# tests/test_simulator.py
+import sys
+import os
+import subprocess
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.simulator import Simulator
+from src.event_queue import HeapEventQueue, CalendarEventQueue, make_event_queue
+from src.runner import build_network
+from src.network_model import NetworkModel, encoded_size
+from src.inbox import PriorityInbox, class_weights
+from src.message_classes import CLASS_CONSENSUS, CLASS_BLOCK, CLASS_TX
+from src.trace import (
+    RingBufferTraceSink, BinaryFileTraceSink, read_binary_trace, format_record,
+    EV_SEND, EV_RECV, EV_DROP, EV_DUPLICATE, EV_TIMER
+)
+
+
+class RecordingNode:
+    """Node giả chỉ ghi lại timer và tin nhắn nhận được"""
+    def __init__(self, node_id, sim):
+        self.node_id = node_id
+        self.sim = sim
+        self.fired = []
+        self.received = []
+
+    def on_timer(self, token):
+        self.fired.append((round(self.sim.current_time, 6), token))
+
+    def receive(self, sender_id, message):
+        self.received.append((round(self.sim.current_time, 6), sender_id, message))
+
+
+def make_sim(trace_sink=None, **overrides):
+    config = {"min_delay": 0.01, "max_delay": 0.1, "drop_prob": 0.0, "duplicate_prob": 0.0, "seed": 1}
+    config.update(overrides)
+    return Simulator(config, trace_sink=trace_sink)
+
+
+def test_timers_fire_in_time_order():
+    sim = make_sim()
+    node = RecordingNode("A", sim)
+    sim.register_node(node)
+
+    sim.schedule_timer("A", 0.3, "third")
+    sim.schedule_timer("A", 0.1, "first")
+    sim.schedule_timer("A", 0.2, "second")
+    sim.run(max_time=1.0)
+
+    assert [token for _, token in node.fired] == ["first", "second", "third"]
+    assert node.fired[0][0] == 0.1
+
+
+def test_cancelled_timer_does_not_fire():
+    sim = make_sim()
+    node = RecordingNode("A", sim)
+    sim.register_node(node)
+
+    keep = sim.schedule_timer("A", 0.2, "keep")
+    drop = sim.schedule_timer("A", 0.1, "drop")
+    sim.cancel(drop)
+    sim.cancel(drop)  # Hủy 2 lần không lỗi
+    sim.run(max_time=1.0)
+
+    assert [token for _, token in node.fired] == ["keep"]
+    assert sim.pending_timer_count() == 0
+    sim.cancel(keep)  # Hủy timer đã chạy không có tác dụng
+    sim.cancel(drop)
+    assert sim.pending_timer_count() == 0 and not sim.cancelled_timers
+
+    # Timer đã chạy rồi mới bị hủy không làm lệch số timer còn chờ
+    later = sim.schedule_timer("A", 0.5, "later")
+    sim.run(max_time=2.0)
+    sim.cancel(later)
+    pending = sim.schedule_timer("A", 0.5, "pending")
+    assert sim.pending_timer_count() == 1
+    sim.cancel(pending)
+    assert sim.pending_timer_count() == 0
+
+
+def test_cancellations_compact_timer_heap():
+    """Hủy hàng loạt không để heap timer phình to"""
+    sim = make_sim()
+    sim.register_node(RecordingNode("A", sim))
+
+    timer_ids = [sim.schedule_timer("A", 1.0 + i * 0.001, i) for i in range(5000)]
+    for timer_id in timer_ids[:4900]:
+        sim.cancel(timer_id)
+
+    assert sim.pending_timer_count() == 100
+    assert len(sim.timers) < 2 * 100 + Simulator.TIMER_COMPACT_MIN
+
+
+def test_timer_beyond_max_time_is_kept():
+    """Timer sau max_time không bị mất, lần run tiếp theo vẫn chạy"""
+    sim = make_sim()
+    node = RecordingNode("A", sim)
+    sim.register_node(node)
+
+    sim.schedule_timer("A", 2.0, "late")
+    sim.run(max_time=1.0)
+    assert node.fired == []
+
+    sim.run(max_time=3.0)
+    assert node.fired == [(2.0, "late")]
+
+
+def test_run_until_exclusive_stops_before_end_time():
+    sim = make_sim()
+    node = RecordingNode("A", sim)
+    sim.register_node(node)
+    sim.schedule_timer("A", 0.5, "edge")
+    sim.run_until(0.5, inclusive=False)
+    assert node.fired == [] and sim.current_time < 0.5
+    sim.run_until(0.5)
+    assert node.fired == [(0.5, "edge")]
+
+
+def test_messages_and_timers_interleave():
+    sim = make_sim(min_delay=0.5, max_delay=0.5)
+    a = RecordingNode("A", sim)
+    b = RecordingNode("B", sim)
+    sim.register_node(a)
+    sim.register_node(b)
+
+    sim.schedule_timer("B", 0.25, "before")
+    sim.schedule_timer("B", 0.75, "after")
+    sim.send_message("A", "B", {"hello": 1})
+    sim.run(max_time=1.0)
+
+    assert [token for _, token in b.fired] == ["before", "after"]
+    assert b.received == [(0.5, "A", {"hello": 1})]
+
+
+def test_equal_time_messages_delivered_in_send_order():
+    """Cùng delivery_time: thứ tự theo seq (thứ tự gửi), kể cả khi xen header/tin nhắn"""
+    sim = make_sim(min_delay=0.5, max_delay=0.5, max_messages_per_second=1000)
+    b = RecordingNode("B", sim)
+    sim.register_node(RecordingNode("A", sim))
+    sim.register_node(b)
+    b.receive_header = lambda sender_id, header: b.received.append((sim.current_time, sender_id, header))
+
+    for i in range(200):
+        if i % 3 == 0:
+            sim.send_header("A", "B", {"i": i})
+        else:
+            sim.send_message("A", "B", {"i": i})
+    sim.run(max_time=1.0)
+
+    assert [msg["i"] for _, _, msg in b.received] == list(range(200))
+    assert sim.processed_events == 200
+
+
+def test_message_runs_before_timer_at_same_time():
+    sim = make_sim(min_delay=0.5, max_delay=0.5)
+    b = RecordingNode("B", sim)
+    sim.register_node(RecordingNode("A", sim))
+    sim.register_node(b)
+    order = []
+    b.on_timer = lambda token: order.append("timer")
+    b.receive = lambda sender_id, message: order.append("message")
+
+    sim.schedule_timer("B", 0.5, "tie")
+    sim.send_message("A", "B", {"x": 1})
+    sim.run(max_time=1.0)
+
+    assert order == ["message", "timer"]
+
+
+def test_calendar_queue_matches_heap_order():
+    """Push/pop xen kẽ, nhiều thời điểm trùng nhau: hai hàng đợi trả ra cùng thứ tự"""
+    import random
+    rng = random.Random(5)
+    heap, calendar = HeapEventQueue(), CalendarEventQueue(bucket_width=0.01)
+    now, seq = 0.0, 0
+    heap_out, calendar_out = [], []
+
+    for step in range(20000):
+        if step % 3 != 2 or not len(heap):
+            # Độ trễ có cả giá trị < bucket_width để thử chèn vào bucket hiện tại
+            entry = (round(now + rng.uniform(0.0, 0.1), 2), seq)
+            seq += 1
+            heap.push(entry)
+            calendar.push(entry)
+        else:
+            assert heap.peek_time() == calendar.peek_time()
+            heap_out.append(heap.pop())
+            calendar_out.append(calendar.pop())
+            now = heap_out[-1][0]
+    while len(heap):
+        heap_out.append(heap.pop())
+        calendar_out.append(calendar.pop())
+
+    assert heap_out == calendar_out
+    assert len(calendar) == 0 and calendar.peek_time() is None
+
+
+def test_calendar_queue_accepts_push_before_peeked_bucket():
+    """peek_time() nhảy tới bucket xa, sau đó push sự kiện sớm hơn vẫn ra trước"""
+    queue = CalendarEventQueue(bucket_width=0.1)
+    queue.push((5.0, 0))
+    assert queue.peek_time() == 5.0
+    queue.push((0.3, 1))
+    assert [queue.pop(), queue.pop()] == [(0.3, 1), (5.0, 0)]
+
+
+def test_calendar_queue_long_gaps_match_heap():
+    """Khoảng trống dài hơn MAX_SCAN bucket (mạng rảnh tới timer xa) vẫn cho cùng thứ tự"""
+    import random
+    rng = random.Random(9)
+    heap, calendar = HeapEventQueue(), CalendarEventQueue(bucket_width=0.01)
+    now, seq = 0.0, 0
+    heap_out, calendar_out = [], []
+    for step in range(5000):
+        if step % 2 == 0:
+            delay = rng.uniform(1.0, 20.0) if step % 50 == 0 else rng.uniform(0.01, 0.1)
+            entry = (round(now + delay, 3), seq)
+            seq += 1
+            heap.push(entry)
+            calendar.push(entry)
+        elif len(heap):
+            heap_out.append(heap.pop())
+            calendar_out.append(calendar.pop())
+            now = heap_out[-1][0]
+    while len(heap):
+        heap_out.append(heap.pop())
+        calendar_out.append(calendar.pop())
+    assert heap_out == calendar_out
+
+
+def test_unknown_scheduler_rejected():
+    with pytest.raises(ValueError):
+        make_event_queue("splay")
+
+
+def test_calendar_scheduler_reproduces_heap_trace():
+    """Cùng seed, 8 node, mạng có drop/duplicate: trace giống hệt giữa heap và calendar"""
+    traces = {}
+    for scheduler in ("heap", "calendar"):
+        sink = RingBufferTraceSink(capacity=None)
+        sim, nodes = build_network(seed=99, network_config={"scheduler": scheduler}, trace_sink=sink)
+        nodes[0].start_consensus()
+        sim.run(max_time=3.0)
+        assert all(n.finalized_height == 1 for n in nodes)
+        traces[scheduler] = sink.records()
+    assert traces["heap"] == traces["calendar"]
+
+
+def _lossy_trace(sim, pairs, count):
+    sink = sim.trace_sink
+    for i in range(count):
+        for sender, receiver in pairs:
+            sim.send_message(sender, receiver, {"i": i})
+    sim.run(max_time=10.0)
+    # Record RECV mang thời điểm giao, nên so sánh được cả delay
+    return [r for r in sink.records() if (r[2], r[3]) == pairs[0]]
+
+
+def _lossy_sim(seed=3):
+    sim = make_sim(trace_sink=RingBufferTraceSink(capacity=None), seed=seed,
+                   drop_prob=0.3, duplicate_prob=0.3, max_messages_per_second=10**6)
+    for name in ("A", "B", "C"):
+        sim.register_node(RecordingNode(name, sim))
+    return sim
+
+
+def test_simulators_do_not_share_random_state():
+    """Hai simulator xen kẽ trong cùng process cho kết quả như khi chạy riêng, không đụng `random` toàn cục"""
+    import random
+    alone = _lossy_trace(_lossy_sim(), [("A", "B")], 200)
+
+    random.seed(42)
+    before = random.getstate()
+    first, second = _lossy_sim(), _lossy_sim(seed=4)
+    for i in range(200):
+        second.send_message("A", "B", {"noise": i})
+        first.send_message("A", "B", {"i": i})
+    second.run(max_time=10.0)
+    first.run(max_time=10.0)
+    assert random.getstate() == before
+    assert first.trace_sink.records() == alone
+
+
+def test_traffic_on_other_links_does_not_reshuffle_link():
+    """Stream theo link: thêm tin nhắn A->C không đổi các quyết định drop/delay/dup trên A->B"""
+    only_ab = _lossy_trace(_lossy_sim(), [("A", "B")], 200)
+    with_ac = _lossy_trace(_lossy_sim(), [("A", "B"), ("A", "C")], 200)
+    # msg_id là bộ đếm toàn cục nên bỏ qua khi so sánh
+    assert [r[:4] for r in only_ab] == [r[:4] for r in with_ac]
+
+
+def test_body_held_at_receiver_until_header_accepted():
+    """Body tới trước khi receiver accept header bị giữ lại, được giao ngay khi accept_header"""
+    sim = make_sim(min_delay=0.5, max_delay=0.5)
+    b = RecordingNode("B", sim)
+    sim.register_node(RecordingNode("A", sim))
+    sim.register_node(b)
+    b.receive_body = lambda sender_id, body: b.received.append((sim.current_time, sender_id, body))
+
+    sim.send_body("A", "B", {"block_hash": "h1"}, "h1")
+    sim.run(max_time=1.0)
+    assert b.received == [] and len(sim.pending_bodies) == 1
+
+    sim.schedule_timer("B", 0.5, "accept")
+    b.on_timer = lambda token: sim.accept_header("B", "h1")
+    sim.run(max_time=2.0)
+    assert b.received == [(1.0, "A", {"block_hash": "h1"})]
+    assert sim.pending_bodies == {}
+
+
+def _park_bodies(sim, receiver, bodies):
+    """Đẩy body (sender, block_hash, height) tới receiver khi chưa accept header nào"""
+    for sender, block_hash, height in bodies:
+        sim.send_body(sender, receiver, {"block_hash": block_hash, "height": height}, block_hash)
+    sim.run(max_time=sim.current_time + 1.0)
+
+
+def test_pending_bodies_capped_per_receiver():
+    sim = make_sim(min_delay=0.5, max_delay=0.5, max_pending_bodies=3)
+    b = RecordingNode("B", sim)
+    sim.register_node(b)
+    b.receive_body = lambda sender_id, body: b.received.append((sender_id, body["block_hash"]))
+
+    _park_bodies(sim, "B", [("A", "h1", 1), ("C", "h1", 1), ("A", "h2", 1), ("A", "h3", 2)])
+    # Body giữ lâu nhất (A, h1) bị bỏ để nhường chỗ
+    assert sim.pending_body_count("B") == 3
+
+    sim.accept_header("B", "h1", 1)
+    sim.accept_header("B", "h3", 2)
+    sim.run(max_time=sim.current_time + 1.0)
+    assert b.received == [("C", "h1"), ("A", "h3")]
+    assert sim.pending_body_count("B") == 1
+
+
+def test_forget_blocks_drops_finalized_heights():
+    sim = make_sim(min_delay=0.5, max_delay=0.5)
+    b = RecordingNode("B", sim)
+    sim.register_node(b)
+    b.receive_body = lambda sender_id, body: b.received.append((sender_id, body["block_hash"]))
+
+    sim.accept_header("B", "h1", 1)
+    _park_bodies(sim, "B", [("A", "h0", 1), ("A", "h2", 2)])
+    assert b.received == [] and sim.pending_body_count("B") == 2
+    sim.forget_blocks("B", 1)
+    assert sim.pending_body_count("B") == 1 and "h1" not in sim.accepted_headers["B"]
+
+    # Body của height đã finalize tới muộn bị bỏ thay vì bị giữ
+    _park_bodies(sim, "B", [("C", "h1", 1)])
+    assert sim.pending_body_count("B") == 1
+    sim.accept_header("B", "h2", 2)
+    sim.run(max_time=sim.current_time + 1.0)
+    assert b.received == [("A", "h2")]
+    assert sim.pending_bodies == {}
+
+
+def _broadcast_trace(seed):
+    sim = make_sim(trace_sink=RingBufferTraceSink(capacity=None), seed=seed,
+                   drop_prob=0.2, duplicate_prob=0.2, max_messages_per_second=10**6)
+    targets = [f"N{i}" for i in range(50)]
+    for name in ["S"] + targets:
+        sim.register_node(RecordingNode(name, sim))
+    sim.broadcast("S", targets, {"v": 1}, copies=4)
+    sim.run(max_time=10.0)
+    return sim, sim.trace_sink.records()
+
+
+def test_broadcast_is_deterministic_and_samples_impairments():
+    sim, first = _broadcast_trace(seed=8)
+    _, second = _broadcast_trace(seed=8)
+    _, other = _broadcast_trace(seed=9)
+    assert first == second
+    assert first != other
+
+    codes = [record[0] for record in first]
+    sent, dropped, dups = codes.count(EV_SEND), codes.count(EV_DROP), codes.count(EV_DUPLICATE)
+    assert sent + dropped == 200
+    assert 20 <= dropped <= 60 and 15 <= dups <= 50
+    # Mỗi bản gửi đi (kể cả bản nhân đôi) được giao đúng một lần, trong khoảng delay
+    assert codes.count(EV_RECV) == sent + dups
+    assert sum(len(sim.nodes[f"N{i}"].received) for i in range(50)) == sent + dups
+    assert all(0.01 <= t <= 0.2 for n in sim.nodes.values() for t, _, _ in n.received)
+
+
+def test_broadcast_respects_rate_limit_like_send_loop():
+    """broadcast() cho cùng số tin qua rate limiter như gọi send_message lặp lại"""
+    looped = make_sim(max_messages_per_second=5)
+    batched = make_sim(max_messages_per_second=5)
+    for sim in (looped, batched):
+        for name in ("S", "A", "B"):
+            sim.register_node(RecordingNode(name, sim))
+    for _ in range(2):
+        for target in ("A", "B"):
+            for _ in range(4):
+                looped.send_message("S", target, {"v": 1})
+        batched.broadcast("S", ["A", "B"], {"v": 1}, copies=4)
+    looped.run(max_time=1.0)
+    batched.run(max_time=1.0)
+
+    for target in ("A", "B"):
+        assert len(looped.nodes[target].received) == len(batched.nodes[target].received) == 5
+    assert looped.rate_limiter.state() == batched.rate_limiter.state()
+
+
+def _link_deliveries(targets, use_broadcast, copies=6):
+    sim = make_sim(seed=5, drop_prob=0.3, duplicate_prob=0.3, max_messages_per_second=10**6)
+    for name in ["S"] + targets:
+        sim.register_node(RecordingNode(name, sim))
+    for _ in range(3):
+        if use_broadcast:
+            sim.broadcast("S", targets, {"v": 1}, copies=copies)
+        else:
+            for _ in range(copies):
+                sim.send_message("S", targets[0], {"v": 1})
+    sim.run(max_time=10.0)
+    return sim.nodes[targets[0]].received
+
+
+def test_broadcast_link_matches_send_message():
+    """Mỗi link rút mẫu từ stream riêng: gửi qua send_message hay broadcast cho cùng kết quả"""
+    looped = _link_deliveries(["A"], use_broadcast=False)
+    assert looped and len(looped) != 18
+    assert _link_deliveries(["A"], use_broadcast=True) == looped
+    # Thêm target khác vào broadcast không làm đổi kết quả của link S->A
+    assert _link_deliveries(["A", "B", "C"], use_broadcast=True) == looped
+
+
+TWO_REGIONS = {
+    "regions": ["near", "far"],
+    "latency": [[0.01, 0.2], [0.2, 0.01]],
+    "uplink_bandwidth": 1000.0,
+    "assignment": {"A": "near", "B": "near", "C": "far"},
+}
+
+
+def test_topology_adds_serialization_and_sender_queueing():
+    sim = make_sim(topology=TWO_REGIONS)
+    nodes = {name: RecordingNode(name, sim) for name in "ABC"}
+    for node in nodes.values():
+        sim.register_node(node)
+    message = {"payload": "x" * 100}
+    tx_time = encoded_size(message) / 1000.0
+
+    # Hai tin liên tiếp từ A dùng chung uplink: tin thứ hai chờ tin thứ nhất serialize xong
+    sim.send_message("A", "B", message)
+    sim.send_message("A", "C", message)
+    sim.run(max_time=5.0)
+
+    assert nodes["B"].received[0][0] == round(tx_time + 0.01, 6)
+    assert nodes["C"].received[0][0] == round(2 * tx_time + 0.2, 6)
+    assert sim.lookahead == 0.01
+
+
+def test_topology_broadcast_matches_region_latency():
+    sim = make_sim(topology=TWO_REGIONS)
+    nodes = {name: RecordingNode(name, sim) for name in "ABC"}
+    for node in nodes.values():
+        sim.register_node(node)
+    message = {"vote": 1}
+    tx_time = encoded_size(message) / 1000.0
+
+    sim.broadcast("A", ["B", "C"], message)
+    sim.run(max_time=5.0)
+
+    assert nodes["B"].received[0][0] == round(tx_time + 0.01, 6)
+    assert nodes["C"].received[0][0] == round(2 * tx_time + 0.2, 6)
+
+
+def test_topology_rejects_bad_latency_matrix():
+    with pytest.raises(ValueError):
+        NetworkModel({"regions": ["a", "b"], "latency": [[0.01, 0.02]]})
+    with pytest.raises(ValueError):
+        NetworkModel({"regions": ["a"], "latency": [[0.0]]})
+
+
+def test_priority_inbox_weighted_round_robin():
+    inbox = PriorityInbox(class_weights({"consensus": 3, "block": 1, "tx": 1}))
+    for i in range(10):
+        for cls in (CLASS_TX, CLASS_BLOCK, CLASS_CONSENSUS):
+            inbox.push(cls, (cls, i))
+    first = [inbox.pop()[0] for _ in range(10)]
+    assert first.count(CLASS_CONSENSUS) == 6 and first.count(CLASS_BLOCK) == 2 and first.count(CLASS_TX) == 2
+    # Lớp còn lại được phục vụ hết khi lớp khác đã rỗng
+    assert len(inbox) == 20 and sorted(inbox.pop()[1] for _ in range(20))[-1] == 9
+
+
+def _processing_sim(weights, limit=None):
+    sim = make_sim(min_delay=0.5, max_delay=0.5, max_messages_per_second=1000,
+                   processing={"capacity": 10, "weights": weights, "inbox_limit": limit})
+    receiver = RecordingNode("R", sim)
+    for node in (RecordingNode("S", sim), receiver):
+        sim.register_node(node)
+    for i in range(5):
+        sim.send_message("S", "R", {"key": "k", "value": i})
+    sim.send_message("S", "R", {"type": "PREVOTE", "height": 1})
+    return sim, receiver
+
+
+def test_processing_capacity_serves_one_message_per_slot():
+    sim, receiver = _processing_sim(None)
+    sim.run(max_time=5.0)
+    assert [t for t, _, _ in receiver.received] == [0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    # FIFO: vote tới cùng lúc nhưng gửi sau cùng nên bị xử lý sau cùng
+    assert receiver.received[-1][2]["type"] == "PREVOTE"
+
+
+def test_consensus_served_first_under_tx_backlog():
+    sim, receiver = _processing_sim({"consensus": 8, "block": 4, "tx": 1}, limit=3)
+    sim.run(max_time=5.0)
+    # Node đang rảnh nhận ngay TX đầu tiên (không ngắt giữa chừng); vote được xử lý ở lượt kế tiếp
+    assert receiver.received[0][2]["value"] == 0
+    assert receiver.received[1][2]["type"] == "PREVOTE"
+    # Inbox TX chỉ chứa 3 tin, tin thứ 5 bị bỏ
+    assert [m["value"] for _, _, m in receiver.received[2:]] == [1, 2, 3]
+    assert sim.inbox_size("R") == 0
+
+
+def test_batching_coalesces_messages_per_link():
+    sim = make_sim(min_delay=0.5, max_delay=0.5, batching={"window": 0.1})
+    a, b = RecordingNode("A", sim), RecordingNode("B", sim)
+    for node in (RecordingNode("S", sim), a, b):
+        sim.register_node(node)
+
+    sim.send_message("S", "A", {"v": 1})
+    sim.send_message("S", "B", {"v": 1})
+    sim.schedule_timer("S", 0.05, "later")
+    sim.nodes["S"].on_timer = lambda token: sim.send_message("S", "A", {"v": 2})
+    sim.run(max_time=0.08)
+    # Cửa sổ chưa đóng: chưa có tin nào lên mạng
+    assert sim._next_msg_id == 0
+
+    sim.run(max_time=5.0)
+    # Hai tin tới A trong cửa sổ đi chung một phong bì; B chỉ có một tin nên nhận nguyên dạng
+    assert a.received == [(0.6, "S", {"msg_type": "BATCH", "messages": [{"v": 1}, {"v": 2}]})]
+    assert b.received == [(0.6, "S", {"v": 1})]
+    assert sim._next_msg_id == 2
+
+
+def test_batched_envelopes_split_by_class_and_copies():
+    """TX không chung phong bì với vote: không bị gửi lại theo copies, không dùng ngân sách consensus"""
+    sim = make_sim(min_delay=0.5, max_delay=0.5, batching={"window": 0.0}, max_messages_per_second=1000)
+    targets = ["A", "B", "C"]
+    for name in ["S"] + targets:
+        sim.register_node(RecordingNode(name, sim))
+    vote, tx1, tx2 = {"type": "PREVOTE"}, {"key": "k1", "value": "v"}, {"key": "k2", "value": "v"}
+    sim.broadcast("S", targets, vote, copies=3)
+    sim.send_message("S", "A", tx1)
+    sim.send_message("S", "A", tx2)
+    sim.run(max_time=5.0)
+
+    assert [m for _, _, m in sim.nodes["A"].received] == [vote] * 3 + [{"msg_type": "BATCH", "messages": [tx1, tx2]}]
+    for name in ("B", "C"):
+        assert [m for _, _, m in sim.nodes[name].received] == [vote] * 3
+    assert sim.rate_limiter.state()[("S", "A", CLASS_TX)][0] == 999.0
+
+
+def test_ring_buffer_trace_records_send_recv_and_timer():
+    sink = RingBufferTraceSink(capacity=1000)
+    sim = make_sim(trace_sink=sink)
+    sim.register_node(RecordingNode("A", sim))
+    sim.register_node(RecordingNode("B", sim))
+
+    sim.send_message("A", "B", {"x": 1})
+    sim.schedule_timer("A", 5.0, "t")
+    sim.run(max_time=10.0)
+
+    codes = [record[0] for record in sink.records()]
+    assert codes == [EV_SEND, EV_RECV, EV_TIMER]
+    send, recv, _ = sink.records()
+    assert send[2:] == ("A", "B", 1) and recv[2:] == ("A", "B", 1)
+    assert next(sink.lines()).startswith("0.000 SEND A->B #1")
+
+
+def test_ring_buffer_keeps_only_latest_records():
+    sink = RingBufferTraceSink(capacity=3)
+    for i in range(10):
+        sink.emit(EV_DROP, float(i), "A", "B", i)
+    assert sink.total == 10
+    assert [record[4] for record in sink.records()] == [7, 8, 9]
+
+
+def test_binary_trace_round_trip(tmp_path):
+    ring = RingBufferTraceSink(capacity=None)
+    path = str(tmp_path / "run.trace")
+    records = [(EV_SEND, 0.5, "Node0", "Node1", 1), (EV_DROP, 0.25, "Node1", "Node2", 2), (EV_RECV, 1.5, "Node0", "Node1", 1)]
+    with BinaryFileTraceSink(path) as sink:
+        for record in records:
+            sink.emit(*record)
+            ring.emit(*record)
+
+    assert list(read_binary_trace(path)) == ring.records()
+    assert format_record(records[1]) == "0.250 DROP Node1->Node2 #2"
+
+
+def test_importing_simulator_does_not_touch_filesystem(tmp_path):
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {repo_root!r}); import src.simulator"],
+        cwd=tmp_path, check=True
+    )
+    assert os.listdir(tmp_path) == []
+
+
+if __name__ == "__main__":
+    test_timers_fire_in_time_order()
+    test_cancelled_timer_does_not_fire()
+    test_cancellations_compact_timer_heap()
+    test_timer_beyond_max_time_is_kept()
+    test_run_until_exclusive_stops_before_end_time()
+    test_messages_and_timers_interleave()
+    test_equal_time_messages_delivered_in_send_order()
+    test_message_runs_before_timer_at_same_time()
+    test_calendar_queue_matches_heap_order()
+    test_calendar_queue_accepts_push_before_peeked_bucket()
+    test_calendar_queue_long_gaps_match_heap()
+    test_calendar_scheduler_reproduces_heap_trace()
+    test_simulators_do_not_share_random_state()
+    test_body_held_at_receiver_until_header_accepted()
+    test_pending_bodies_capped_per_receiver()
+    test_forget_blocks_drops_finalized_heights()
+    test_broadcast_is_deterministic_and_samples_impairments()
+    test_broadcast_respects_rate_limit_like_send_loop()
+    test_broadcast_link_matches_send_message()
+    test_traffic_on_other_links_does_not_reshuffle_link()
+    test_topology_adds_serialization_and_sender_queueing()
+    test_topology_broadcast_matches_region_latency()
+    test_topology_rejects_bad_latency_matrix()
+    test_priority_inbox_weighted_round_robin()
+    test_processing_capacity_serves_one_message_per_slot()
+    test_consensus_served_first_under_tx_backlog()
+    test_batching_coalesces_messages_per_link()
+    test_batched_envelopes_split_by_class_and_copies()
+    test_ring_buffer_trace_records_send_recv_and_timer()
+    test_ring_buffer_keeps_only_latest_records()
+    print("All simulator tests passed!")
@@ -0,0 +1,103 @@
+# tests/test_transport.py
+import sys
+import os
+import copy
+import heapq
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.node_config import CONFIG
+from src.runner import attach_nodes, build_network
+from src.transport import Transport, Clock, node_handlers
+
+
+class FifoTransport(Transport):
+    """Engine tối giản không dùng Simulator: một hàng FIFO chung, không trễ, không mất tin"""
+
+    def __init__(self):
+        self.nodes = {}
+        self.queue = deque()
+
+    def register_node(self, node):
+        self.nodes[node.node_id] = node
+
+    def send_message(self, sender_id, receiver_id, message):
+        self.queue.append(("receive", sender_id, receiver_id, message))
+
+    def send_header(self, sender_id, receiver_id, header):
+        self.queue.append(("receive_header", sender_id, receiver_id, header))
+
+    def send_body(self, sender_id, receiver_id, body, block_hash):
+        self.queue.append(("receive_body", sender_id, receiver_id, body))
+
+
+class StepClock(Clock):
+    """Thời gian chỉ tăng khi hàng tin rỗng và nhảy tới timer kế tiếp"""
+
+    def __init__(self):
+        self.current_time = 0.0
+        self.timers = []
+        self.cancelled = set()
+        self.next_id = 0
+
+    def schedule_timer(self, node_id, delay, callback_token):
+        self.next_id += 1
+        heapq.heappush(self.timers, (self.current_time + delay, self.next_id, node_id, callback_token))
+        return self.next_id
+
+    def cancel(self, timer_id):
+        self.cancelled.add(timer_id)
+
+
+def run(transport, clock, max_time, done):
+    while not done():
+        if transport.queue:
+            handler, sender_id, receiver_id, message = transport.queue.popleft()
+            getattr(transport.nodes[receiver_id], handler)(sender_id, message)
+        elif clock.timers and clock.timers[0][0] <= max_time:
+            clock.current_time, timer_id, node_id, token = heapq.heappop(clock.timers)
+            if timer_id not in clock.cancelled:
+                transport.nodes[node_id].on_timer(token)
+        else:
+            return
+
+
+def test_consensus_on_custom_transport_and_clock():
+    """Node chỉ phụ thuộc Transport + Clock: chạy đồng thuận trên engine khác Simulator"""
+    config = copy.deepcopy(CONFIG)
+    config["consensus"]["auto_advance"] = True
+    transport, clock = FifoTransport(), StepClock()
+    nodes = attach_nodes(transport, 4, seed=3, config=config, key_prefix="fifo", clock=clock)
+    assert all(n.transport is transport and n.clock is clock for n in nodes)
+    for n in nodes:
+        n.start_consensus()
+
+    # Tin không có độ trễ nên các height nối tiếp nhau ở cùng thời điểm: dừng theo height
+    run(transport, clock, max_time=5.0, done=lambda: all(n.finalized_height >= 3 for n in nodes))
+
+    assert all(n.finalized_height >= 3 for n in nodes)
+    for height in (1, 2, 3):
+        assert len({n.blocks[height].get_hash() for n in nodes}) == 1
+
+
+def test_default_transport_methods_and_handlers():
+    transport = FifoTransport()
+    transport.broadcast("A", ["B", "C"], {"x": 1}, copies=2)
+    transport.broadcast_header("A", ["B"], {"h": 1})
+    transport.accept_header("B", "h1", 1)
+    transport.forget_blocks("B", 1)
+    assert [(h, r) for h, _, r, _ in transport.queue] == [
+        ("receive", "B"), ("receive", "B"), ("receive", "C"), ("receive", "C"), ("receive_header", "B")]
+
+    sim, nodes = build_network(4, seed=1, key_prefix="bind")
+    node = nodes[0]
+    assert node.transport is sim and node.clock is sim
+    assert node_handlers(node) == (node.receive, node.receive_header, node.receive_body, node.on_timer)
+    assert node_handlers(object()) == (None, None, None, None)
+
+
+if __name__ == "__main__":
+    test_consensus_on_custom_transport_and_clock()
+    test_default_transport_methods_and_handlers()
+    print("All transport tests passed!")